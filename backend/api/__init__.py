@@ -1,2 +1,12 @@
 # Backend API FastAPI
 
+import sys
+from pathlib import Path
+
+# Los módulos del pipeline (config, metrics, 06_rag_response, ...) se importan
+# como módulos de nivel superior: backend/pipeline/ va al path una sola vez,
+# antes de cualquier import de api.*, así `metrics` es el mismo módulo para
+# el pipeline y para la API.
+PIPELINE_DIR = Path(__file__).resolve().parents[1] / "pipeline"
+if str(PIPELINE_DIR) not in sys.path:
+    sys.path.insert(0, str(PIPELINE_DIR))
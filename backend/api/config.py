@@ -17,7 +17,31 @@ CORS_ORIGINS: List[str] = [
 # MongoDB Configuration
 MONGODB_URL: str = os.getenv("MONGODB_URL", "mongodb://localhost:27017")
 MONGODB_DB_NAME: str = os.getenv("MONGODB_DB_NAME", "rag_chatbot")
+# Pool de conexiones y timeouts (cliente síncrono y AsyncMongoClient)
+MONGO_MAX_POOL_SIZE: int = int(os.getenv("MONGO_MAX_POOL_SIZE", "100"))
+MONGO_MIN_POOL_SIZE: int = int(os.getenv("MONGO_MIN_POOL_SIZE", "0"))
+MONGO_SERVER_SELECTION_TIMEOUT_MS: int = int(os.getenv("MONGO_SERVER_SELECTION_TIMEOUT_MS", "5000"))
+MONGO_CONNECT_TIMEOUT_MS: int = int(os.getenv("MONGO_CONNECT_TIMEOUT_MS", "5000"))
+MONGO_SOCKET_TIMEOUT_MS: int = int(os.getenv("MONGO_SOCKET_TIMEOUT_MS", "10000"))
+MONGO_WAIT_QUEUE_TIMEOUT_MS: int = int(os.getenv("MONGO_WAIT_QUEUE_TIMEOUT_MS", "5000"))
+
+# Persistencia diferida (write-behind) de los mensajes del RAG
+PERSIST_QUEUE_MAX_SIZE: int = int(os.getenv("PERSIST_QUEUE_MAX_SIZE", "10000"))
+PERSIST_BATCH_MAX_MESSAGES: int = int(os.getenv("PERSIST_BATCH_MAX_MESSAGES", "500"))
+PERSIST_MAX_RETRIES: int = int(os.getenv("PERSIST_MAX_RETRIES", "3"))
+PERSIST_SHUTDOWN_TIMEOUT_SECONDS: float = float(os.getenv("PERSIST_SHUTDOWN_TIMEOUT_SECONDS", "10"))
+
+# Control de admisión de las consultas RAG (llamadas concurrentes a OpenAI)
+RAG_MAX_CONCURRENCY: int = int(os.getenv("RAG_MAX_CONCURRENCY", "8"))
+RAG_MAX_QUEUE: int = int(os.getenv("RAG_MAX_QUEUE", "32"))
+RAG_MAX_QUEUE_PER_USER: int = int(os.getenv("RAG_MAX_QUEUE_PER_USER", "4"))
+RAG_QUEUE_TIMEOUT_SECONDS: float = float(os.getenv("RAG_QUEUE_TIMEOUT_SECONDS", "10"))
 
 # API Configuration
 API_PREFIX: str = "/api"
+# Paginación de listados (conversaciones y mensajes)
+PAGE_SIZE_DEFAULT: int = int(os.getenv("PAGE_SIZE_DEFAULT", "100"))
+PAGE_SIZE_MAX: int = int(os.getenv("PAGE_SIZE_MAX", "500"))
+# Permite POST /api/rag?profile=1 (desglose por etapa, tokens y cProfile muestreado)
+RAG_PROFILE_ENABLED: bool = os.getenv("RAG_PROFILE_ENABLED", "false").lower() in ("1", "true", "yes")
 
@@ -0,0 +1,367 @@
+"""
+Repository async para operaciones CRUD en MongoDB (AsyncMongoClient)
+- Mismas operaciones y mismos resultados que Repository
+- Cada llamada es una corrutina: el event loop sigue atendiendo otras
+  solicitudes mientras espera a MongoDB
+"""
+
+from typing import Optional, List, Dict, Any, Tuple
+from bson import ObjectId
+from pymongo import ASCENDING, DESCENDING, UpdateOne
+from pymongo.errors import BulkWriteError
+
+from pymongo.asynchronous.database import AsyncDatabase
+
+from api.db.pagination import (
+    now,
+    keyset_query,
+    build_page,
+    CONVERSATION_FIELDS,
+    MESSAGE_FIELDS
+)
+from api.db.instrumentation import mongo_op
+
+
+class AsyncRepository:
+    """Clase para operaciones CRUD async en MongoDB"""
+
+    def __init__(self, db: AsyncDatabase):
+        self.db = db
+        self.users_collection = self.db["users"]
+        self.conversations_collection = self.db["conversations"]
+        self.messages_collection = self.db["messages"]
+
+    # =============================
+    # USUARIOS
+    # =============================
+
+    @mongo_op("create_user")
+    async def create_user(self, username: str, email: str) -> str:
+        """
+        Crea un nuevo usuario.
+
+        Args:
+            username: Nombre de usuario
+            email: Email del usuario
+
+        Returns:
+            str: ID del usuario creado
+        """
+        user_doc = {
+            "username": username,
+            "email": email,
+            "created_at": now()
+        }
+        result = await self.users_collection.insert_one(user_doc)
+        return str(result.inserted_id)
+
+    @mongo_op("get_user")
+    async def get_user(self, user_id: str) -> Optional[Dict[str, Any]]:
+        """
+        Obtiene un usuario por ID.
+
+        Args:
+            user_id: ID del usuario
+
+        Returns:
+            Dict con datos del usuario o None si no existe
+        """
+        try:
+            user = await self.users_collection.find_one({"_id": ObjectId(user_id)})
+            if user:
+                user["_id"] = str(user["_id"])
+            return user
+        except Exception:
+            return None
+
+    @mongo_op("get_user_by_email")
+    async def get_user_by_email(self, email: str) -> Optional[Dict[str, Any]]:
+        """
+        Obtiene un usuario por email.
+
+        Args:
+            email: Email del usuario
+
+        Returns:
+            Dict con datos del usuario o None si no existe
+        """
+        user = await self.users_collection.find_one({"email": email})
+        if user:
+            user["_id"] = str(user["_id"])
+        return user
+
+    # =============================
+    # CONVERSACIONES
+    # =============================
+
+    @mongo_op("create_conversation")
+    async def create_conversation(self, user_id: str, title: Optional[str] = None) -> str:
+        """
+        Crea una nueva conversación.
+
+        Args:
+            user_id: ID del usuario propietario
+            title: Título opcional de la conversación
+
+        Returns:
+            str: ID de la conversación creada
+        """
+        if title is None:
+            title = "Nueva conversación"
+
+        conversation_doc = {
+            "user_id": user_id,
+            "title": title,
+            "created_at": now(),
+            "updated_at": now()
+        }
+        result = await self.conversations_collection.insert_one(conversation_doc)
+        return str(result.inserted_id)
+
+    @mongo_op("get_conversation")
+    async def get_conversation(self, conversation_id: str) -> Optional[Dict[str, Any]]:
+        """
+        Obtiene una conversación por ID.
+
+        Args:
+            conversation_id: ID de la conversación
+
+        Returns:
+            Dict con datos de la conversación o None si no existe
+        """
+        try:
+            conversation = await self.conversations_collection.find_one(
+                {"_id": ObjectId(conversation_id)}
+            )
+            if conversation:
+                conversation["_id"] = str(conversation["_id"])
+            return conversation
+        except Exception:
+            return None
+
+    @mongo_op("get_user_conversations")
+    async def get_user_conversations(
+        self,
+        user_id: str,
+        limit: int,
+        before: Optional[str] = None,
+        after: Optional[str] = None
+    ) -> Tuple[List[Dict[str, Any]], Optional[str]]:
+        """
+        Obtiene una página de conversaciones de un usuario (keyset sobre (updated_at, _id)).
+
+        Args:
+            user_id: ID del usuario
+            limit: Tamaño de la página
+            before: Cursor; conversaciones más recientes que el cursor
+            after: Cursor; conversaciones más antiguas que el cursor
+
+        Returns:
+            (conversaciones ordenadas por fecha de actualización descendente, cursor siguiente o None)
+
+        Raises:
+            ValueError: Si el cursor no es válido
+        """
+        query, sort, reversed_ = keyset_query(
+            {"user_id": user_id}, "updated_at", DESCENDING, before, after
+        )
+        cursor = self.conversations_collection.find(query, CONVERSATION_FIELDS).sort(sort).limit(limit + 1)
+        docs = await cursor.to_list()
+        return build_page(docs, limit, "updated_at", reversed_)
+
+    @mongo_op("update_conversation_title")
+    async def update_conversation_title(self, conversation_id: str, title: str) -> bool:
+        """
+        Actualiza el título de una conversación.
+
+        Args:
+            conversation_id: ID de la conversación
+            title: Nuevo título
+
+        Returns:
+            True si se actualizó, False si no existe
+        """
+        try:
+            result = await self.conversations_collection.update_one(
+                {"_id": ObjectId(conversation_id)},
+                {
+                    "$set": {
+                        "title": title,
+                        "updated_at": now()
+                    }
+                }
+            )
+            return result.modified_count > 0
+        except Exception:
+            return False
+
+    @mongo_op("delete_conversation")
+    async def delete_conversation(self, conversation_id: str) -> bool:
+        """
+        Elimina una conversación y todos sus mensajes asociados (cascada).
+
+        Args:
+            conversation_id: ID de la conversación
+
+        Returns:
+            True si se eliminó, False si no existe o hubo error
+        """
+        try:
+            # Verificar que la conversación existe
+            conversation = await self.conversations_collection.find_one(
+                {"_id": ObjectId(conversation_id)}
+            )
+            if not conversation:
+                return False
+
+            # Eliminar todos los mensajes asociados (cascada)
+            await self.messages_collection.delete_many({"conversation_id": conversation_id})
+
+            # Eliminar la conversación
+            result = await self.conversations_collection.delete_one(
+                {"_id": ObjectId(conversation_id)}
+            )
+
+            return result.deleted_count > 0
+        except Exception:
+            return False
+
+    # =============================
+    # MENSAJES
+    # =============================
+
+    @mongo_op("save_message")
+    async def save_message(
+        self,
+        conversation_id: str,
+        role: str,
+        content: str
+    ) -> Dict[str, Any]:
+        """
+        Guarda un mensaje en una conversación.
+
+        Args:
+            conversation_id: ID de la conversación
+            role: Rol del mensaje ('user' o 'assistant')
+            content: Contenido del mensaje
+
+        Returns:
+            Dict con el mensaje guardado (sin releerlo de la base)
+        """
+        message_doc = {
+            "conversation_id": conversation_id,
+            "role": role,
+            "content": content,
+            "created_at": now()
+        }
+        await self.messages_collection.insert_one(message_doc)
+
+        # Actualizar updated_at de la conversación
+        try:
+            await self.conversations_collection.update_one(
+                {"_id": ObjectId(conversation_id)},
+                {"$set": {"updated_at": now()}}
+            )
+        except Exception:
+            pass  # No crítico si falla
+
+        message_doc["_id"] = str(message_doc["_id"])
+        return message_doc
+
+    @mongo_op("save_messages")
+    async def save_messages(self, messages: List[Dict[str, Any]]) -> int:
+        """
+        Guarda varios mensajes (de una o más conversaciones) con un único
+        insert_many y un único bulk_write: cada conversación recibe el
+        created_at de su último mensaje ($max: nunca retrocede updated_at).
+
+        Idempotente si los mensajes traen su _id: reintentar el mismo lote
+        no duplica mensajes (los _id ya insertados se ignoran) y $max hace
+        inocuo repetir la actualización de las conversaciones.
+
+        Args:
+            messages: Dicts con conversation_id, role, content y
+                opcionalmente _id (por defecto, uno nuevo) y created_at
+                (por defecto, ahora)
+
+        Returns:
+            int: Cantidad de mensajes insertados en esta llamada
+        """
+        if not messages:
+            return 0
+
+        timestamp = now()
+        docs = [
+            {
+                "_id": message.get("_id") or ObjectId(),
+                "conversation_id": message["conversation_id"],
+                "role": message["role"],
+                "content": message["content"],
+                "created_at": message.get("created_at") or timestamp
+            }
+            for message in messages
+        ]
+        try:
+            result = await self.messages_collection.insert_many(docs, ordered=False)
+            inserted = len(result.inserted_ids)
+        except BulkWriteError as e:
+            # Solo claves duplicadas: mensajes ya guardados por un intento anterior
+            if any(error.get("code") != 11000 for error in e.details.get("writeErrors", [])):
+                raise
+            if e.details.get("writeConcernErrors"):
+                raise
+            inserted = e.details.get("nInserted", 0)
+
+        # Actualizar updated_at de cada conversación con su propio último mensaje
+        latest: Dict[str, Any] = {}
+        for doc in docs:
+            conversation_id = doc["conversation_id"]
+            if conversation_id not in latest or doc["created_at"] > latest[conversation_id]:
+                latest[conversation_id] = doc["created_at"]
+
+        updates = []
+        for conversation_id, updated_at in latest.items():
+            try:
+                updates.append(UpdateOne(
+                    {"_id": ObjectId(conversation_id)},
+                    {"$max": {"updated_at": updated_at}}
+                ))
+            except Exception:
+                pass
+        if updates:
+            await self.conversations_collection.bulk_write(updates, ordered=False)
+
+        return inserted
+
+    @mongo_op("get_conversation_messages")
+    async def get_conversation_messages(
+        self,
+        conversation_id: str,
+        limit: int,
+        before: Optional[str] = None,
+        after: Optional[str] = None
+    ) -> Tuple[List[Dict[str, Any]], Optional[str]]:
+        """
+        Obtiene una página de mensajes de una conversación (keyset sobre (created_at, _id)).
+
+        Args:
+            conversation_id: ID de la conversación
+            limit: Tamaño de la página
+            before: Cursor; mensajes anteriores al cursor
+            after: Cursor; mensajes posteriores al cursor
+
+        Sin cursor se devuelven los `limit` mensajes más recientes; el
+        cursor siguiente pide los anteriores con `before`.
+
+        Returns:
+            (mensajes ordenados por fecha de creación ascendente, cursor siguiente o None)
+
+        Raises:
+            ValueError: Si el cursor no es válido
+        """
+        query, sort, reversed_ = keyset_query(
+            {"conversation_id": conversation_id}, "created_at", ASCENDING, before, after, tail=True
+        )
+        cursor = self.messages_collection.find(query, MESSAGE_FIELDS).sort(sort).limit(limit + 1)
+        docs = await cursor.to_list()
+        return build_page(docs, limit, "created_at", reversed_)
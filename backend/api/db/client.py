@@ -1,17 +1,50 @@
 """
 Cliente MongoDB para la conexión a la base de datos
+- MongoClient (síncrono): Repository y funciones síncronas de db_service,
+  para scripts (p. ej. benchmarks/bench_mongo_async.py); la API no lo usa
+- AsyncMongoClient (pymongo >= 4.10): usado por la API, no bloquea el event loop.
+  Se crea en el startup (lifespan); la creación está protegida por un lock
+  para que llamadas concurrentes no abran varios clientes
 """
 
-from pymongo import MongoClient
+import asyncio
+
+from pymongo import AsyncMongoClient, MongoClient
+from pymongo.asynchronous.database import AsyncDatabase
 from pymongo.database import Database
 from pymongo.errors import ConnectionFailure, ServerSelectionTimeoutError
 import sys
 
-from api.config import MONGODB_URL, MONGODB_DB_NAME
+from api.config import (
+    MONGODB_URL,
+    MONGODB_DB_NAME,
+    MONGO_MAX_POOL_SIZE,
+    MONGO_MIN_POOL_SIZE,
+    MONGO_SERVER_SELECTION_TIMEOUT_MS,
+    MONGO_CONNECT_TIMEOUT_MS,
+    MONGO_SOCKET_TIMEOUT_MS,
+    MONGO_WAIT_QUEUE_TIMEOUT_MS
+)
 
 _client: MongoClient = None
 _database: Database = None
 
+_async_client: AsyncMongoClient = None
+_async_database: AsyncDatabase = None
+_async_lock = asyncio.Lock()
+
+
+def _client_options() -> dict:
+    """Pool de conexiones y timeouts comunes a ambos clientes."""
+    return {
+        "maxPoolSize": MONGO_MAX_POOL_SIZE,
+        "minPoolSize": MONGO_MIN_POOL_SIZE,
+        "serverSelectionTimeoutMS": MONGO_SERVER_SELECTION_TIMEOUT_MS,
+        "connectTimeoutMS": MONGO_CONNECT_TIMEOUT_MS,
+        "socketTimeoutMS": MONGO_SOCKET_TIMEOUT_MS,
+        "waitQueueTimeoutMS": MONGO_WAIT_QUEUE_TIMEOUT_MS,
+    }
+
 
 def get_database() -> Database:
     """
@@ -30,10 +63,7 @@ def get_database() -> Database:
         return _database
     
     try:
-        _client = MongoClient(
-            MONGODB_URL,
-            serverSelectionTimeoutMS=5000  # 5 segundos timeout
-        )
+        _client = MongoClient(MONGODB_URL, **_client_options())
         # Verificar conexión
         _client.admin.command('ping')
         _database = _client[MONGODB_DB_NAME]
@@ -55,3 +85,50 @@ def close_connection():
         _database = None
         print("🔌 Conexión a MongoDB cerrada")
 
+
+
+async def get_async_database() -> AsyncDatabase:
+    """
+    Obtiene la base de datos sobre el cliente async (AsyncMongoClient).
+    Crea la conexión si no existe; debe llamarse dentro del event loop de la API.
+    
+    Returns:
+        AsyncDatabase: Instancia de la base de datos MongoDB
+        
+    Raises:
+        ConnectionFailure: Si no se puede conectar a MongoDB
+    """
+    global _async_client, _async_database
+    
+    if _async_database is not None:
+        return _async_database
+    
+    async with _async_lock:
+        # Otra corrutina pudo crear el cliente mientras se esperaba el lock
+        if _async_database is not None:
+            return _async_database
+        
+        client = AsyncMongoClient(MONGODB_URL, **_client_options())
+        try:
+            # Verificar conexión
+            await client.admin.command('ping')
+        except (ConnectionFailure, ServerSelectionTimeoutError) as e:
+            await client.close()
+            print(f"❌ Error conectando a MongoDB (async): {e}")
+            print(f"   URL: {MONGODB_URL}")
+            raise
+        
+        _async_client = client
+        _async_database = client[MONGODB_DB_NAME]
+        print(f"✅ Conectado a MongoDB (async): {MONGODB_DB_NAME}")
+        return _async_database
+
+
+async def aclose_connection():
+    """Cierra la conexión async a MongoDB"""
+    global _async_client, _async_database
+    if _async_client is not None:
+        await _async_client.close()
+        _async_client = None
+        _async_database = None
+        print("🔌 Conexión async a MongoDB cerrada")
@@ -0,0 +1,224 @@
+"""
+Gestión de índices de MongoDB
+- Declara los índices que necesitan las consultas del Repository
+- ensure_indexes(): los crea al iniciar la API (idempotente)
+- index_report(): estado de cada índice (listo, construyéndose, faltante)
+- explain_checks(): ejecuta explain() sobre las consultas reales y marca
+  las que hacen COLLSCAN, ordenan en memoria o examinan demasiados documentos
+
+Uso (desde backend/):
+    python -m api.db.indexes            # crea índices e imprime el estado
+    python -m api.db.indexes --explain  # además valida los planes (exit 1 si alguno falla)
+"""
+
+import argparse
+import asyncio
+import sys
+from typing import Any, Dict, List
+
+from pymongo import ASCENDING, DESCENDING, IndexModel
+from pymongo.asynchronous.database import AsyncDatabase
+from pymongo.errors import OperationFailure
+
+from api.config import PAGE_SIZE_DEFAULT
+
+# Docs examinados por documento devuelto a partir del cual una consulta se marca
+MAX_DOCS_EXAMINED_RATIO = 2.0
+
+# =============================
+# ÍNDICES DECLARADOS
+# =============================
+
+INDEXES: Dict[str, List[IndexModel]] = {
+    # get_user_by_email + unicidad del email (evita duplicados por carreras)
+    "users": [
+        IndexModel([("email", ASCENDING)], name="email_unique", unique=True),
+    ],
+    # get_user_conversations: filtro por user_id, keyset (updated_at desc, _id desc)
+    "conversations": [
+        IndexModel(
+            [("user_id", ASCENDING), ("updated_at", DESCENDING), ("_id", DESCENDING)],
+            name="user_updated_id"
+        ),
+    ],
+    # get_conversation_messages: filtro por conversation_id, keyset (created_at, _id)
+    # (también cubre el delete_many de la eliminación en cascada)
+    "messages": [
+        IndexModel(
+            [("conversation_id", ASCENDING), ("created_at", ASCENDING), ("_id", ASCENDING)],
+            name="conversation_created_id"
+        ),
+    ],
+}
+
+
+async def ensure_indexes(db: AsyncDatabase) -> Dict[str, List[str]]:
+    """
+    Crea los índices declarados (no hace nada si ya existen).
+    Un fallo en una colección (p. ej. emails duplicados que impiden el índice
+    único) se reporta sin abortar el resto.
+
+    Returns:
+        Dict {colección: [nombres creados/existentes]}; los fallos como "error: ..."
+    """
+    result: Dict[str, List[str]] = {}
+    for collection_name, models in INDEXES.items():
+        try:
+            result[collection_name] = await db[collection_name].create_indexes(models)
+        except OperationFailure as e:
+            result[collection_name] = [f"error: {e.details.get('errmsg', str(e)) if e.details else e}"]
+    return result
+
+
+async def _building_indexes(db: AsyncDatabase) -> Dict[str, List[str]]:
+    """Índices con construcción en curso, según currentOp (vacío si no hay permisos)."""
+    building: Dict[str, List[str]] = {}
+    try:
+        ops = await db.client.admin.command(
+            "currentOp", {"command.createIndexes": {"$exists": True}, "ns": {"$regex": f"^{db.name}\\."}}
+        )
+    except OperationFailure:
+        return building
+    for op in ops.get("inprog", []):
+        command = op.get("command", {})
+        collection_name = command.get("createIndexes")
+        for index in command.get("indexes", []):
+            building.setdefault(collection_name, []).append(index.get("name"))
+    return building
+
+
+async def index_report(db: AsyncDatabase) -> List[Dict[str, Any]]:
+    """
+    Estado de cada índice declarado.
+
+    Returns:
+        Lista de {"collection", "index", "state"} con state en
+        "ready", "building" o "missing"
+    """
+    building = await _building_indexes(db)
+    report = []
+    for collection_name, models in INDEXES.items():
+        existing = {index["name"] async for index in await db[collection_name].list_indexes()}
+        for model in models:
+            name = model.document["name"]
+            if name in building.get(collection_name, []):
+                state = "building"
+            elif name in existing:
+                state = "ready"
+            else:
+                state = "missing"
+            report.append({"collection": collection_name, "index": name, "state": state})
+    return report
+
+
+# =============================
+# EXPLAIN-PLAN CHECKS
+# =============================
+
+def _plan_stages(plan: Dict[str, Any]) -> List[str]:
+    """Etapas de un plan de ejecución (recorre inputStage/inputStages/queryPlan)."""
+    stages = [plan["stage"]] if "stage" in plan else []
+    for key in ("inputStage", "queryPlan"):
+        if isinstance(plan.get(key), dict):
+            stages.extend(_plan_stages(plan[key]))
+    for child in plan.get("inputStages", []):
+        stages.extend(_plan_stages(child))
+    return stages
+
+
+def _representative_queries(db: AsyncDatabase, sample: Dict[str, Any]):
+    """Las consultas del Repository (primera página), con valores tomados de documentos reales."""
+    return [
+        ("users.by_email", db["users"].find({"email": sample.get("email", "")})),
+        (
+            "conversations.by_user",
+            db["conversations"].find({"user_id": sample.get("user_id", "")})
+            .sort([("updated_at", DESCENDING), ("_id", DESCENDING)]).limit(PAGE_SIZE_DEFAULT + 1),
+        ),
+        (
+            "messages.by_conversation",
+            db["messages"].find({"conversation_id": sample.get("conversation_id", "")})
+            .sort([("created_at", ASCENDING), ("_id", ASCENDING)]).limit(PAGE_SIZE_DEFAULT + 1),
+        ),
+    ]
+
+
+async def explain_checks(db: AsyncDatabase) -> List[Dict[str, Any]]:
+    """
+    Ejecuta explain() sobre las consultas del Repository.
+
+    Returns:
+        Lista de {"query", "stages", "docs_examined", "returned", "ms", "problems"};
+        `problems` vacío significa que el plan es correcto
+    """
+    user = await db["users"].find_one({}, {"email": 1}) or {}
+    conversation = await db["conversations"].find_one({}, {"user_id": 1}) or {}
+    sample = {
+        "email": user.get("email"),
+        "user_id": conversation.get("user_id"),
+        "conversation_id": str(conversation["_id"]) if conversation else "",
+    }
+
+    results = []
+    for name, cursor in _representative_queries(db, sample):
+        explain = await cursor.explain()
+        stages = _plan_stages(explain["queryPlanner"]["winningPlan"])
+        stats = explain.get("executionStats", {})
+        examined = stats.get("totalDocsExamined", 0)
+        returned = stats.get("nReturned", 0)
+
+        problems = []
+        if "COLLSCAN" in stages:
+            problems.append("COLLSCAN: la consulta no usa índice")
+        if "SORT" in stages:
+            problems.append("SORT: ordenamiento en memoria")
+        if examined > max(returned, 1) * MAX_DOCS_EXAMINED_RATIO:
+            problems.append(f"examina {examined} docs para devolver {returned}")
+
+        results.append({
+            "query": name,
+            "stages": stages,
+            "docs_examined": examined,
+            "returned": returned,
+            "ms": stats.get("executionTimeMillis"),
+            "problems": problems,
+        })
+    return results
+
+
+# =============================
+# CLI
+# =============================
+
+async def _main(run_explain: bool) -> int:
+    from api.db.client import get_async_database, aclose_connection
+
+    db = await get_async_database()
+    try:
+        created = await ensure_indexes(db)
+        for collection_name, names in created.items():
+            print(f"📇 {collection_name}: {', '.join(names)}")
+        for entry in await index_report(db):
+            print(f"   {entry['collection']}.{entry['index']}: {entry['state']}")
+
+        if not run_explain:
+            return 0
+
+        failed = 0
+        for check in await explain_checks(db):
+            status = "✅" if not check["problems"] else "❌"
+            print(f"{status} {check['query']}: {' → '.join(check['stages'])} "
+                  f"(examinados {check['docs_examined']}, devueltos {check['returned']}, {check['ms']} ms)")
+            for problem in check["problems"]:
+                print(f"     - {problem}")
+            failed += bool(check["problems"])
+        return 1 if failed else 0
+    finally:
+        await aclose_connection()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Índices de MongoDB")
+    parser.add_argument("--explain", action="store_true", help="Valida los planes de las consultas")
+    args = parser.parse_args()
+    sys.exit(asyncio.run(_main(args.explain)))
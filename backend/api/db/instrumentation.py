@@ -0,0 +1,16 @@
+"""
+Instrumentación de las operaciones del Repository
+- Latencia y errores en las métricas (mongo_operation_seconds / _errors_total)
+- Un span OpenTelemetry por operación (mongo.<op>), hijo de la solicitud
+"""
+
+from metrics import MONGO_SECONDS, MONGO_ERRORS, timed
+from tracing import traced
+
+
+def mongo_op(op: str):
+    """Decorador para los métodos del Repository (sync o async)."""
+    def decorator(func):
+        func = timed(MONGO_SECONDS, MONGO_ERRORS, op=op)(func)
+        return traced(f"mongo.{op}", **{"db.system": "mongodb", "db.operation": op})(func)
+    return decorator
@@ -0,0 +1,116 @@
+"""
+Paginación por keyset (cursor) para listados de MongoDB
+
+En lugar de skip/offset (cuyo costo crece con la página) cada página
+continúa desde la última clave vista (fecha, _id), usando el índice
+compuesto: el costo por solicitud es constante aunque la conversación
+tenga miles de mensajes. El _id desempata documentos con la misma fecha.
+
+El cursor es opaco para el cliente: base64url de "<fecha ISO>|<_id>".
+
+Con `tail` (mensajes de una conversación) la página sin cursor es la
+última del orden natural —lo más reciente— y se sigue con `before`.
+"""
+
+import base64
+from datetime import datetime
+from typing import Any, Dict, List, Optional, Tuple
+
+from bson import ObjectId
+from bson.errors import InvalidId
+from pymongo import ASCENDING
+
+
+def now() -> datetime:
+    """
+    Hora UTC truncada a milisegundos (la precisión que guarda MongoDB), así
+    un documento devuelto sin releerlo produce el mismo cursor que el leído.
+    """
+    t = datetime.utcnow()
+    return t.replace(microsecond=t.microsecond // 1000 * 1000)
+
+
+# Proyecciones de los listados: solo los campos que devuelve la API
+CONVERSATION_FIELDS = {"user_id": 1, "title": 1, "created_at": 1, "updated_at": 1}
+MESSAGE_FIELDS = {"conversation_id": 1, "role": 1, "content": 1, "created_at": 1}
+
+
+def encode_cursor(doc: Dict[str, Any], field: str) -> str:
+    raw = f"{doc[field].isoformat()}|{doc['_id']}"
+    return base64.urlsafe_b64encode(raw.encode("utf-8")).decode("ascii")
+
+
+def decode_cursor(cursor: str) -> Tuple[datetime, ObjectId]:
+    """
+    Raises:
+        ValueError: Si el cursor no es válido
+    """
+    try:
+        raw = base64.urlsafe_b64decode(cursor.encode("ascii")).decode("utf-8")
+        timestamp, doc_id = raw.split("|", 1)
+        return datetime.fromisoformat(timestamp), ObjectId(doc_id)
+    except (ValueError, UnicodeError, InvalidId) as e:
+        raise ValueError(f"Cursor inválido: {cursor}") from e
+
+
+def keyset_query(
+    base_filter: Dict[str, Any],
+    field: str,
+    order: int,
+    before: Optional[str] = None,
+    after: Optional[str] = None,
+    tail: bool = False
+) -> Tuple[Dict[str, Any], List[Tuple[str, int]], bool]:
+    """
+    Construye filtro y orden para una página.
+
+    Args:
+        base_filter: Filtro del listado (p. ej. {"conversation_id": ...})
+        field: Campo de fecha de la clave (created_at / updated_at)
+        order: Orden natural del listado (ASCENDING o DESCENDING)
+        before: Cursor; página anterior (elementos previos en el orden natural)
+        after: Cursor; página siguiente
+        tail: Sin cursor, devolver la última página (como un `before` desde el final)
+
+    Returns:
+        (filtro, orden de la consulta, reversed) — si reversed es True la
+        consulta recorre el índice al revés y la página debe invertirse
+    """
+    if before and after:
+        raise ValueError("Usa 'before' o 'after', no ambos")
+
+    reversed_ = bool(before) or (tail and not after)
+    direction = -order if reversed_ else order
+    query = dict(base_filter)
+
+    cursor = before or after
+    if cursor:
+        timestamp, doc_id = decode_cursor(cursor)
+        op = "$gt" if direction == ASCENDING else "$lt"
+        query["$or"] = [
+            {field: {op: timestamp}},
+            {field: timestamp, "_id": {op: doc_id}},
+        ]
+
+    return query, [(field, direction), ("_id", direction)], reversed_
+
+
+def build_page(
+    docs: List[Dict[str, Any]],
+    limit: int,
+    field: str,
+    reversed_: bool
+) -> Tuple[List[Dict[str, Any]], Optional[str]]:
+    """
+    Recorta la página (la consulta pide limit + 1 para saber si hay más),
+    restaura el orden natural y calcula el cursor para seguir en la misma
+    dirección (usarlo como `after`, o como `before` si se pidió `before`).
+    """
+    has_more = len(docs) > limit
+    docs = docs[:limit]
+    next_cursor = encode_cursor(docs[-1], field) if has_more and docs else None
+    if reversed_:
+        docs.reverse()
+    for doc in docs:
+        doc["_id"] = str(doc["_id"])
+    return docs, next_cursor
@@ -5,11 +5,19 @@ Repository para operaciones CRUD en MongoDB
 - Mensajes
 """
 
-from datetime import datetime
-from typing import Optional, List, Dict, Any
+from typing import Optional, List, Dict, Any, Tuple
 from bson import ObjectId
+from pymongo import ASCENDING, DESCENDING
 
 from api.db.client import get_database
+from api.db.pagination import (
+    now,
+    keyset_query,
+    build_page,
+    CONVERSATION_FIELDS,
+    MESSAGE_FIELDS
+)
+from api.db.instrumentation import mongo_op
 
 
 class Repository:
@@ -25,6 +33,7 @@ class Repository:
     # USUARIOS
     # =============================
     
+    @mongo_op("create_user")
     def create_user(self, username: str, email: str) -> str:
         """
         Crea un nuevo usuario.
@@ -39,11 +48,12 @@ class Repository:
         user_doc = {
             "username": username,
             "email": email,
-            "created_at": datetime.utcnow()
+            "created_at": now()
         }
         result = self.users_collection.insert_one(user_doc)
         return str(result.inserted_id)
     
+    @mongo_op("get_user")
     def get_user(self, user_id: str) -> Optional[Dict[str, Any]]:
         """
         Obtiene un usuario por ID.
@@ -62,6 +72,7 @@ class Repository:
         except Exception:
             return None
     
+    @mongo_op("get_user_by_email")
     def get_user_by_email(self, email: str) -> Optional[Dict[str, Any]]:
         """
         Obtiene un usuario por email.
@@ -81,6 +92,7 @@ class Repository:
     # CONVERSACIONES
     # =============================
     
+    @mongo_op("create_conversation")
     def create_conversation(self, user_id: str, title: Optional[str] = None) -> str:
         """
         Crea una nueva conversación.
@@ -98,12 +110,13 @@ class Repository:
         conversation_doc = {
             "user_id": user_id,
             "title": title,
-            "created_at": datetime.utcnow(),
-            "updated_at": datetime.utcnow()
+            "created_at": now(),
+            "updated_at": now()
         }
         result = self.conversations_collection.insert_one(conversation_doc)
         return str(result.inserted_id)
     
+    @mongo_op("get_conversation")
     def get_conversation(self, conversation_id: str) -> Optional[Dict[str, Any]]:
         """
         Obtiene una conversación por ID.
@@ -124,24 +137,37 @@ class Repository:
         except Exception:
             return None
     
-    def get_user_conversations(self, user_id: str) -> List[Dict[str, Any]]:
+    @mongo_op("get_user_conversations")
+    def get_user_conversations(
+        self,
+        user_id: str,
+        limit: int,
+        before: Optional[str] = None,
+        after: Optional[str] = None
+    ) -> Tuple[List[Dict[str, Any]], Optional[str]]:
         """
-        Obtiene todas las conversaciones de un usuario.
+        Obtiene una página de conversaciones de un usuario (keyset sobre (updated_at, _id)).
         
         Args:
             user_id: ID del usuario
+            limit: Tamaño de la página
+            before: Cursor; conversaciones más recientes que el cursor
+            after: Cursor; conversaciones más antiguas que el cursor
             
         Returns:
-            Lista de conversaciones ordenadas por fecha de actualización descendente
+            (conversaciones ordenadas por fecha de actualización descendente, cursor siguiente o None)
+            
+        Raises:
+            ValueError: Si el cursor no es válido
         """
-        conversations = list(
-            self.conversations_collection.find({"user_id": user_id})
-            .sort("updated_at", -1)
+        query, sort, reversed_ = keyset_query(
+            {"user_id": user_id}, "updated_at", DESCENDING, before, after
         )
-        for conv in conversations:
-            conv["_id"] = str(conv["_id"])
-        return conversations
+        cursor = self.conversations_collection.find(query, CONVERSATION_FIELDS).sort(sort).limit(limit + 1)
+        docs = list(cursor)
+        return build_page(docs, limit, "updated_at", reversed_)
     
+    @mongo_op("update_conversation_title")
     def update_conversation_title(self, conversation_id: str, title: str) -> bool:
         """
         Actualiza el título de una conversación.
@@ -159,7 +185,7 @@ class Repository:
                 {
                     "$set": {
                         "title": title,
-                        "updated_at": datetime.utcnow()
+                        "updated_at": now()
                     }
                 }
             )
@@ -167,6 +193,7 @@ class Repository:
         except Exception:
             return False
     
+    @mongo_op("delete_conversation")
     def delete_conversation(self, conversation_id: str) -> bool:
         """
         Elimina una conversación y todos sus mensajes asociados (cascada).
@@ -201,12 +228,13 @@ class Repository:
     # MENSAJES
     # =============================
     
+    @mongo_op("save_message")
     def save_message(
         self,
         conversation_id: str,
         role: str,
         content: str
-    ) -> str:
+    ) -> Dict[str, Any]:
         """
         Guarda un mensaje en una conversación.
         
@@ -216,45 +244,57 @@ class Repository:
             content: Contenido del mensaje
             
         Returns:
-            str: ID del mensaje guardado
+            Dict con el mensaje guardado (sin releerlo de la base)
         """
         message_doc = {
             "conversation_id": conversation_id,
             "role": role,
             "content": content,
-            "created_at": datetime.utcnow()
+            "created_at": now()
         }
-        result = self.messages_collection.insert_one(message_doc)
+        self.messages_collection.insert_one(message_doc)
         
         # Actualizar updated_at de la conversación
         try:
             self.conversations_collection.update_one(
                 {"_id": ObjectId(conversation_id)},
-                {"$set": {"updated_at": datetime.utcnow()}}
+                {"$set": {"updated_at": now()}}
             )
         except Exception:
             pass  # No crítico si falla
         
-        return str(result.inserted_id)
+        message_doc["_id"] = str(message_doc["_id"])
+        return message_doc
     
+    @mongo_op("get_conversation_messages")
     def get_conversation_messages(
         self,
-        conversation_id: str
-    ) -> List[Dict[str, Any]]:
+        conversation_id: str,
+        limit: int,
+        before: Optional[str] = None,
+        after: Optional[str] = None
+    ) -> Tuple[List[Dict[str, Any]], Optional[str]]:
         """
-        Obtiene todos los mensajes de una conversación.
+        Obtiene una página de mensajes de una conversación (keyset sobre (created_at, _id)).
         
         Args:
             conversation_id: ID de la conversación
+            limit: Tamaño de la página
+            before: Cursor; mensajes anteriores al cursor
+            after: Cursor; mensajes posteriores al cursor
+            
+        Sin cursor se devuelven los `limit` mensajes más recientes; el
+        cursor siguiente pide los anteriores con `before`.
             
         Returns:
-            Lista de mensajes ordenados por fecha de creación ascendente
+            (mensajes ordenados por fecha de creación ascendente, cursor siguiente o None)
+            
+        Raises:
+            ValueError: Si el cursor no es válido
         """
-        messages = list(
-            self.messages_collection.find({"conversation_id": conversation_id})
-            .sort("created_at", 1)
+        query, sort, reversed_ = keyset_query(
+            {"conversation_id": conversation_id}, "created_at", ASCENDING, before, after, tail=True
         )
-        for msg in messages:
-            msg["_id"] = str(msg["_id"])
-        return messages
-
+        cursor = self.messages_collection.find(query, MESSAGE_FIELDS).sort(sort).limit(limit + 1)
+        docs = list(cursor)
+        return build_page(docs, limit, "created_at", reversed_)
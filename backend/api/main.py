@@ -3,11 +3,18 @@ FastAPI Application Principal
 """
 
 from fastapi import FastAPI
+from fastapi.responses import PlainTextResponse
 from fastapi.middleware.cors import CORSMiddleware
 from contextlib import asynccontextmanager
 
+import metrics
+import tracing
 from api.config import CORS_ORIGINS, API_PREFIX
-from api.db.client import get_database, close_connection
+from api.db.client import get_async_database, aclose_connection, close_connection
+from api.db.indexes import ensure_indexes, index_report
+from api.middleware import TracingMiddleware
+from api.services import db_service
+from api.services.persistence_service import persistence_queue
 from api.routers import chat
 
 
@@ -16,20 +23,35 @@ async def lifespan(app: FastAPI):
     """
     Lifespan events: inicializar y cerrar conexiones
     """
-    # Startup: inicializar MongoDB
+    # Startup: inicializar MongoDB (cliente async, usado por los endpoints)
     print("🚀 Iniciando aplicación...")
     try:
-        get_database()
+        db = await get_async_database()
         print("✅ MongoDB inicializado")
+        
+        # Índices que necesitan las consultas del repository (idempotente)
+        created = await ensure_indexes(db)
+        for collection_name, names in created.items():
+            print(f"📇 Índices {collection_name}: {', '.join(names)}")
+        pending = [e for e in await index_report(db) if e["state"] != "ready"]
+        for entry in pending:
+            print(f"⚠️  Índice {entry['collection']}.{entry['index']}: {entry['state']}")
     except Exception as e:
         print(f"⚠️  Advertencia: No se pudo conectar a MongoDB: {e}")
         print("   La aplicación continuará, pero algunas funciones pueden no funcionar")
     
+    # Worker de persistencia diferida de mensajes del RAG
+    persistence_queue.start()
+    
     yield
     
-    # Shutdown: cerrar conexiones
+    # Shutdown: guardar los mensajes encolados y cerrar conexiones
     print("🛑 Cerrando aplicación...")
+    await persistence_queue.stop()
+    await aclose_connection()
+    db_service.reset_async_repository()
     close_connection()
+    tracing.shutdown()
 
 
 # Crear aplicación FastAPI
@@ -47,8 +69,12 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=["X-Next-Cursor", "Server-Timing", "Retry-After"],
 )
 
+# Span raíz OpenTelemetry por solicitud (no-op si TRACING_EXPORTER="none")
+app.add_middleware(TracingMiddleware)
+
 # Registrar routers
 app.include_router(chat.router, prefix=API_PREFIX, tags=["chat"])
 
@@ -74,8 +100,8 @@ async def health():
     """
     try:
         # Verificar conexión a MongoDB
-        db = get_database()
-        db.admin.command('ping')
+        db = await get_async_database()
+        await db.client.admin.command('ping')
         mongo_status = "connected"
     except Exception:
         mongo_status = "disconnected"
@@ -85,3 +111,12 @@ async def health():
         "mongodb": mongo_status
     }
 
+
+
+@app.get("/metrics", response_class=PlainTextResponse)
+async def metrics_endpoint():
+    """
+    Métricas en formato de texto de Prometheus: latencia por etapa del
+    pipeline y por operación de MongoDB, tokens, errores y cachés.
+    """
+    return PlainTextResponse(metrics.render(), media_type="text/plain; version=0.0.4")
@@ -0,0 +1,46 @@
+"""
+Middlewares ASGI de la API
+- TracingMiddleware: span raíz OpenTelemetry por solicitud HTTP
+"""
+
+import tracing
+
+
+class TracingMiddleware:
+    """
+    Abre un span SERVER por solicitud; los spans del pipeline y de MongoDB
+    cuelgan de él. Es ASGI puro (no BaseHTTPMiddleware) para que el span
+    cubra también el cuerpo de las respuestas en streaming (SSE).
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        method = scope["method"]
+        with tracing.span(f"{method} {scope['path']}", kind=tracing.SpanKind.SERVER, **{
+            "http.method": method,
+            "http.target": scope["path"],
+        }) as current:
+            status = {}
+
+            async def send_wrapper(message):
+                if message["type"] == "http.response.start":
+                    status["code"] = message["status"]
+                    current.set_attribute("http.status_code", message["status"])
+                await send(message)
+
+            try:
+                await self.app(scope, receive, send_wrapper)
+            finally:
+                # El router deja la ruta en el scope: nombre de baja cardinalidad
+                route = scope.get("route")
+                if route is not None and hasattr(route, "path"):
+                    current.update_name(f"{method} {route.path}")
+                    current.set_attribute("http.route", route.path)
+                if status.get("code", 500) >= 500:
+                    tracing.set_error(current, f"HTTP {status.get('code', 500)}")
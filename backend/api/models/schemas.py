@@ -82,6 +82,7 @@ class RAGRequest(BaseModel):
     query: str
     user_id: Optional[str] = None
     conversation_id: Optional[str] = None
+    no_cache: bool = False  # True → ignora la caché de respuestas
 
 
 class ChunkResponse(BaseModel):
@@ -96,4 +97,5 @@ class RAGResponse(BaseModel):
     response: str
     query: str
     chunks: Optional[List[ChunkResponse]] = None
+    profile: Optional[dict] = None  # solo con ?profile=1
 
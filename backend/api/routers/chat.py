@@ -2,9 +2,17 @@
 Endpoints REST para chat, usuarios, conversaciones y RAG
 """
 
-from fastapi import APIRouter, HTTPException, status
-from typing import List
+import asyncio
+import json
+import weakref
 
+from fastapi import APIRouter, HTTPException, Query, Response, status
+from fastapi.responses import StreamingResponse
+from pymongo.errors import DuplicateKeyError
+from typing import List, Optional
+
+import metrics
+from api.config import PAGE_SIZE_DEFAULT, PAGE_SIZE_MAX, RAG_PROFILE_ENABLED
 from api.models.schemas import (
     UserCreate,
     UserResponse,
@@ -17,7 +25,9 @@ from api.models.schemas import (
     ChunkResponse
 )
 from api.services import db_service
-from api.services.rag_service import run_rag_with_chunks
+from api.services.admission_service import AdmissionRejected, admission_controller
+from api.services.persistence_service import persistence_queue
+from api.services.rag_service import arun_rag_with_chunks, astream_rag, get_rag_stats
 
 router = APIRouter()
 
@@ -33,19 +43,19 @@ async def create_user(user_data: UserCreate):
     """
     try:
         # Verificar si el usuario ya existe
-        existing_user = db_service.get_user_by_email(user_data.email)
+        existing_user = await db_service.aget_user_by_email(user_data.email)
         if existing_user:
             raise HTTPException(
                 status_code=status.HTTP_400_BAD_REQUEST,
                 detail="El email ya está registrado"
             )
         
-        user_id = db_service.create_user(
+        user_id = await db_service.acreate_user(
             username=user_data.username,
             email=user_data.email
         )
         
-        user = db_service.get_user(user_id)
+        user = await db_service.aget_user(user_id)
         if not user:
             raise HTTPException(
                 status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
@@ -60,6 +70,12 @@ async def create_user(user_data: UserCreate):
         )
     except HTTPException:
         raise
+    except DuplicateKeyError:
+        # Registro concurrente con el mismo email (índice único)
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="El email ya está registrado"
+        )
     except Exception as e:
         raise HTTPException(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
@@ -72,7 +88,7 @@ async def get_user(user_id: str):
     """
     Obtiene un usuario por ID.
     """
-    user = db_service.get_user(user_id)
+    user = await db_service.aget_user(user_id)
     if not user:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
@@ -92,7 +108,7 @@ async def get_user_by_email(email: str):
     """
     Obtiene un usuario por email.
     """
-    user = db_service.get_user_by_email(email)
+    user = await db_service.aget_user_by_email(email)
     if not user:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
@@ -118,19 +134,19 @@ async def create_conversation(conversation_data: ConversationCreate):
     """
     try:
         # Verificar que el usuario existe
-        user = db_service.get_user(conversation_data.user_id)
+        user = await db_service.aget_user(conversation_data.user_id)
         if not user:
             raise HTTPException(
                 status_code=status.HTTP_404_NOT_FOUND,
                 detail="Usuario no encontrado"
             )
         
-        conversation_id = db_service.create_conversation(
+        conversation_id = await db_service.acreate_conversation(
             user_id=conversation_data.user_id,
             title=conversation_data.title
         )
         
-        conversation = db_service.get_conversation(conversation_id)
+        conversation = await db_service.aget_conversation(conversation_id)
         if not conversation:
             raise HTTPException(
                 status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
@@ -158,7 +174,7 @@ async def get_conversation(conversation_id: str):
     """
     Obtiene una conversación por ID.
     """
-    conversation = db_service.get_conversation(conversation_id)
+    conversation = await db_service.aget_conversation(conversation_id)
     if not conversation:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
@@ -175,19 +191,38 @@ async def get_conversation(conversation_id: str):
 
 
 @router.get("/user/{user_id}/conversations", response_model=List[ConversationResponse])
-async def get_user_conversations(user_id: str):
+async def get_user_conversations(
+    user_id: str,
+    response: Response,
+    limit: int = Query(PAGE_SIZE_DEFAULT, ge=1, le=PAGE_SIZE_MAX),
+    before: Optional[str] = None,
+    after: Optional[str] = None
+):
     """
-    Obtiene todas las conversaciones de un usuario.
+    Obtiene las conversaciones de un usuario, de la más reciente a la más antigua.
+    Paginado por cursor: si hay más resultados, el header X-Next-Cursor trae
+    el cursor para pedir la página siguiente con `after` (o con `before` si
+    se estaba paginando hacia atrás).
     """
     # Verificar que el usuario existe
-    user = db_service.get_user(user_id)
+    user = await db_service.aget_user(user_id)
     if not user:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
             detail="Usuario no encontrado"
         )
     
-    conversations = db_service.get_user_conversations(user_id)
+    try:
+        conversations, next_cursor = await db_service.aget_user_conversations(
+            user_id, limit=limit, before=before, after=after
+        )
+    except ValueError as e:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=str(e)
+        )
+    if next_cursor:
+        response.headers["X-Next-Cursor"] = next_cursor
     return [
         ConversationResponse(
             id=conv["_id"],
@@ -207,7 +242,7 @@ async def delete_conversation(conversation_id: str):
     """
     try:
         # Verificar que la conversación existe
-        conversation = db_service.get_conversation(conversation_id)
+        conversation = await db_service.aget_conversation(conversation_id)
         if not conversation:
             raise HTTPException(
                 status_code=status.HTTP_404_NOT_FOUND,
@@ -215,7 +250,7 @@ async def delete_conversation(conversation_id: str):
             )
         
         # Eliminar conversación y mensajes
-        success = db_service.delete_conversation(conversation_id)
+        success = await db_service.adelete_conversation(conversation_id)
         if not success:
             raise HTTPException(
                 status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
@@ -243,7 +278,7 @@ async def save_message(message_data: MessageCreate):
     """
     try:
         # Verificar que la conversación existe
-        conversation = db_service.get_conversation(message_data.conversation_id)
+        conversation = await db_service.aget_conversation(message_data.conversation_id)
         if not conversation:
             raise HTTPException(
                 status_code=status.HTTP_404_NOT_FOUND,
@@ -257,26 +292,13 @@ async def save_message(message_data: MessageCreate):
                 detail="El role debe ser 'user' o 'assistant'"
             )
         
-        message_id = db_service.save_message(
+        # El repository devuelve el documento insertado: no hace falta releerlo
+        saved_message = await db_service.asave_message(
             conversation_id=message_data.conversation_id,
             role=message_data.role,
             content=message_data.content
         )
         
-        message = db_service.get_conversation_messages(message_data.conversation_id)
-        # Buscar el mensaje recién creado
-        saved_message = None
-        for msg in message:
-            if msg["_id"] == message_id:
-                saved_message = msg
-                break
-        
-        if not saved_message:
-            raise HTTPException(
-                status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
-                detail="Error al guardar el mensaje"
-            )
-        
         return MessageResponse(
             id=saved_message["_id"],
             conversation_id=saved_message["conversation_id"],
@@ -294,19 +316,38 @@ async def save_message(message_data: MessageCreate):
 
 
 @router.get("/conversation/{conversation_id}/messages", response_model=List[MessageResponse])
-async def get_conversation_messages(conversation_id: str):
+async def get_conversation_messages(
+    conversation_id: str,
+    response: Response,
+    limit: int = Query(PAGE_SIZE_DEFAULT, ge=1, le=PAGE_SIZE_MAX),
+    before: Optional[str] = None,
+    after: Optional[str] = None
+):
     """
-    Obtiene todos los mensajes de una conversación.
+    Obtiene los mensajes de una conversación en orden cronológico.
+    Sin cursor devuelve los `limit` más recientes; si hay mensajes más
+    antiguos, el header X-Next-Cursor trae el cursor para pedirlos con
+    `before` (o la página siguiente con `after` si se pidió `after`).
     """
     # Verificar que la conversación existe
-    conversation = db_service.get_conversation(conversation_id)
+    conversation = await db_service.aget_conversation(conversation_id)
     if not conversation:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
             detail="Conversación no encontrada"
         )
     
-    messages = db_service.get_conversation_messages(conversation_id)
+    try:
+        messages, next_cursor = await db_service.aget_conversation_messages(
+            conversation_id, limit=limit, before=before, after=after
+        )
+    except ValueError as e:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=str(e)
+        )
+    if next_cursor:
+        response.headers["X-Next-Cursor"] = next_cursor
     return [
         MessageResponse(
             id=msg["_id"],
@@ -324,38 +365,62 @@ async def get_conversation_messages(conversation_id: str):
 # =============================
 
 @router.post("/rag", response_model=RAGResponse)
-async def query_rag(rag_request: RAGRequest):
+async def query_rag(
+    rag_request: RAGRequest,
+    response: Response,
+    profile: bool = Query(False, description="Desglose por etapa, tokens y cProfile muestreado (RAG_PROFILE_ENABLED)")
+):
     """
     Ejecuta el pipeline RAG para responder una pregunta.
-    Si se proporciona conversation_id, guarda el mensaje del usuario y la respuesta.
+    Si se proporciona conversation_id, el mensaje del usuario y la respuesta
+    se guardan en segundo plano, después de responder (write-behind).
+    El header Server-Timing detalla embed, retrieve, generate y persist (ms).
     """
+    if profile and not RAG_PROFILE_ENABLED:
+        raise HTTPException(
+            status_code=status.HTTP_403_FORBIDDEN,
+            detail="El modo profile está deshabilitado (RAG_PROFILE_ENABLED)"
+        )
+
     try:
-        # Ejecutar pipeline RAG
-        resultado = run_rag_with_chunks(rag_request.query)
-        
-        # Si hay conversation_id, guardar mensajes
-        if rag_request.conversation_id:
-            # Verificar que la conversación existe
-            conversation = db_service.get_conversation(rag_request.conversation_id)
-            if not conversation:
-                raise HTTPException(
-                    status_code=status.HTTP_404_NOT_FOUND,
-                    detail="Conversación no encontrada"
+        with metrics.request_profile() as request_profile:
+            # La conversación se verifica en paralelo con el pipeline RAG
+            conversation_check = None
+            if rag_request.conversation_id:
+                conversation_check = asyncio.create_task(
+                    db_service.aget_conversation(rag_request.conversation_id)
                 )
             
-            # Guardar mensaje del usuario
-            db_service.save_message(
-                conversation_id=rag_request.conversation_id,
-                role="user",
-                content=rag_request.query
-            )
+            # Ejecutar pipeline RAG (async: no bloquea el event loop)
+            try:
+                resultado = await arun_rag_with_chunks(
+                    rag_request.query,
+                    use_cache=not rag_request.no_cache,
+                    profile=profile,
+                    user_id=rag_request.user_id
+                )
+            except Exception:
+                if conversation_check is not None:
+                    conversation_check.cancel()
+                raise
             
-            # Guardar respuesta del assistant
-            db_service.save_message(
-                conversation_id=rag_request.conversation_id,
-                role="assistant",
-                content=resultado["response"]
-            )
+            # Si hay conversation_id, encolar los mensajes (un insert_many + un bulk_write)
+            if conversation_check is not None:
+                with metrics.stage("persist"):
+                    conversation = await conversation_check
+                    if conversation:
+                        await persistence_queue.enqueue_exchange(
+                            rag_request.conversation_id,
+                            rag_request.query,
+                            resultado["response"]
+                        )
+                if not conversation:
+                    raise HTTPException(
+                        status_code=status.HTTP_404_NOT_FOUND,
+                        detail="Conversación no encontrada"
+                    )
+        
+        response.headers["Server-Timing"] = request_profile.server_timing()
         
         # Formatear chunks para la respuesta
         chunks_response = None
@@ -372,13 +437,114 @@ async def query_rag(rag_request: RAGRequest):
         return RAGResponse(
             response=resultado["response"],
             query=resultado["query"],
-            chunks=chunks_response
+            chunks=chunks_response,
+            # Perfil completo de la solicitud (incluye persist) + cProfile si se muestreó
+            profile={**resultado["profile"], **request_profile.as_dict()} if profile else None
         )
     except HTTPException:
         raise
+    except AdmissionRejected as e:
+        raise _admission_error(e)
     except Exception as e:
         raise HTTPException(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
             detail=f"Error ejecutando RAG: {str(e)}"
         )
 
+
+def _admission_error(error: AdmissionRejected) -> HTTPException:
+    """429/503 con Retry-After para una consulta no admitida."""
+    return HTTPException(
+        status_code=error.status_code,
+        detail=str(error),
+        headers={"Retry-After": str(error.retry_after)}
+    )
+
+
+def _sse(event: str, data) -> str:
+    """Formatea un evento Server-Sent Events."""
+    return f"event: {event}\ndata: {json.dumps(data, ensure_ascii=False, default=str)}\n\n"
+
+
+def _chunks_payload(chunks) -> list:
+    return [
+        ChunkResponse(
+            document=chunk["document"],
+            distance=chunk["distance"],
+            metadata=chunk.get("metadata")
+        ).model_dump()
+        for chunk in chunks or []
+    ]
+
+
+@router.post("/rag/stream")
+async def query_rag_stream(rag_request: RAGRequest):
+    """
+    Ejecuta el pipeline RAG respondiendo en streaming (text/event-stream).
+    Eventos: `chunks` (contexto recuperado), `token` (fragmentos de la
+    respuesta), `done` (respuesta completa + TTFB/TTFT) o `error`.
+    Si se proporciona conversation_id, los mensajes se encolan al terminar
+    y se guardan en segundo plano.
+    """
+    # La conversación se valida antes de abrir el stream para poder devolver 404
+    if rag_request.conversation_id:
+        conversation = await db_service.aget_conversation(
+            rag_request.conversation_id
+        )
+        if not conversation:
+            raise HTTPException(
+                status_code=status.HTTP_404_NOT_FOUND,
+                detail="Conversación no encontrada"
+            )
+
+    # El lugar se pide antes de abrir el stream para poder devolver 429/503
+    try:
+        slot = await admission_controller.acquire(rag_request.user_id)
+    except AdmissionRejected as e:
+        raise _admission_error(e)
+
+    async def event_stream():
+        try:
+            async for event, payload in astream_rag(
+                rag_request.query,
+                use_cache=not rag_request.no_cache
+            ):
+                if event == "chunks":
+                    yield _sse("chunks", _chunks_payload(payload))
+                elif event == "token":
+                    yield _sse("token", {"text": payload})
+                elif event == "done":
+                    if rag_request.conversation_id:
+                        await persistence_queue.enqueue_exchange(
+                            rag_request.conversation_id,
+                            rag_request.query,
+                            payload["response"]
+                        )
+                    yield _sse("done", {
+                        "response": payload["response"],
+                        "query": payload["query"],
+                        **payload["timings"]
+                    })
+        except Exception as e:
+            yield _sse("error", {"detail": f"Error ejecutando RAG: {str(e)}"})
+        finally:
+            slot.release()
+
+    stream = event_stream()
+    # Si el cliente se desconecta antes de empezar a leer, el generador nunca
+    # corre su finally: el lugar se libera al recolectarlo
+    weakref.finalize(stream, slot.release)
+    return StreamingResponse(
+        stream,
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
+
+@router.get("/rag/stats")
+async def rag_stats():
+    """
+    Métricas del pipeline RAG (hit rate de cachés y latencia ahorrada)
+    y de la persistencia diferida de mensajes.
+    """
+    return {**get_rag_stats(), "persistence": persistence_queue.stats()}
@@ -0,0 +1,225 @@
+"""
+Control de admisión de las consultas RAG (acotan las llamadas a OpenAI)
+
+- Como mucho RAG_MAX_CONCURRENCY ejecuciones del pipeline a la vez
+- Cola de espera acotada (RAG_MAX_QUEUE) con un máximo por usuario
+  (RAG_MAX_QUEUE_PER_USER); al liberarse un lugar se atiende a los usuarios
+  en round-robin, así uno solo no acapara la cola
+- Nadie espera más de RAG_QUEUE_TIMEOUT_SECONDS: la latencia queda acotada
+  (espera + ejecución) en lugar de crecer sin límite bajo sobrecarga
+- Rechazos rápidos: 503 si la cola está llena o se agotó la espera,
+  429 si el usuario ya tiene demasiadas consultas en cola; ambos con
+  Retry-After estimado a partir del tiempo medio de servicio
+
+El tiempo en cola se mide como la etapa "queue" (rag_stage_seconds y
+Server-Timing).
+"""
+
+import asyncio
+import math
+import time
+from collections import OrderedDict, deque
+from contextlib import asynccontextmanager
+from typing import Deque, Dict, Optional
+
+import metrics
+from api.config import (
+    RAG_MAX_CONCURRENCY,
+    RAG_MAX_QUEUE,
+    RAG_MAX_QUEUE_PER_USER,
+    RAG_QUEUE_TIMEOUT_SECONDS
+)
+
+ANONYMOUS_USER = "anonymous"
+
+ADMISSION_REJECTED = metrics.counter(
+    "rag_admission_rejected_total",
+    "Consultas RAG rechazadas por el control de admisión (reason=queue_full|user_limit|timeout)"
+)
+
+
+class AdmissionRejected(Exception):
+    """La consulta no fue admitida; la API responde status_code con Retry-After."""
+
+    def __init__(self, status_code: int, reason: str, retry_after: int):
+        self.status_code = status_code
+        self.reason = reason
+        self.retry_after = retry_after
+        super().__init__(f"Consulta no admitida ({reason}); reintentar en {retry_after} s")
+
+
+class AdmissionSlot:
+    """Lugar de ejecución concedido; release() es idempotente."""
+
+    def __init__(self, controller: "AdmissionController"):
+        self._controller = controller
+        self._admitted_at = time.perf_counter()
+        self._released = False
+
+    def release(self) -> None:
+        if self._released:
+            return
+        self._released = True
+        self._controller._release(time.perf_counter() - self._admitted_at)
+
+
+class AdmissionController:
+    """Semáforo con cola acotada y reparto equitativo por usuario. Vive en el event loop."""
+
+    def __init__(
+        self,
+        max_concurrency: int = RAG_MAX_CONCURRENCY,
+        max_queue: int = RAG_MAX_QUEUE,
+        max_queue_per_user: int = RAG_MAX_QUEUE_PER_USER,
+        queue_timeout: float = RAG_QUEUE_TIMEOUT_SECONDS
+    ):
+        self.max_concurrency = max_concurrency
+        self.max_queue = max_queue
+        self.max_queue_per_user = max_queue_per_user
+        self.queue_timeout = queue_timeout
+
+        self._active = 0
+        self._queued = 0
+        # usuario → esperas en orden de llegada; el orden de las claves es el turno
+        self._waiters: "OrderedDict[str, Deque[asyncio.Future]]" = OrderedDict()
+        # Tiempo medio de servicio (EWMA), para estimar Retry-After
+        self._service_seconds = 1.0
+
+        self.admitted = 0
+        self.queued_total = 0
+        self.rejected: Dict[str, int] = {"queue_full": 0, "user_limit": 0, "timeout": 0}
+
+    # ---------- admisión ----------
+
+    async def acquire(self, user_id: Optional[str] = None) -> AdmissionSlot:
+        """
+        Espera un lugar de ejecución.
+
+        Raises:
+            AdmissionRejected: Cola llena (503), límite del usuario (429)
+                o espera agotada (503)
+        """
+        user = user_id or ANONYMOUS_USER
+        with metrics.stage("queue"):
+            if self._active < self.max_concurrency and self._queued == 0:
+                self._active += 1
+                self.admitted += 1
+                return AdmissionSlot(self)
+
+            if self._queued >= self.max_queue:
+                raise self._reject(503, "queue_full")
+            if len(self._waiters.get(user, ())) >= self.max_queue_per_user:
+                raise self._reject(429, "user_limit")
+
+            future = asyncio.get_running_loop().create_future()
+            self._waiters.setdefault(user, deque()).append(future)
+            self._queued += 1
+            self.queued_total += 1
+            try:
+                await asyncio.wait_for(future, self.queue_timeout)
+            except asyncio.TimeoutError:
+                if not self._granted(future):
+                    self._remove(user, future)
+                    raise self._reject(503, "timeout")
+                # La espera venció en el mismo tick en que se cedió el
+                # lugar: ya es de esta consulta, se usa
+            except asyncio.CancelledError:
+                if self._granted(future):
+                    # El lugar ya había sido cedido a esta espera: devolverlo
+                    self._hand_back()
+                else:
+                    self._remove(user, future)
+                raise
+
+            if _cancel_requested():
+                # wait_for absorbió una cancelación simultánea a la cesión
+                # (Python < 3.12): quien pidió el lugar ya desistió
+                self._hand_back()
+                raise asyncio.CancelledError()
+
+            self.admitted += 1
+            return AdmissionSlot(self)
+
+    @asynccontextmanager
+    async def slot(self, user_id: Optional[str] = None):
+        """`async with controller.slot(user_id):` ejecuta el bloque con un lugar."""
+        slot = await self.acquire(user_id)
+        try:
+            yield slot
+        finally:
+            slot.release()
+
+    # ---------- internos ----------
+
+    def _release(self, service_seconds: Optional[float] = None) -> None:
+        if service_seconds is not None:
+            self._service_seconds = 0.9 * self._service_seconds + 0.1 * service_seconds
+        # El lugar pasa directamente al siguiente usuario en turno
+        while self._waiters:
+            user, queue = next(iter(self._waiters.items()))
+            future = queue.popleft()
+            if queue:
+                self._waiters.move_to_end(user)
+            else:
+                del self._waiters[user]
+            # Sale de la cola en ambos casos: si ya estaba cancelada, su
+            # _remove() no la va a encontrar
+            self._queued -= 1
+            if future.done():
+                continue
+            future.set_result(None)
+            return
+        self._active -= 1
+
+    def _hand_back(self) -> None:
+        """Devuelve un lugar cedido que nadie va a usar (sin contar tiempo de servicio)."""
+        self._release()
+
+    @staticmethod
+    def _granted(future: asyncio.Future) -> bool:
+        return future.done() and not future.cancelled()
+
+    def _remove(self, user: str, future: asyncio.Future) -> None:
+        queue = self._waiters.get(user)
+        if queue is None or future not in queue:
+            return
+        queue.remove(future)
+        self._queued -= 1
+        if not queue:
+            del self._waiters[user]
+
+    def _reject(self, status_code: int, reason: str) -> AdmissionRejected:
+        self.rejected[reason] += 1
+        ADMISSION_REJECTED.inc(reason=reason)
+        return AdmissionRejected(status_code, reason, self.retry_after())
+
+    def retry_after(self) -> int:
+        """Segundos estimados hasta que se vacíe la cola actual (1–60)."""
+        waves = (self._queued + 1) / self.max_concurrency
+        return max(1, min(60, math.ceil(waves * self._service_seconds)))
+
+    # ---------- métricas ----------
+
+    def stats(self) -> dict:
+        return {
+            "active": self._active,
+            "queued": self._queued,
+            "users_waiting": len(self._waiters),
+            "max_concurrency": self.max_concurrency,
+            "max_queue": self.max_queue,
+            "admitted": self.admitted,
+            "queued_total": self.queued_total,
+            "rejected": sum(self.rejected.values()),
+            **{f"rejected_{reason}": count for reason, count in self.rejected.items()},
+            "avg_service_ms": self._service_seconds * 1000,
+        }
+
+
+def _cancel_requested() -> bool:
+    task = asyncio.current_task()
+    cancelling = getattr(task, "cancelling", None)  # Python 3.11+
+    return bool(cancelling and cancelling())
+
+
+admission_controller = AdmissionController()
+metrics.register_stats("rag_admission", admission_controller.stats)
@@ -1,12 +1,20 @@
 """
 Servicio de base de datos - Wrapper del repository
+- Funciones async (acreate_user, aget_user, ...): AsyncRepository sobre
+  AsyncMongoClient, usadas por los endpoints
+- Funciones síncronas: Repository (pymongo síncrono), para scripts; hoy
+  solo las usa benchmarks/bench_mongo_async.py como línea base síncrona
 """
 
-from typing import Optional, List, Dict, Any
+from typing import Optional, List, Dict, Any, Tuple
+from api.config import PAGE_SIZE_DEFAULT
+from api.db.client import get_async_database
 from api.db.repository import Repository
+from api.db.async_repository import AsyncRepository
 
 # Instancia singleton del repository
 _repository: Optional[Repository] = None
+_async_repository: Optional[AsyncRepository] = None
 
 
 def get_repository() -> Repository:
@@ -17,6 +25,23 @@ def get_repository() -> Repository:
     return _repository
 
 
+async def get_async_repository() -> AsyncRepository:
+    """Obtiene la instancia del repository async (singleton)"""
+    global _async_repository
+    if _async_repository is None:
+        db = await get_async_database()
+        # Sin await entre la comprobación y la asignación: una sola instancia
+        if _async_repository is None:
+            _async_repository = AsyncRepository(db)
+    return _async_repository
+
+
+def reset_async_repository() -> None:
+    """Descarta el repository async (al cerrar la conexión async)"""
+    global _async_repository
+    _async_repository = None
+
+
 # =============================
 # USUARIOS
 # =============================
@@ -55,10 +80,15 @@ def get_conversation(conversation_id: str) -> Optional[Dict[str, Any]]:
     return repo.get_conversation(conversation_id)
 
 
-def get_user_conversations(user_id: str) -> List[Dict[str, Any]]:
-    """Obtiene todas las conversaciones de un usuario"""
+def get_user_conversations(
+    user_id: str,
+    limit: int = PAGE_SIZE_DEFAULT,
+    before: Optional[str] = None,
+    after: Optional[str] = None
+) -> Tuple[List[Dict[str, Any]], Optional[str]]:
+    """Obtiene una página de conversaciones de un usuario y el cursor siguiente"""
     repo = get_repository()
-    return repo.get_user_conversations(user_id)
+    return repo.get_user_conversations(user_id, limit, before, after)
 
 
 def delete_conversation(conversation_id: str) -> bool:
@@ -71,14 +101,93 @@ def delete_conversation(conversation_id: str) -> bool:
 # MENSAJES
 # =============================
 
-def save_message(conversation_id: str, role: str, content: str) -> str:
-    """Guarda un mensaje en una conversación"""
+def save_message(conversation_id: str, role: str, content: str) -> Dict[str, Any]:
+    """Guarda un mensaje en una conversación y devuelve el documento insertado"""
     repo = get_repository()
     return repo.save_message(conversation_id, role, content)
 
 
-def get_conversation_messages(conversation_id: str) -> List[Dict[str, Any]]:
-    """Obtiene todos los mensajes de una conversación"""
+def get_conversation_messages(
+    conversation_id: str,
+    limit: int = PAGE_SIZE_DEFAULT,
+    before: Optional[str] = None,
+    after: Optional[str] = None
+) -> Tuple[List[Dict[str, Any]], Optional[str]]:
+    """Obtiene una página de mensajes de una conversación y el cursor siguiente"""
     repo = get_repository()
-    return repo.get_conversation_messages(conversation_id)
+    return repo.get_conversation_messages(conversation_id, limit, before, after)
+
+
+
+# =============================
+# API ASYNC (AsyncMongoClient)
+# =============================
+
+async def acreate_user(username: str, email: str) -> str:
+    """Crea un nuevo usuario"""
+    repo = await get_async_repository()
+    return await repo.create_user(username, email)
+
+
+async def aget_user(user_id: str) -> Optional[Dict[str, Any]]:
+    """Obtiene un usuario por ID"""
+    repo = await get_async_repository()
+    return await repo.get_user(user_id)
+
+
+async def aget_user_by_email(email: str) -> Optional[Dict[str, Any]]:
+    """Obtiene un usuario por email"""
+    repo = await get_async_repository()
+    return await repo.get_user_by_email(email)
+
+
+async def acreate_conversation(user_id: str, title: Optional[str] = None) -> str:
+    """Crea una nueva conversación"""
+    repo = await get_async_repository()
+    return await repo.create_conversation(user_id, title)
+
+
+async def aget_conversation(conversation_id: str) -> Optional[Dict[str, Any]]:
+    """Obtiene una conversación por ID"""
+    repo = await get_async_repository()
+    return await repo.get_conversation(conversation_id)
+
+
+async def aget_user_conversations(
+    user_id: str,
+    limit: int = PAGE_SIZE_DEFAULT,
+    before: Optional[str] = None,
+    after: Optional[str] = None
+) -> Tuple[List[Dict[str, Any]], Optional[str]]:
+    """Obtiene una página de conversaciones de un usuario y el cursor siguiente"""
+    repo = await get_async_repository()
+    return await repo.get_user_conversations(user_id, limit, before, after)
+
+
+async def adelete_conversation(conversation_id: str) -> bool:
+    """Elimina una conversación y todos sus mensajes asociados"""
+    repo = await get_async_repository()
+    return await repo.delete_conversation(conversation_id)
+
+
+async def asave_message(conversation_id: str, role: str, content: str) -> Dict[str, Any]:
+    """Guarda un mensaje en una conversación y devuelve el documento insertado"""
+    repo = await get_async_repository()
+    return await repo.save_message(conversation_id, role, content)
+
+
+async def asave_messages(messages: List[Dict[str, Any]]) -> int:
+    """Guarda varios mensajes con una escritura en bloque"""
+    repo = await get_async_repository()
+    return await repo.save_messages(messages)
+
 
+async def aget_conversation_messages(
+    conversation_id: str,
+    limit: int = PAGE_SIZE_DEFAULT,
+    before: Optional[str] = None,
+    after: Optional[str] = None
+) -> Tuple[List[Dict[str, Any]], Optional[str]]:
+    """Obtiene una página de mensajes de una conversación y el cursor siguiente"""
+    repo = await get_async_repository()
+    return await repo.get_conversation_messages(conversation_id, limit, before, after)
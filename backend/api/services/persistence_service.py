@@ -0,0 +1,169 @@
+"""
+Persistencia diferida (write-behind) de los mensajes del RAG
+
+Los endpoints RAG encolan el par pregunta/respuesta y devuelven la
+respuesta sin esperar a MongoDB. Un worker en segundo plano vacía la
+cola por lotes: un insert_many con todos los mensajes pendientes y un
+bulk_write del updated_at de sus conversaciones.
+
+- Cola acotada: si se llena, encolar espera (contrapresión)
+- Reintentos con backoff; los lotes que fallan igualmente se cuentan en
+  las métricas (failed_batches, failed_messages, last_error)
+- Cada mensaje recibe su _id al encolarse: reintentar un lote que ya se
+  insertó (total o parcialmente) no duplica mensajes
+- flush() al apagar la API (lifespan) para no perder mensajes encolados
+- Cada lote es una traza propia (persistence.flush) con links a las
+  solicitudes que encolaron sus mensajes
+"""
+
+import asyncio
+import time
+from typing import Any, Dict, List, Optional
+
+from bson import ObjectId
+
+import metrics
+import tracing
+from api.config import (
+    PERSIST_QUEUE_MAX_SIZE,
+    PERSIST_BATCH_MAX_MESSAGES,
+    PERSIST_MAX_RETRIES,
+    PERSIST_SHUTDOWN_TIMEOUT_SECONDS
+)
+from api.db.pagination import now
+from api.services import db_service
+
+
+class PersistenceQueue:
+    """Cola de mensajes pendientes de guardar + worker que escribe por lotes."""
+
+    def __init__(
+        self,
+        maxsize: int = PERSIST_QUEUE_MAX_SIZE,
+        batch_max_messages: int = PERSIST_BATCH_MAX_MESSAGES,
+        max_retries: int = PERSIST_MAX_RETRIES
+    ):
+        self.maxsize = maxsize
+        self.batch_max_messages = batch_max_messages
+        self.max_retries = max_retries
+        self._queue: Optional[asyncio.Queue] = None
+        self._worker: Optional[asyncio.Task] = None
+
+        self.enqueued = 0
+        self.written_messages = 0
+        self.batches = 0
+        self.retries = 0
+        self.failed_batches = 0
+        self.failed_messages = 0
+        self.last_error: Optional[str] = None
+        self._write_seconds_total = 0.0
+
+    # ---------- ciclo de vida ----------
+
+    def start(self) -> None:
+        """Arranca el worker en el event loop actual (idempotente)."""
+        if self._worker is not None and not self._worker.done():
+            return
+        if self._queue is None:
+            self._queue = asyncio.Queue(maxsize=self.maxsize)
+        self._worker = asyncio.create_task(self._run(), name="persistence-worker")
+
+    async def stop(self, timeout: float = PERSIST_SHUTDOWN_TIMEOUT_SECONDS) -> None:
+        """Vacía la cola (hasta `timeout` segundos) y detiene el worker."""
+        if self._worker is None:
+            return
+        try:
+            await asyncio.wait_for(self._queue.join(), timeout)
+        except asyncio.TimeoutError:
+            pending = self._queue.qsize()
+            self.failed_messages += pending
+            self.last_error = f"Apagado con {pending} mensajes sin guardar (timeout)"
+            print(f"⚠️  {self.last_error}")
+        self._worker.cancel()
+        try:
+            await self._worker
+        except asyncio.CancelledError:
+            pass
+        self._worker = None
+
+    # ---------- encolado ----------
+
+    async def enqueue_exchange(self, conversation_id: str, query: str, response: str) -> None:
+        """Encola la pregunta del usuario y la respuesta del assistant."""
+        self.start()
+        created_at = now()
+        link = tracing.current_link()
+        for role, content in (("user", query), ("assistant", response)):
+            await self._queue.put({
+                "_id": ObjectId(),
+                "conversation_id": conversation_id,
+                "role": role,
+                "content": content,
+                "created_at": created_at,
+                "_link": link
+            })
+            self.enqueued += 1
+
+    # ---------- worker ----------
+
+    def _drain(self, first: Dict[str, Any]) -> List[Dict[str, Any]]:
+        batch = [first]
+        while len(batch) < self.batch_max_messages:
+            try:
+                batch.append(self._queue.get_nowait())
+            except asyncio.QueueEmpty:
+                break
+        return batch
+
+    async def _write(self, batch: List[Dict[str, Any]]) -> None:
+        links = list({id(m["_link"]): m["_link"] for m in batch if m.get("_link")}.values())
+        with tracing.span("persistence.flush", root=True, links=links, **{"persistence.messages": len(batch)}) as current:
+            await self._write_batch(batch, current)
+
+    async def _write_batch(self, batch: List[Dict[str, Any]], current) -> None:
+        for attempt in range(self.max_retries + 1):
+            try:
+                t0 = time.perf_counter()
+                await db_service.asave_messages(batch)
+                self._write_seconds_total += time.perf_counter() - t0
+                self.written_messages += len(batch)
+                self.batches += 1
+                return
+            except Exception as e:
+                self.last_error = str(e)
+                if attempt < self.max_retries:
+                    self.retries += 1
+                    await asyncio.sleep(0.5 * 2 ** attempt)
+
+        self.failed_batches += 1
+        self.failed_messages += len(batch)
+        tracing.set_error(current, self.last_error or "error")
+        print(f"❌ No se pudieron guardar {len(batch)} mensajes: {self.last_error}")
+
+    async def _run(self) -> None:
+        while True:
+            batch = self._drain(await self._queue.get())
+            try:
+                await self._write(batch)
+            finally:
+                for _ in batch:
+                    self._queue.task_done()
+
+    # ---------- métricas ----------
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "queue_depth": self._queue.qsize() if self._queue is not None else 0,
+            "enqueued": self.enqueued,
+            "written_messages": self.written_messages,
+            "batches": self.batches,
+            "avg_batch_write_ms": self._write_seconds_total / self.batches * 1000 if self.batches else 0.0,
+            "retries": self.retries,
+            "failed_batches": self.failed_batches,
+            "failed_messages": self.failed_messages,
+            "last_error": self.last_error,
+        }
+
+
+persistence_queue = PersistenceQueue()
+metrics.register_stats("persistence_queue", persistence_queue.stats)
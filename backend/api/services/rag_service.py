@@ -3,15 +3,17 @@ Servicio RAG que encapsula el pipeline existente
 """
 
 import sys
+import time
+import threading
 import importlib.util
-from pathlib import Path
+from collections import deque
+from typing import AsyncIterator, Dict, Optional, Tuple
 
-# Agregar el directorio pipeline al path para imports relativos
-# Estructura: backend/api/services/rag_service.py
-# Necesitamos: backend/pipeline/
-BASE_DIR = Path(__file__).resolve().parents[2]  # backend/
-PIPELINE_DIR = BASE_DIR / "pipeline"
-sys.path.insert(0, str(PIPELINE_DIR))
+# El directorio pipeline ya está en el path (ver api/__init__.py)
+from api import PIPELINE_DIR
+from api.services.admission_service import AdmissionRejected, admission_controller
+from api.services.single_flight import SingleFlight
+import metrics
 
 # Importar módulo usando importlib para manejar nombres con números
 rag_module_path = PIPELINE_DIR / "06_rag_response.py"
@@ -22,6 +24,47 @@ spec.loader.exec_module(rag_module)
 
 pipeline_run_rag = rag_module.run_rag
 rag_query = rag_module.rag_query
+arag_query = rag_module.arag_query
+arag_query_stream = rag_module.arag_query_stream
+query_core = rag_module.query_core
+
+
+class StreamTimings:
+    """Ventana de las últimas mediciones de streaming (TTFB, TTFT, total)."""
+
+    def __init__(self, window: int = 1000):
+        self._samples = {
+            "ttfb_ms": deque(maxlen=window),
+            "ttft_ms": deque(maxlen=window),
+            "total_ms": deque(maxlen=window),
+        }
+        self._lock = threading.Lock()
+        self.streams = 0
+
+    def record(self, timings: Dict[str, float]) -> None:
+        with self._lock:
+            self.streams += 1
+            for name, value in timings.items():
+                if value is not None:
+                    self._samples[name].append(value)
+
+    def stats(self) -> dict:
+        with self._lock:
+            result = {"streams": self.streams}
+            for name, samples in self._samples.items():
+                ordered = sorted(samples)
+                result[name] = {
+                    "p50": ordered[len(ordered) // 2] if ordered else None,
+                    "p95": ordered[int(len(ordered) * 0.95)] if ordered else None,
+                }
+            return result
+
+
+stream_timings = StreamTimings()
+
+
+single_flight = SingleFlight()
+metrics.register_stats("rag_single_flight", single_flight.stats)
 
 
 def run_rag(query: str) -> str:
@@ -66,3 +109,117 @@ def run_rag_with_chunks(query: str) -> dict:
     except Exception as e:
         raise Exception(f"Error ejecutando RAG: {str(e)}")
 
+
+
+async def arun_rag_with_chunks(
+    query: str,
+    use_cache: bool = True,
+    profile: bool = False,
+    user_id: Optional[str] = None
+) -> dict:
+    """
+    Versión asíncrona de run_rag_with_chunks().
+    Las llamadas a OpenAI son async y Chroma corre en un executor acotado,
+    por lo que varias consultas concurrentes avanzan en paralelo.
+    Las consultas idénticas simultáneas comparten una sola ejecución, y
+    cada ejecución pasa antes por el control de admisión.
+    
+    Args:
+        query: Pregunta del usuario
+        use_cache: False para ignorar la caché de respuestas
+        profile: True para medir esta ejecución (no se coalesce con otras)
+        user_id: Usuario que consulta (reparto equitativo de la cola)
+        
+    Returns:
+        dict: Dict con 'respuesta', 'query' y 'chunks' (+ 'profile')
+        
+    Raises:
+        AdmissionRejected: Si la consulta no fue admitida (429/503)
+        Exception: Si hay error en el pipeline
+    """
+    async def admitted_query():
+        async with admission_controller.slot(user_id):
+            return await arag_query(query=query, mode="full", use_cache=use_cache, profile=profile)
+
+    try:
+        if profile:
+            resultado = await admitted_query()
+            return {
+                "response": resultado.get("respuesta", ""),
+                "query": resultado.get("query", query),
+                "chunks": resultado.get("chunks", []),
+                "profile": resultado.get("profile")
+            }
+
+        # Misma clave que la caché de respuestas: normaliza la query e incluye
+        # la versión del índice, así solo se unen consultas equivalentes
+        key, _ = rag_module.rag_cache_key(
+            query, rag_module.DEFAULT_N_RESULTS, rag_module.DISTANCE_THRESHOLD
+        )
+        resultado = await single_flight.run(f"{key}:{use_cache}", admitted_query)
+        return {
+            "response": resultado.get("respuesta", ""),
+            "query": resultado.get("query", query),
+            "chunks": resultado.get("chunks", [])
+        }
+    except AdmissionRejected:
+        raise
+    except Exception as e:
+        raise Exception(f"Error ejecutando RAG: {str(e)}")
+
+
+async def astream_rag(query: str, use_cache: bool = True) -> AsyncIterator[Tuple[str, object]]:
+    """
+    Ejecuta el pipeline RAG en streaming.
+    Produce ("chunks", lista), ("token", texto) y al final ("done", dict)
+    con la respuesta completa y las mediciones:
+    - ttfb_ms: hasta el primer evento (chunks recuperados)
+    - ttft_ms: hasta el primer token del LLM
+    - total_ms: duración completa
+    
+    Args:
+        query: Pregunta del usuario
+        use_cache: False para ignorar las cachés de respuestas
+    """
+    t0 = time.perf_counter()
+    timings = {"ttfb_ms": None, "ttft_ms": None, "total_ms": None}
+
+    def elapsed_ms() -> float:
+        return (time.perf_counter() - t0) * 1000
+
+    async for event, payload in arag_query_stream(query=query, use_cache=use_cache):
+        if timings["ttfb_ms"] is None:
+            timings["ttfb_ms"] = elapsed_ms()
+        if event == "token" and timings["ttft_ms"] is None:
+            timings["ttft_ms"] = elapsed_ms()
+        if event == "done":
+            timings["total_ms"] = elapsed_ms()
+            stream_timings.record(timings)
+            payload = {
+                "response": payload.get("respuesta", ""),
+                "query": payload.get("query", query),
+                "chunks": payload.get("chunks", []),
+                "timings": timings,
+            }
+        yield event, payload
+
+
+def get_rag_stats() -> dict:
+    """
+    Métricas del pipeline RAG (cachés de embeddings, de respuestas y semántica).
+    
+    Returns:
+        dict: Contadores de hits/misses, hit rate y latencia ahorrada
+    """
+    stats = {
+        "index_version": query_core.retrieval_backend.version,
+        "query_embedding_cache": query_core.query_cache.stats()
+    }
+    if rag_module.response_cache is not None:
+        stats["response_cache"] = rag_module.response_cache.stats()
+    if rag_module.semantic_cache is not None:
+        stats["semantic_cache"] = rag_module.semantic_cache.stats()
+    stats["stream"] = stream_timings.stats()
+    stats["single_flight"] = single_flight.stats()
+    stats["admission"] = admission_controller.stats()
+    return stats
@@ -0,0 +1,44 @@
+"""
+Coalescencia (single-flight) de consultas RAG idénticas concurrentes
+
+Usada por rag_service.arun_rag_with_chunks con la misma clave que la caché
+de respuestas (query normalizada + parámetros + versión del índice).
+"""
+
+import asyncio
+from typing import Awaitable, Callable, Dict
+
+
+class SingleFlight:
+    """
+    Coalescencia de consultas idénticas concurrentes.
+    La primera solicitud con una clave ejecuta el pipeline; las que llegan
+    mientras sigue en curso esperan esa misma ejecución y reciben su resultado.
+    Vive en el event loop de la API (no requiere locks).
+    """
+
+    def __init__(self):
+        self._inflight: Dict[str, asyncio.Task] = {}
+        self.executions = 0
+        self.coalesced = 0
+
+    async def run(self, key: str, factory: Callable[[], Awaitable[dict]]) -> dict:
+        task = self._inflight.get(key)
+        if task is not None:
+            self.coalesced += 1
+        else:
+            self.executions += 1
+            task = asyncio.ensure_future(factory())
+            self._inflight[key] = task
+            task.add_done_callback(lambda _: self._inflight.pop(key, None))
+        # shield: si un cliente se desconecta no se cancela la ejecución compartida
+        return await asyncio.shield(task)
+
+    def stats(self) -> dict:
+        requests = self.executions + self.coalesced
+        return {
+            "executions": self.executions,
+            "coalesced": self.coalesced,
+            "coalesce_rate": self.coalesced / requests if requests else 0.0,
+            "in_flight": len(self._inflight),
+        }
@@ -0,0 +1,96 @@
+"""
+Benchmark — formato de embeddings: JSONL vs .npy (float32 / float16)
+
+Compara tamaño en disco, tiempo de escritura y tiempo de carga.
+Usa 03_embedding_output.jsonl si existe; si no, genera vectores
+sintéticos con la forma de text-embedding-3-large (N x 3072).
+
+Uso:
+    python backend/benchmarks/bench_embedding_format.py [--n 1500] [--dim 3072]
+"""
+
+import argparse
+import json
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+import numpy as np
+
+PIPELINE_DIR = Path(__file__).resolve().parents[1] / "pipeline"
+sys.path.insert(0, str(PIPELINE_DIR))
+
+import embedding_store  # noqa: E402
+
+
+def _synthetic_records(n: int, dim: int):
+    rng = np.random.default_rng(0)
+    vectors = rng.standard_normal((n, dim)).astype(np.float32)
+    return [
+        {"id": f"chunk-{i}", "text": f"texto del chunk {i}", "embedding": vectors[i].tolist(), "metadata": {}}
+        for i in range(n)
+    ]
+
+
+def _size(*paths: Path) -> int:
+    return sum(p.stat().st_size for p in paths)
+
+
+def run_benchmark(records, workdir: Path):
+    print(f"📊 {len(records)} vectores de {len(records[0]['embedding'])} dimensiones\n")
+    print(f"{'formato':<10}{'tamaño (MB)':>14}{'escritura (s)':>16}{'carga (s)':>12}")
+
+    # --- JSONL ---
+    jsonl = workdir / "emb.jsonl"
+    t0 = time.perf_counter()
+    with open(jsonl, "w", encoding="utf-8") as f:
+        for row in records:
+            f.write(json.dumps(row, ensure_ascii=False) + "\n")
+    write_s = time.perf_counter() - t0
+
+    t0 = time.perf_counter()
+    with open(jsonl, "r", encoding="utf-8") as f:
+        loaded = [json.loads(line) for line in f]
+    load_s = time.perf_counter() - t0
+    assert len(loaded) == len(records)
+    print(f"{'jsonl':<10}{_size(jsonl) / 1e6:>14.1f}{write_s:>16.3f}{load_s:>12.3f}")
+
+    # --- .npy ---
+    for dtype in ("float32", "float16"):
+        prefix = workdir / f"emb_{dtype}"
+        t0 = time.perf_counter()
+        embedding_store.save_embeddings(records, prefix, dtype=dtype)
+        write_s = time.perf_counter() - t0
+
+        # Carga completa por porciones (como 04_store_chroma.py)
+        t0 = time.perf_counter()
+        n = 0
+        for ids, _, _, vectors in embedding_store.iter_batches(prefix, 1000):
+            np.asarray(vectors, dtype=np.float32)
+            n += len(ids)
+        load_s = time.perf_counter() - t0
+        assert n == len(records)
+
+        size = _size(embedding_store.matrix_path(prefix), embedding_store.sidecar_path(prefix))
+        print(f"{dtype:<10}{size / 1e6:>14.1f}{write_s:>16.3f}{load_s:>12.3f}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark de formatos de embeddings")
+    parser.add_argument("--n", type=int, default=1500)
+    parser.add_argument("--dim", type=int, default=3072)
+    args = parser.parse_args()
+
+    if embedding_store.LEGACY_JSONL.exists():
+        with open(embedding_store.LEGACY_JSONL, "r", encoding="utf-8") as f:
+            records = [json.loads(line) for line in f if line.strip()]
+    else:
+        records = _synthetic_records(args.n, args.dim)
+
+    with tempfile.TemporaryDirectory() as tmp:
+        run_benchmark(records, Path(tmp))
+
+
+if __name__ == "__main__":
+    main()
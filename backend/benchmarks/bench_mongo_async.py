@@ -0,0 +1,99 @@
+"""
+Benchmark — capa de datos MongoDB: síncrona (executor) vs async
+
+Ejecuta N operaciones concurrentes típicas de un turno de chat
+(get_conversation + 2x save_message + get_conversation_messages) por dos vías:
+- sync:  Repository (pymongo síncrono) en un ThreadPoolExecutor propio
+         del benchmark (concurrencia limitada a --workers hilos)
+- async: AsyncRepository (AsyncMongoClient) directamente en el event loop
+
+Requiere un mongod local (MONGODB_URL). Los datos se escriben en una base
+temporal que se elimina al terminar.
+
+Uso (desde la raíz del proyecto):
+    python backend/benchmarks/bench_mongo_async.py --n 200 [--workers 16]
+"""
+
+import argparse
+import asyncio
+import os
+import sys
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+
+BASE_DIR = Path(__file__).resolve().parents[1]  # backend/
+sys.path.insert(0, str(BASE_DIR))
+
+# Base temporal: debe fijarse antes de importar api.config
+os.environ["MONGODB_DB_NAME"] = f"bench_{uuid.uuid4().hex[:8]}"
+
+from api.config import MONGO_MAX_POOL_SIZE  # noqa: E402
+from api.db.client import get_database, aclose_connection, close_connection  # noqa: E402
+from api.services import db_service  # noqa: E402
+from utils import run_in_executor  # noqa: E402  (pipeline/ en el path vía api/__init__.py)
+
+
+def sync_turn(conversation_id: str):
+    db_service.get_conversation(conversation_id)
+    db_service.save_message(conversation_id, "user", "¿Qué es un agente?")
+    db_service.save_message(conversation_id, "assistant", "Un agente percibe y actúa.")
+    db_service.get_conversation_messages(conversation_id)
+
+
+async def async_turn(conversation_id: str):
+    await db_service.aget_conversation(conversation_id)
+    await db_service.asave_message(conversation_id, "user", "¿Qué es un agente?")
+    await db_service.asave_message(conversation_id, "assistant", "Un agente percibe y actúa.")
+    await db_service.aget_conversation_messages(conversation_id)
+
+
+async def timed(label: str, n: int, make_call) -> float:
+    t0 = time.perf_counter()
+    await asyncio.gather(*[make_call(i) for i in range(n)])
+    total = time.perf_counter() - t0
+    print(f"⏱️  {label:<6} {n} turnos concurrentes: {total:.2f}s ({n / total:.0f} turnos/s)")
+    return total
+
+
+async def run_benchmark(n: int, workers: int):
+    user_id = await db_service.acreate_user("bench", "bench@example.com")
+    conversations = [await db_service.acreate_conversation(user_id) for _ in range(n)]
+
+    # Pool acotado para las llamadas bloqueantes de pymongo (solo la vía sync)
+    executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="mongo")
+
+    # Calentamiento de ambos pools
+    await run_in_executor(executor, sync_turn, conversations[0])
+    await async_turn(conversations[0])
+
+    print(f"📌 Executor sync: {workers} hilos | Pool Mongo: {MONGO_MAX_POOL_SIZE} conexiones")
+    sync_total = await timed(
+        "sync", n, lambda i: run_in_executor(executor, sync_turn, conversations[i])
+    )
+    executor.shutdown()
+    async_total = await timed("async", n, lambda i: async_turn(conversations[i]))
+    print(f"📊 Speedup async/sync: {sync_total / async_total:.2f}x")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark MongoDB síncrono vs async")
+    parser.add_argument("--n", type=int, default=200, help="Turnos concurrentes")
+    parser.add_argument("--workers", type=int, default=16, help="Hilos del executor de la vía sync")
+    args = parser.parse_args()
+
+    async def runner():
+        try:
+            await run_benchmark(args.n, args.workers)
+        finally:
+            database = get_database()
+            database.client.drop_database(database.name)
+            await aclose_connection()
+            close_connection()
+
+    asyncio.run(runner())
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,62 @@
+"""
+Benchmark — extracción del PDF: serial vs pool de procesos
+
+Extrae FUNDAMENTOS_DE_LA_IA_VOLUMEN_I.pdf con 1, 2, 4, ... procesos
+(hasta los núcleos disponibles) y reporta tiempo de pared y speedup
+respecto a 1 proceso. Verifica que el texto sea idéntico en todos los casos.
+
+Uso:
+    python backend/benchmarks/bench_pdf_extraction.py [--repeat 3] [--max-workers 8]
+"""
+
+import argparse
+import importlib
+import os
+import sys
+import time
+from pathlib import Path
+
+PIPELINE_DIR = Path(__file__).resolve().parents[1] / "pipeline"
+sys.path.insert(0, str(PIPELINE_DIR))
+
+extraction = importlib.import_module("01_extraction")  # noqa: E402
+
+
+def _worker_counts(max_workers: int):
+    counts, n = [], 1
+    while n < max_workers:
+        counts.append(n)
+        n *= 2
+    counts.append(max_workers)
+    return counts
+
+
+def run_benchmark(pdf_path: Path, max_workers: int, repeat: int):
+    baseline_text, baseline_s = None, None
+    print(f"📄 {pdf_path.name} | núcleos: {os.cpu_count()}\n")
+    print(f"{'procesos':>9}{'mejor (s)':>12}{'speedup':>10}{'idéntico':>10}")
+
+    for workers in _worker_counts(max_workers):
+        best, text = float("inf"), None
+        for _ in range(repeat):
+            t0 = time.perf_counter()
+            text = extraction.extract_text_from_pdf(pdf_path, workers=workers)
+            best = min(best, time.perf_counter() - t0)
+
+        if baseline_text is None:
+            baseline_text, baseline_s = text, best
+        print(f"{workers:>9}{best:>12.3f}{baseline_s / best:>9.2f}x{str(text == baseline_text):>10}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark de extracción paralela del PDF")
+    parser.add_argument("--pdf", type=Path, default=extraction.pdf_path)
+    parser.add_argument("--max-workers", type=int, default=os.cpu_count() or 1)
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+
+    run_benchmark(args.pdf, args.max_workers, args.repeat)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,70 @@
+"""
+Benchmark — coalescencia de consultas idénticas en /api/rag
+
+Envía N consultas idénticas simultáneas contra una API en ejecución y
+compara los contadores de /api/rag/stats antes y después: con la
+coalescencia (single-flight) el pipeline debe ejecutarse UNA sola vez
+y las N-1 restantes contarse como coalescidas.
+
+Se usa no_cache y una query única por ejecución para que la caché de
+respuestas no resuelva las consultas antes de llegar al pipeline.
+
+Uso (con la API levantada: python backend/start_api.py):
+    python backend/benchmarks/bench_rag_coalescing.py --n 100
+"""
+
+import argparse
+import asyncio
+import time
+import uuid
+
+import httpx
+
+
+async def _post_rag(client: httpx.AsyncClient, url: str, query: str) -> str:
+    response = await client.post(url, json={"query": query, "no_cache": True})
+    response.raise_for_status()
+    return response.json()["response"]
+
+
+async def _single_flight_stats(client: httpx.AsyncClient, base_url: str) -> dict:
+    response = await client.get(f"{base_url}/api/rag/stats")
+    response.raise_for_status()
+    return response.json()["single_flight"]
+
+
+async def run_benchmark(base_url: str, n: int, query: str):
+    url = f"{base_url}/api/rag"
+    query = f"{query} [{uuid.uuid4().hex[:8]}]"
+
+    limits = httpx.Limits(max_connections=n, max_keepalive_connections=n)
+    async with httpx.AsyncClient(timeout=120, limits=limits) as client:
+        before = await _single_flight_stats(client, base_url)
+
+        t0 = time.perf_counter()
+        responses = await asyncio.gather(*[_post_rag(client, url, query) for _ in range(n)])
+        total = time.perf_counter() - t0
+
+        after = await _single_flight_stats(client, base_url)
+
+    executions = after["executions"] - before["executions"]
+    coalesced = after["coalesced"] - before["coalesced"]
+
+    print(f"⏱️  {n} consultas idénticas simultáneas: {total:.2f}s")
+    print(f"📊 Ejecuciones del pipeline: {executions} | Coalescidas: {coalesced}")
+    print(f"📊 Respuestas distintas recibidas: {len(set(responses))}")
+    print("✅ Una sola llamada upstream" if executions == 1 else "❌ Se esperaba una sola ejecución")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark de coalescencia de /api/rag")
+    parser.add_argument("--url", default="http://127.0.0.1:8000")
+    parser.add_argument("--n", type=int, default=100)
+    parser.add_argument("--query", default="¿Qué es el aprendizaje supervisado?")
+    args = parser.parse_args()
+
+    asyncio.run(run_benchmark(args.url, args.n, args.query))
+
+
+if __name__ == "__main__":
+    main()
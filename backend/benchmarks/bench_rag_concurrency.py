@@ -0,0 +1,115 @@
+"""
+Benchmark — concurrencia de /api/rag
+
+Compara la latencia de UNA consulta con la de N consultas concurrentes
+contra una API en ejecución. Con el pipeline async, N consultas deberían
+tardar aproximadamente lo mismo que una (ratio ≈ 1), no N veces más.
+
+Para medir el pipeline (y no la caché de respuestas ni la coalescencia)
+cada solicitud usa una pregunta distinta y se envía con no_cache=True.
+Los hits de caché y las solicitudes coalescidas se reportan por separado
+(diferencia de /api/rag/stats antes y después de la ráfaga).
+
+Uso (con la API levantada: python backend/start_api.py):
+    python backend/benchmarks/bench_rag_concurrency.py --n 10
+    python backend/benchmarks/bench_rag_concurrency.py --n 10 --use-cache
+"""
+
+import argparse
+import asyncio
+import time
+from typing import Dict, List
+
+import httpx
+
+QUERIES = [
+    "¿Qué es el aprendizaje supervisado?",
+    "¿Qué es el aprendizaje no supervisado?",
+    "¿Qué es una red neuronal artificial?",
+    "¿Cómo funciona el algoritmo de retropropagación?",
+    "¿Qué es el sobreajuste de un modelo?",
+    "¿Qué diferencia hay entre clasificación y regresión?",
+    "¿Qué es el aprendizaje por refuerzo?",
+    "¿Qué es un árbol de decisión?",
+    "¿Para qué sirve la validación cruzada?",
+    "¿Qué es el procesamiento del lenguaje natural?",
+    "¿Qué es un sistema experto?",
+    "¿Qué es la prueba de Turing?",
+]
+
+
+def distinct_queries(n: int, offset: int = 0) -> List[str]:
+    """N preguntas distintas (se agregan variantes si N supera la lista)."""
+    queries = []
+    for i in range(offset, offset + n):
+        base = QUERIES[i % len(QUERIES)]
+        variant = i // len(QUERIES)
+        queries.append(base if variant == 0 else f"{base} Explícalo con el ejemplo {variant}.")
+    return queries
+
+
+async def _post_rag(client: httpx.AsyncClient, url: str, query: str, no_cache: bool) -> float:
+    """Envía una consulta RAG y devuelve su latencia en segundos."""
+    t0 = time.perf_counter()
+    response = await client.post(url, json={"query": query, "no_cache": no_cache})
+    response.raise_for_status()
+    return time.perf_counter() - t0
+
+
+async def _reuse_counters(client: httpx.AsyncClient, base_url: str) -> Dict[str, int]:
+    """Respuestas que no ejecutaron el pipeline: hits de caché y coalescidas."""
+    stats = (await client.get(f"{base_url}/api/rag/stats")).json()
+    response_cache = stats.get("response_cache", {})
+    return {
+        "response_cache_hits": response_cache.get("memory_hits", 0) + response_cache.get("disk_hits", 0),
+        "semantic_cache_hits": stats.get("semantic_cache", {}).get("hits", 0),
+        "coalesced": stats.get("single_flight", {}).get("coalesced", 0),
+    }
+
+
+async def run_benchmark(base_url: str, n: int, use_cache: bool):
+    url = f"{base_url}/api/rag"
+    no_cache = not use_cache
+    # Calentamiento, consulta individual y ráfaga usan preguntas distintas
+    warmup, single_query, *burst = distinct_queries(n + 2)
+
+    async with httpx.AsyncClient(timeout=120) as client:
+        # Calentamiento (conexiones, caches del proceso)
+        await _post_rag(client, url, warmup, no_cache)
+
+        single = await _post_rag(client, url, single_query, no_cache)
+        print(f"⏱️  1 consulta: {single:.2f}s")
+
+        before = await _reuse_counters(client, base_url)
+        t0 = time.perf_counter()
+        latencies = await asyncio.gather(
+            *[_post_rag(client, url, query, no_cache) for query in burst]
+        )
+        total = time.perf_counter() - t0
+        after = await _reuse_counters(client, base_url)
+
+    print(f"⏱️  {n} consultas concurrentes distintas: {total:.2f}s "
+          f"(latencia media {sum(latencies) / n:.2f}s, caché {'activada' if use_cache else 'ignorada'})")
+    print(f"📊 Ratio total/1 consulta: {total / single:.2f}x "
+          f"(serializado sería ≈ {n}x)")
+
+    reused = {name: after[name] - before[name] for name in after}
+    print(f"♻️  Sin ejecutar el pipeline: {reused['response_cache_hits']} hits de caché de respuestas, "
+          f"{reused['semantic_cache_hits']} de caché semántica, {reused['coalesced']} coalescidas")
+    if any(reused.values()):
+        print("⚠️  Parte de la ráfaga no ejecutó el pipeline: el ratio subestima su costo")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark de concurrencia de /api/rag")
+    parser.add_argument("--url", default="http://127.0.0.1:8000")
+    parser.add_argument("--n", type=int, default=10)
+    parser.add_argument("--use-cache", action="store_true",
+                        help="No envía no_cache (mide también las cachés de respuestas)")
+    args = parser.parse_args()
+
+    asyncio.run(run_benchmark(args.url, args.n, args.use_cache))
+
+
+if __name__ == "__main__":
+    main()
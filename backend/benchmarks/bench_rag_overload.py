@@ -0,0 +1,83 @@
+"""
+Benchmark — /api/rag bajo sobrecarga (control de admisión)
+
+Envía N consultas distintas simultáneas (más que RAG_MAX_CONCURRENCY +
+RAG_MAX_QUEUE) repartidas entre varios usuarios y reporta:
+- cuántas se atendieron (200) y cuántas se rechazaron rápido (429/503)
+- p50/p99 de latencia de las atendidas y de los rechazos
+- Retry-After recibidos y el estado del control de admisión
+
+Con el control de admisión el p99 de las atendidas queda acotado por
+RAG_QUEUE_TIMEOUT_SECONDS + el tiempo de una consulta, y los rechazos
+vuelven en milisegundos en lugar de acumularse.
+
+Uso (con la API levantada: python backend/start_api.py):
+    python backend/benchmarks/bench_rag_overload.py --n 200 --users 10
+"""
+
+import argparse
+import asyncio
+import time
+import uuid
+from collections import Counter
+
+import httpx
+
+
+def _percentile(values, q: float):
+    if not values:
+        return None
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * q))]
+
+
+async def _post_rag(client: httpx.AsyncClient, url: str, query: str, user_id: str):
+    t0 = time.perf_counter()
+    response = await client.post(url, json={"query": query, "no_cache": True, "user_id": user_id})
+    return response.status_code, time.perf_counter() - t0, response.headers.get("Retry-After")
+
+
+async def run_benchmark(base_url: str, n: int, users: int, query: str):
+    url = f"{base_url}/api/rag"
+    run_id = uuid.uuid4().hex[:8]
+
+    limits = httpx.Limits(max_connections=n, max_keepalive_connections=n)
+    async with httpx.AsyncClient(timeout=300, limits=limits) as client:
+        t0 = time.perf_counter()
+        results = await asyncio.gather(*[
+            # Queries distintas: sin coalescencia ni caché
+            _post_rag(client, url, f"{query} [{run_id}-{i}]", f"bench-user-{i % users}")
+            for i in range(n)
+        ])
+        total = time.perf_counter() - t0
+
+        stats = (await client.get(f"{base_url}/api/rag/stats")).json()["admission"]
+
+    statuses = Counter(status for status, _, _ in results)
+    served = [elapsed for status, elapsed, _ in results if status == 200]
+    rejected = [elapsed for status, elapsed, _ in results if status in (429, 503)]
+    retry_after = Counter(value for _, _, value in results if value is not None)
+
+    print(f"⏱️  {n} consultas simultáneas de {users} usuarios: {total:.2f}s")
+    print(f"📊 Estados: {dict(statuses)}")
+    if served:
+        print(f"📊 Atendidas:  p50 {_percentile(served, 0.5):.2f}s | p99 {_percentile(served, 0.99):.2f}s")
+    if rejected:
+        print(f"📊 Rechazadas: p50 {_percentile(rejected, 0.5) * 1000:.0f} ms | p99 {_percentile(rejected, 0.99) * 1000:.0f} ms")
+    print(f"📊 Retry-After: {dict(retry_after)}")
+    print(f"📊 Admisión: {stats}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark de /api/rag bajo sobrecarga")
+    parser.add_argument("--url", default="http://127.0.0.1:8000")
+    parser.add_argument("--n", type=int, default=200)
+    parser.add_argument("--users", type=int, default=10)
+    parser.add_argument("--query", default="¿Qué es el aprendizaje supervisado?")
+    args = parser.parse_args()
+
+    asyncio.run(run_benchmark(args.url, args.n, args.users, args.query))
+
+
+if __name__ == "__main__":
+    main()
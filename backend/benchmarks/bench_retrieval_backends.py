@@ -0,0 +1,81 @@
+"""
+Benchmark — backends de recuperación: Chroma (HNSW) vs NumPy (exacto)
+
+Mide latencia p50/p99 de search() y recall@k contra la búsqueda exacta
+en float32 (verdad de referencia). Las queries son filas del índice con
+ruido gaussiano, así no hace falta llamar a OpenAI.
+
+Requiere haber corrido 03_embedding.py y 04_store_chroma.py.
+
+Uso:
+    python backend/benchmarks/bench_retrieval_backends.py [--queries 500] [--k 8]
+"""
+
+import argparse
+import sys
+import time
+from pathlib import Path
+
+import numpy as np
+
+PIPELINE_DIR = Path(__file__).resolve().parents[1] / "pipeline"
+sys.path.insert(0, str(PIPELINE_DIR))
+
+import embedding_store  # noqa: E402
+from retrieval_backends import ChromaBackend, NumpyBackend  # noqa: E402
+
+
+def _percentile_ms(samples, p):
+    return float(np.percentile(samples, p)) * 1000
+
+
+def _ids(results):
+    return {r["id"] for r in results}
+
+
+def run_benchmark(n_queries: int, k: int, noise: float):
+    matrix = embedding_store.load_matrix()
+    rng = np.random.default_rng(0)
+    rows = rng.integers(0, matrix.shape[0], size=n_queries)
+    queries = [
+        (np.asarray(matrix[i], dtype=np.float32) + rng.normal(0, noise, matrix.shape[1])).tolist()
+        for i in rows
+    ]
+
+    exact = NumpyBackend(dtype="float32")
+    truth = [_ids(exact.search(q, k)) for q in queries]
+
+    backends = {
+        "numpy-f32": exact,
+        "numpy-f16": NumpyBackend(dtype="float16"),
+        "chroma": ChromaBackend(),
+    }
+
+    print(f"📊 {matrix.shape[0]} chunks x {matrix.shape[1]} dims | {n_queries} queries | k={k}\n")
+    print(f"{'backend':<12}{'p50 (ms)':>10}{'p99 (ms)':>10}{'recall@k':>10}")
+
+    for name, backend in backends.items():
+        backend.search(queries[0], k)  # calentamiento
+        latencies, hits = [], 0
+        for q, expected in zip(queries, truth):
+            t0 = time.perf_counter()
+            results = backend.search(q, k)
+            latencies.append(time.perf_counter() - t0)
+            hits += len(_ids(results) & expected)
+
+        recall = hits / sum(len(t) for t in truth)
+        print(f"{name:<12}{_percentile_ms(latencies, 50):>10.2f}{_percentile_ms(latencies, 99):>10.2f}{recall:>10.3f}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark de backends de recuperación")
+    parser.add_argument("--queries", type=int, default=500)
+    parser.add_argument("--k", type=int, default=8)
+    parser.add_argument("--noise", type=float, default=0.01)
+    args = parser.parse_args()
+
+    run_benchmark(args.queries, args.k, args.noise)
+
+
+if __name__ == "__main__":
+    main()
@@ -1,24 +1,133 @@
-import fitz  # PyMuPDF
+"""
+STEP 1 — Extracción de texto del PDF
+
+- extract_pages(): texto por página, en orden, repartiendo rangos de
+  páginas entre procesos (cada uno abre su propio documento fitz)
+- extract_text_from_pdf(): el texto completo (páginas unidas con "\\n")
+- iter_pages(): generador (número de página, texto) de a una página,
+  con memoria acotada; lo consume 02_chunking.py
+- write_pages() / iter_pages_file(): las páginas en JSONL
+  (data/01_extraction_pages.jsonl), para que 02 no vuelva a leer el PDF
+
+El número de procesos sale de EXTRACTION_WORKERS en config.py
+(o --workers); con 1 se extrae en el proceso actual.
+
+Uso:
+    python 01_extraction.py [--workers N] [--start-page 0] [--end-page 212]
+"""
+
+import argparse
+import json
 import os
+import time
+from concurrent.futures import ProcessPoolExecutor
 from pathlib import Path
+from typing import Iterable, Iterator, List, Optional, Tuple
+
+import fitz  # PyMuPDF
+
+from config import EXTRACTION_WORKERS, EXTRACTION_START_PAGE, EXTRACTION_END_PAGE
+
+# Rangos por proceso: algunos más que procesos para repartir mejor la carga
+# (las páginas con figuras o tablas tardan más que las de texto corrido)
+RANGES_PER_WORKER = 4
+
+
+def _extract_page_range(pdf_path: str, start_page: int, end_page: int) -> List[str]:
+    """Texto de las páginas [start_page, end_page); corre en un proceso del pool."""
+    with fitz.open(pdf_path) as doc:
+        return [doc.load_page(page_num).get_text("text") for page_num in range(start_page, end_page)]
+
+
+def _split_range(start_page: int, end_page: int, parts: int) -> List[Tuple[int, int]]:
+    """Divide [start_page, end_page) en `parts` rangos contiguos de tamaño parecido."""
+    total = end_page - start_page
+    parts = max(1, min(parts, total))
+    size, extra = divmod(total, parts)
+    ranges, start = [], start_page
+    for i in range(parts):
+        end = start + size + (1 if i < extra else 0)
+        ranges.append((start, end))
+        start = end
+    return ranges
+
+
+def resolve_workers(workers: Optional[int] = None) -> int:
+    if workers is None:
+        workers = EXTRACTION_WORKERS
+    return max(1, workers or os.cpu_count() or 1)
+
+
+def extract_pages(pdf_path, start_page=EXTRACTION_START_PAGE, end_page=EXTRACTION_END_PAGE, workers: Optional[int] = None) -> List[str]:
+    """
+    Extrae el texto de cada página entre start_page y end_page (índices
+    base 0, end_page excluido) y lo devuelve en orden de página.
+
+    Args:
+        pdf_path: Ruta del PDF
+        start_page: Primera página (base 0)
+        end_page: Página final (excluida); se recorta al largo del documento
+        workers: Procesos a usar (None → EXTRACTION_WORKERS / os.cpu_count())
+    """
+    pdf_path = str(pdf_path)
+    with fitz.open(pdf_path) as doc:
+        end_page = min(end_page, len(doc))
+    if end_page <= start_page:
+        return []
+
+    workers = resolve_workers(workers)
+    if workers == 1:
+        return _extract_page_range(pdf_path, start_page, end_page)
 
-def extract_text_from_pdf(pdf_path, start_page=0, end_page=212):
+    ranges = _split_range(start_page, end_page, workers * RANGES_PER_WORKER)
+    with ProcessPoolExecutor(max_workers=min(workers, len(ranges))) as executor:
+        # map conserva el orden de los rangos → páginas en orden
+        results = executor.map(
+            _extract_page_range,
+            [pdf_path] * len(ranges),
+            [start for start, _ in ranges],
+            [end for _, end in ranges]
+        )
+        return [page for pages in results for page in pages]
+
+
+def iter_pages(pdf_path, start_page=EXTRACTION_START_PAGE, end_page=EXTRACTION_END_PAGE) -> Iterator[Tuple[int, str]]:
+    """
+    Produce (número de página base 1, texto) de a una página, en orden.
+    Solo mantiene en memoria la página actual. end_page=None → hasta el final.
+    """
+    with fitz.open(str(pdf_path)) as doc:
+        end_page = len(doc) if end_page is None else min(end_page, len(doc))
+        for page_num in range(start_page, end_page):
+            yield page_num + 1, doc.load_page(page_num).get_text("text")
+
+
+def write_pages(pages: Iterable[Tuple[int, str]], path) -> int:
+    """Guarda (página, texto) como JSONL {"page", "text"}, de a una línea."""
+    count = 0
+    with open(path, "w", encoding="utf-8") as f:
+        for page_num, text in pages:
+            f.write(json.dumps({"page": page_num, "text": text}, ensure_ascii=False) + "\n")
+            count += 1
+    return count
+
+
+def iter_pages_file(path) -> Iterator[Tuple[int, str]]:
+    """Lee las páginas guardadas por write_pages(), de a una."""
+    with open(path, "r", encoding="utf-8") as f:
+        for line in f:
+            row = json.loads(line)
+            yield row["page"], row["text"]
+
+
+def extract_text_from_pdf(pdf_path, start_page=EXTRACTION_START_PAGE, end_page=EXTRACTION_END_PAGE, workers: Optional[int] = None) -> str:
     """
     Extrae texto del PDF entre start_page y end_page (índices base 0).
     Por ejemplo, páginas 1 a 212 en el documento = índices 0 a 211 aquí.
     """
-    # Convertir Path a string para compatibilidad con fitz.open si es necesario
-    doc = fitz.open(str(pdf_path))
-    text = ""
-
-    # Aseguramos no exceder el número de páginas del documento
-    num_pages = len(doc)
-    for page_num in range(start_page, min(end_page, num_pages)): # <-- CORREGIDO: Usamos min() para evitar errores si el PDF tiene menos de 212 páginas
-        page = doc.load_page(page_num)
-        text += page.get_text("text") + "\n"
+    # join en lugar de concatenar página a página (evita recopiar el texto acumulado)
+    return "".join(page + "\n" for page in extract_pages(pdf_path, start_page, end_page, workers))
 
-    doc.close()
-    return text
 
 # --- Configuración ---
 # Definir rutas usando pathlib para mayor legibilidad y robustez
@@ -31,33 +140,50 @@ DATA_DIR = BASE_DIR / "data"
 pdf_filename = "FUNDAMENTOS_DE_LA_IA_VOLUMEN_I.pdf"
 pdf_path = DATA_DIR / pdf_filename
 
-# --- Ejecución ---
-try:
-    print(f"Buscando PDF en: {pdf_path}")
-    print("Extrayendo texto del PDF (páginas 1 a 212)...")
-    # Aseguramos que start_page y end_page sean números enteros
-    start_page = 0
-    end_page = 212
-    full_text = extract_text_from_pdf(pdf_path, start_page=start_page, end_page=end_page) # <-- CORREGIDO: Pasamos explícitamente los números
-    print(f"✅ Texto extraído exitosamente (1-212). Longitud: {len(full_text)} caracteres.")
-
-    # Opcional: Imprimir las primeras líneas para verificar
-    print("\n--- Primeras 500 caracteres del texto extraído (1-212) ---")
-    print(full_text[:500])
-    print("...\n")
-
-    # --- Guardar el texto en un archivo .txt ---
-    output_filename = "01_extraction_output.txt"
-    output_file = DATA_DIR / output_filename
-    
-    with open(output_file, "w", encoding="utf-8") as f:
-        f.write(full_text)
-
-    print(f"✅ Texto (1-212) guardado en '{output_file}'")
-
-except FileNotFoundError:
-    print(f"❌ Error: No se encontró el archivo PDF en la ruta: {pdf_path}")
-    print("Por favor, verifica que el nombre del archivo y la ruta sean correctos.")
-except Exception as e:
-    print(f"❌ Ocurrió un error inesperado: {e}")
-    print(f"Tipo de error: {type(e).__name__}")
+output_filename = "01_extraction_output.txt"
+output_file = DATA_DIR / output_filename
+# Texto por página (entrada de 02_chunking.py y run_pipeline.py)
+PAGES_FILE = DATA_DIR / "01_extraction_pages.jsonl"
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Extracción de texto del PDF")
+    parser.add_argument("--workers", type=int, default=None, help="Procesos (default: EXTRACTION_WORKERS / núcleos)")
+    parser.add_argument("--start-page", type=int, default=EXTRACTION_START_PAGE)
+    parser.add_argument("--end-page", type=int, default=EXTRACTION_END_PAGE)
+    args = parser.parse_args()
+
+    # --- Ejecución ---
+    try:
+        workers = resolve_workers(args.workers)
+        print(f"Buscando PDF en: {pdf_path}")
+        print(f"Extrayendo texto del PDF (páginas {args.start_page + 1} a {args.end_page}) con {workers} proceso(s)...")
+        t0 = time.perf_counter()
+        pages = extract_pages(pdf_path, start_page=args.start_page, end_page=args.end_page, workers=workers)
+        full_text = "".join(page + "\n" for page in pages)
+        print(f"✅ Texto extraído exitosamente en {time.perf_counter() - t0:.2f}s. Longitud: {len(full_text)} caracteres.")
+
+        # Opcional: Imprimir las primeras líneas para verificar
+        print("\n--- Primeras 500 caracteres del texto extraído ---")
+        print(full_text[:500])
+        print("...\n")
+
+        # --- Guardar el texto en un archivo .txt ---
+        with open(output_file, "w", encoding="utf-8") as f:
+            f.write(full_text)
+
+        print(f"✅ Texto guardado en '{output_file}'")
+
+        write_pages(enumerate(pages, start=args.start_page + 1), PAGES_FILE)
+        print(f"✅ Páginas guardadas en '{PAGES_FILE}'")
+
+    except (FileNotFoundError, fitz.FileNotFoundError):
+        print(f"❌ Error: No se encontró el archivo PDF en la ruta: {pdf_path}")
+        print("Por favor, verifica que el nombre del archivo y la ruta sean correctos.")
+    except Exception as e:
+        print(f"❌ Ocurrió un error inesperado: {e}")
+        print(f"Tipo de error: {type(e).__name__}")
+
+
+if __name__ == "__main__":
+    main()
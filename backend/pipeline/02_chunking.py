@@ -1,105 +1,274 @@
-import os
-import re
+"""
+STEP 2 — Limpieza y chunking del texto
+
+Pipeline de generadores, página por página:
+
+    iter_pages (01)  →  iter_clean_pages  →  iter_chunks  →  JSON
+
+- La limpieza usa patrones precompilados y se aplica a cada página
+- La ventana móvil de palabras continúa entre páginas (un chunk puede
+  empezar en una página y terminar en la siguiente)
+- Cada chunk lleva su procedencia en metadata: page_start/page_end
+  (base 1) y char_start/char_end sobre el texto limpio del documento
+  (páginas limpias unidas por un espacio)
+- En memoria solo están la página actual y la ventana: el consumo no
+  crece con el tamaño del documento
+
+Con CHUNK_STRATEGY = "tokens" (o --strategy tokens) la ventana se mide en
+tokens (token_chunking.py) y la metadata incluye además "token_count".
+
+Salida: data/02_chunking_output.json, lista de
+{"text": ..., "metadata": {"page_start", "page_end", "char_start", "char_end"}}
+
+Uso:
+    python 02_chunking.py [--chunk-size 180] [--overlap 60] [--trace-memory]
+    python 02_chunking.py --pages ../../data/01_extraction_pages.jsonl
+    python 02_chunking.py --strategy tokens [--target-tokens 256] [--max-tokens 320] [--overlap-tokens 64] [--no-snap]
+"""
+
+import argparse
+import importlib
 import json
+import re
+import time
+import tracemalloc
+from collections import deque
 from pathlib import Path
+from typing import Any, Deque, Dict, Iterable, Iterator, List, Tuple
+
+from config import (
+    CHUNK_MAX_TOKENS,
+    CHUNK_OVERLAP_TOKENS,
+    CHUNK_OVERLAP_WORDS,
+    CHUNK_SIZE_WORDS,
+    CHUNK_SNAP_SENTENCES,
+    CHUNK_STRATEGY,
+    CHUNK_TARGET_TOKENS,
+    CHUNK_TOKENIZER,
+    EXTRACTION_END_PAGE,
+    EXTRACTION_START_PAGE
+)
+
+extraction = importlib.import_module("01_extraction")
 
 # ------------------ LIMPIEZA DEL TEXTO ------------------
+# Títulos tipo "CAPÍTULO 1", "CAPITULO I"
+CHAPTER_PATTERN = re.compile(r"\bCAP(ÍTULO|ITULO|)\s+\w+\b", flags=re.IGNORECASE)
+# Líneas completas en MAYÚSCULAS
+UPPERCASE_LINE_PATTERN = re.compile(r"\n[A-ZÁÉÍÓÚÑ0-9 ,.'’\\-]{4,80}\n")
+# Números de página aislados
+PAGE_NUMBER_PATTERN = re.compile(r"\n?\s*\b\d{1,4}\b\s*\n?")
+# Saltos de línea múltiples
+NEWLINES_PATTERN = re.compile(r"\n+")
+# Espacios múltiples
+SPACES_PATTERN = re.compile(r"\s+")
+
+
 def limpiar_texto(texto):
     """
     Limpia el texto eliminando títulos, encabezados, números de página
     y normalizando espacios.
     """
-    # Eliminar títulos tipo "CAPÍTULO 1", "CAPITULO I", "CAP. 2"
-    texto = re.sub(r"\bCAP(ÍTULO|ITULO|)\s+\w+\b", "", texto, flags=re.IGNORECASE)
-
-    # Eliminar líneas completas en MAYÚSCULAS
-    texto = re.sub(r"\n[A-ZÁÉÍÓÚÑ0-9 ,.'’\\-]{4,80}\n", "\n", texto)
+    texto = CHAPTER_PATTERN.sub("", texto)
+    texto = UPPERCASE_LINE_PATTERN.sub("\n", texto)
+    texto = PAGE_NUMBER_PATTERN.sub(" ", texto)
+    texto = NEWLINES_PATTERN.sub(" ", texto)
+    texto = SPACES_PATTERN.sub(" ", texto)
+    return texto.strip()
 
-    # Eliminar números de página aislados
-    texto = re.sub(r"\n?\s*\b\d{1,4}\b\s*\n?", " ", texto)
 
-    # Eliminar múltiples saltos de línea
-    texto = re.sub(r"\n+", " ", texto)
+def limpiar_pagina(texto):
+    """
+    limpiar_texto() para una sola página. Se rodea de saltos de línea
+    como quedaba en el texto completo, así el encabezado de la primera
+    línea y el número de página de la última se eliminan igual.
+    """
+    return limpiar_texto("\n" + texto + "\n")
 
-    # Compactar espacios
-    texto = re.sub(r"\s+", " ", texto)
 
-    return texto.strip()
+def iter_clean_pages(pages: Iterable[Tuple[int, str]]) -> Iterator[Tuple[int, str]]:
+    """(página, texto) → (página, texto limpio); omite las páginas vacías."""
+    for page_num, texto in pages:
+        limpio = limpiar_pagina(texto)
+        if limpio:
+            yield page_num, limpio
 
 
 # ------------------ CHUNKING ------------------
-def chunk_by_sliding_window(text, chunk_size_words=180, overlap=60):
+def _make_chunk(window: Deque[Tuple[str, int, int]]) -> Dict[str, Any]:
+    first_word, page_start, char_start = window[0]
+    last_word, page_end, last_offset = window[-1]
+    return {
+        "text": " ".join(word for word, _, _ in window),
+        "metadata": {
+            "page_start": page_start,
+            "page_end": page_end,
+            "char_start": char_start,
+            "char_end": last_offset + len(last_word),
+        },
+    }
+
+
+def iter_chunks(
+    pages: Iterable[Tuple[int, str]],
+    chunk_size_words: int = CHUNK_SIZE_WORDS,
+    overlap: int = CHUNK_OVERLAP_WORDS
+) -> Iterator[Dict[str, Any]]:
     """
-    Divide el texto en chunks solapados por ventana móvil.
+    Ventana móvil de palabras sobre páginas limpias, con procedencia.
+    Produce los mismos chunks que chunk_by_sliding_window() sobre el texto
+    completo, sin armarlo: la ventana guarda (palabra, página, offset).
     """
-    words = [w for w in text.replace('\n', ' ').split() if w.strip()]
-    if not words:
-        return []
-
     step = max(1, chunk_size_words - overlap)
-    chunks = []
+    min_words = int(chunk_size_words * 0.4)
 
-    for start in range(0, max(1, len(words) - 1), step):
-        end = start + chunk_size_words
-        chunk_words = words[start:end]
+    window: Deque[Tuple[str, int, int]] = deque()
+    offset = 0
+    pending = 0  # palabras aún no incluidas en ningún chunk emitido
 
-        if not chunk_words:
-            break
+    for page_num, texto in pages:
+        for word in texto.split():
+            window.append((word, page_num, offset))
+            offset += len(word) + 1
+            pending += 1
+            if len(window) == chunk_size_words:
+                yield _make_chunk(window)
+                pending = 0
+                for _ in range(min(step, len(window))):
+                    window.popleft()
 
-        chunk_text = ' '.join(chunk_words).strip()
+    # Último chunk parcial (si agrega palabras y tiene suficientes)
+    if pending and len(window) >= min_words:
+        yield _make_chunk(window)
 
-        # Solo agregar chunk si tiene suficientes palabras
-        if len(chunk_text.split()) >= int(chunk_size_words * 0.4):
-            chunks.append(chunk_text)
 
-        if end >= len(words):
-            break
+def chunk_by_sliding_window(text, chunk_size_words=CHUNK_SIZE_WORDS, overlap=CHUNK_OVERLAP_WORDS):
+    """
+    Divide el texto en chunks solapados por ventana móvil.
+    """
+    return [chunk["text"] for chunk in iter_chunks([(1, text)], chunk_size_words, overlap)]
 
-    return chunks
+
+def chunk_pages(
+    pages: Iterable[Tuple[int, str]],
+    strategy: str = CHUNK_STRATEGY,
+    chunk_size_words: int = CHUNK_SIZE_WORDS,
+    overlap: int = CHUNK_OVERLAP_WORDS,
+    **token_options
+) -> Iterator[Dict[str, Any]]:
+    """
+    Chunks de las páginas limpias según la estrategia:
+    - "words": iter_chunks() (chunk_size_words / overlap)
+    - "tokens": token_chunking.iter_token_chunks(); token_options acepta
+      tokenizer, target_tokens, max_tokens, overlap_tokens y snap_sentences
+    """
+    if strategy == "tokens":
+        import token_chunking  # tokenizers solo se carga si se usa
+        return token_chunking.iter_token_chunks(pages, **token_options)
+    if strategy != "words":
+        raise ValueError(f"Estrategia de chunking desconocida: '{strategy}'")
+    return iter_chunks(pages, chunk_size_words, overlap)
+
+
+def write_chunks(chunks: Iterable[Dict[str, Any]], output_file: Path) -> int:
+    """Escribe la lista JSON de a un chunk por línea, sin acumularla en memoria."""
+    count = 0
+    with open(output_file, "w", encoding="utf-8") as f:
+        f.write("[")
+        for chunk in chunks:
+            f.write(("\n  " if count == 0 else ",\n  ") + json.dumps(chunk, ensure_ascii=False))
+            count += 1
+        f.write("\n]\n")
+    return count
 
 
 # --- Configuración de rutas ---
 BASE_DIR = Path(__file__).resolve().parents[2]
 DATA_DIR = BASE_DIR / "data"
-INPUT_FILE = DATA_DIR / "01_extraction_output.txt"
 OUTPUT_FILE = DATA_DIR / "02_chunking_output.json"
 
 
-# --- Cargar el texto extraído ---
-try:
-    with open(INPUT_FILE, "r", encoding="utf-8") as f:
-        full_text = f.read()
-    print(f"✅ Texto cargado desde '{INPUT_FILE}'")
-    print(f"Total de caracteres: {len(full_text)}")
-    print(f"Total de palabras: {len(full_text.split())}")
+def main():
+    parser = argparse.ArgumentParser(description="Limpieza y chunking del PDF (streaming)")
+    parser.add_argument("--pdf", type=Path, default=extraction.pdf_path)
+    parser.add_argument("--pages", type=Path, default=None,
+                        help="Lee las páginas ya extraídas (01_extraction_pages.jsonl) en lugar del PDF")
+    parser.add_argument("--start-page", type=int, default=EXTRACTION_START_PAGE)
+    parser.add_argument("--end-page", type=int, default=EXTRACTION_END_PAGE)
+    parser.add_argument("--chunk-size", type=int, default=CHUNK_SIZE_WORDS)
+    parser.add_argument("--overlap", type=int, default=CHUNK_OVERLAP_WORDS)
+    parser.add_argument("--strategy", choices=["words", "tokens"], default=CHUNK_STRATEGY)
+    parser.add_argument("--tokenizer", default=CHUNK_TOKENIZER, help="Nombre en el Hub o ruta a tokenizer.json")
+    parser.add_argument("--target-tokens", type=int, default=CHUNK_TARGET_TOKENS)
+    parser.add_argument("--max-tokens", type=int, default=CHUNK_MAX_TOKENS)
+    parser.add_argument("--overlap-tokens", type=int, default=CHUNK_OVERLAP_TOKENS)
+    parser.add_argument("--no-snap", dest="snap_sentences", action="store_false", default=CHUNK_SNAP_SENTENCES,
+                        help="No ajusta los cortes a finales de oración")
+    parser.add_argument("--trace-memory", action="store_true", help="Reporta el pico de memoria (tracemalloc)")
+    args = parser.parse_args()
+
+    source = args.pages or args.pdf
+    if not source.exists():
+        print(f"❌ No se encontró '{source}'.")
+        return
+
+    if args.trace_memory:
+        tracemalloc.start()
+
+    print(f"📄 Procesando '{source.name}' página por página...")
+    stats = {"pages": 0, "words": 0}
+
+    def counted(pages):
+        for page_num, texto in pages:
+            stats["pages"] += 1
+            stats["words"] += texto.count(" ") + 1
+            yield page_num, texto
 
-except FileNotFoundError:
-    print(f"❌ No se encontró el archivo '{INPUT_FILE}'.")
-    print("Asegúrate de haber ejecutado primero '01_extraction.py'.")
-    exit()
+    t0 = time.perf_counter()
+    if args.pages:
+        raw_pages = extraction.iter_pages_file(args.pages)
+    else:
+        raw_pages = extraction.iter_pages(args.pdf, args.start_page, args.end_page)
+    pages = counted(iter_clean_pages(raw_pages))
+    chunks = chunk_pages(
+        pages, args.strategy, args.chunk_size, args.overlap,
+        **({
+            "tokenizer": args.tokenizer,
+            "target_tokens": args.target_tokens,
+            "max_tokens": args.max_tokens,
+            "overlap_tokens": args.overlap_tokens,
+            "snap_sentences": args.snap_sentences,
+        } if args.strategy == "tokens" else {})
+    )
 
+    # Vista previa de los primeros 3 chunks, sin materializar el resto
+    preview: List[Dict[str, Any]] = []
 
-# --- LIMPIAR TEXTO ---
-print("\nLimpiando texto...")
-full_text = limpiar_texto(full_text)
-print(f"✅ Texto limpiado correctamente. Total de palabras luego de limpieza: {len(full_text.split())}")
+    def with_preview(items):
+        for chunk in items:
+            if len(preview) < 3:
+                preview.append(chunk)
+            yield chunk
 
+    count = write_chunks(with_preview(chunks), OUTPUT_FILE)
+    elapsed = time.perf_counter() - t0
 
-# --- CHUNKING POR SLIDING WINDOW ---
-print("\nDividiendo el texto por ventana móvil...")
-chunks = chunk_by_sliding_window(full_text, chunk_size_words=180, overlap=60)
-print(f"✅ Se crearon {len(chunks)} chunks.")
+    print(f"✅ {stats['pages']} páginas limpias, {stats['words']} palabras → {count} chunks en {elapsed:.2f}s")
 
+    print("\n--- Ejemplo de los primeros 3 chunks ---")
+    for i, chunk in enumerate(preview, start=1):
+        meta = chunk["metadata"]
+        tokens = f", {meta['token_count']} tokens" if "token_count" in meta else ""
+        print(f"\n🔹 Chunk {i} ({len(chunk['text'].split())} palabras{tokens}, "
+              f"págs. {meta['page_start']}-{meta['page_end']}):\n\"{chunk['text'][:400]}...\"")
 
-# --- Mostrar ejemplo de los primeros 3 chunks ---
-print("\n--- Ejemplo de los primeros 3 chunks ---")
-for i in range(min(3, len(chunks))):
-    word_count = len(chunks[i].split())
-    print(f"\n🔹 Chunk {i+1} ({word_count} palabras):\n\"{chunks[i][:400]}...\"")
+    if args.trace_memory:
+        _, peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+        print(f"\n📊 Pico de memoria (tracemalloc): {peak / 1e6:.2f} MB")
 
+    print(f"\n📦 Chunks guardados en '{OUTPUT_FILE}'")
 
-# --- Guardar los chunks en formato JSON ---
-with open(OUTPUT_FILE, "w", encoding="utf-8") as f:
-    json.dump(chunks, f, ensure_ascii=False, indent=2)
 
-print(f"\n📦 Chunks guardados en '{OUTPUT_FILE}'")
+if __name__ == "__main__":
+    main()
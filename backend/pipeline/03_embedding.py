@@ -9,17 +9,36 @@ Características:
 - Funciona con o sin metadatos
 - Modelo parametrizable
 - Procesamiento de múltiples chunks
-- Salida en JSONL (estándar para vectores)
+- Batching por presupuesto de tokens + lotes concurrentes
+- Rate limiting (RPM/TPM) con reintentos y backoff exponencial
+- IDs estables por contenido + caché persistente: solo se embeben
+  los chunks nuevos o modificados
+- Salida binaria memory-mapped (.npy + sidecar de IDs/textos/metadata)
 - Código limpio, claro y mantenible
 """
 
 import json
-import uuid
+import math
+import threading
+import time
 import os
+from concurrent.futures import ThreadPoolExecutor, as_completed
 from pathlib import Path
-from typing import List, Dict, Any
-
-from openai import OpenAI
+from typing import List, Dict, Any, Optional, Tuple, Union
+
+from openai import (
+    OpenAI,
+    RateLimitError,
+    APIConnectionError,
+    APITimeoutError,
+    InternalServerError
+)
+from tenacity import (
+    retry,
+    retry_if_exception_type,
+    stop_after_attempt,
+    wait_random_exponential
+)
 
 
 # ===============================================================
@@ -32,13 +51,26 @@ from openai import OpenAI
 BASE_DIR = Path(__file__).resolve().parents[2]
 DATA_DIR = BASE_DIR / "data"
 
+from config import EMBEDDING_MODEL
+
 CONFIG = {
     "openai": {
-        "model": "text-embedding-3-large",  # cambiar aquí para experimentar
+        "model": EMBEDDING_MODEL,  # config.py: el mismo modelo embebe las queries (05)
+    },
+    "batching": {
+        # Límites por request de la API: 2048 inputs y 300k tokens.
+        # Nos quedamos por debajo para tener margen con la estimación.
+        "max_tokens_per_batch": 100_000,
+        "max_inputs_per_batch": 512,
+        "max_concurrency": 4,          # lotes en vuelo simultáneamente
+        "requests_per_minute": 3_000,  # límites de la cuenta (tier)
+        "tokens_per_minute": 1_000_000,
+        "max_retries": 6,
     },
     "paths": {
         "input_chunks": DATA_DIR / "02_chunking_output.json",
-        "output_embeddings": DATA_DIR / "03_embedding_output.jsonl"
+        # Prefijo: genera 03_embedding_output.npy + 03_embedding_output.meta.jsonl
+        "output_embeddings": DATA_DIR / "03_embedding_output"
     }
 }
 
@@ -51,6 +83,10 @@ CONFIG = {
 from utils import get_openai_client
 client = get_openai_client()
 
+from config import EMBEDDING_CACHE_ENABLED, EMBEDDING_STORAGE_DTYPE
+from embedding_cache import content_hash, get_embedding_cache
+import embedding_store
+
 # ===============================================================
 # FUNCIÓN: crear un embedding para un chunk
 # ===============================================================
@@ -112,28 +148,266 @@ def process_chunk(chunk: Dict[str, Any]) -> Dict[str, Any]:
     }
 
 
+# ===============================================================
+# BATCHING: estimación de tokens y armado de lotes
+# ===============================================================
+
+def estimate_tokens(text: str) -> int:
+    """
+    Estimación conservadora de tokens (~3 caracteres por token en
+    español). Solo se usa para armar lotes; el conteo real sale de
+    response.usage.
+    """
+    return max(1, math.ceil(len(text) / 3))
+
+
+def build_batches(
+    texts: List[str],
+    max_tokens: int = CONFIG["batching"]["max_tokens_per_batch"],
+    max_inputs: int = CONFIG["batching"]["max_inputs_per_batch"],
+    token_counts: Optional[List[Optional[int]]] = None
+) -> List[List[int]]:
+    """
+    Agrupa los índices de los textos en lotes consecutivos que no superan
+    el presupuesto de tokens ni el máximo de inputs por request.
+    token_counts: conteo real por texto (metadata "token_count" de los
+    chunks por tokens); donde falta se usa estimate_tokens().
+    """
+    batches = []
+    current, current_tokens = [], 0
+
+    for i, text in enumerate(texts):
+        tokens = (token_counts[i] if token_counts else None) or estimate_tokens(text)
+        if current and (current_tokens + tokens > max_tokens or len(current) >= max_inputs):
+            batches.append(current)
+            current, current_tokens = [], 0
+        current.append(i)
+        current_tokens += tokens
+
+    if current:
+        batches.append(current)
+
+    return batches
+
+
+# ===============================================================
+# RATE LIMITER: requests y tokens por minuto (token bucket)
+# ===============================================================
+
+class RateLimiter:
+    """
+    Doble token bucket (requests/min y tokens/min) compartido entre hilos.
+    acquire() bloquea hasta que haya capacidad para el lote.
+    """
+
+    def __init__(self, requests_per_minute: int, tokens_per_minute: int):
+        self.rpm = requests_per_minute
+        self.tpm = tokens_per_minute
+        self._requests = float(requests_per_minute)
+        self._tokens = float(tokens_per_minute)
+        self._last = time.monotonic()
+        self._lock = threading.Lock()
+
+    def _refill(self):
+        now = time.monotonic()
+        elapsed = now - self._last
+        self._last = now
+        self._requests = min(self.rpm, self._requests + elapsed * self.rpm / 60)
+        self._tokens = min(self.tpm, self._tokens + elapsed * self.tpm / 60)
+
+    def acquire(self, tokens: int):
+        # Un lote más grande que el bucket entero nunca cabría: se recorta
+        tokens = min(tokens, self.tpm)
+        while True:
+            with self._lock:
+                self._refill()
+                if self._requests >= 1 and self._tokens >= tokens:
+                    self._requests -= 1
+                    self._tokens -= tokens
+                    return
+                wait = max(
+                    (1 - self._requests) * 60 / self.rpm,
+                    (tokens - self._tokens) * 60 / self.tpm,
+                    0.01
+                )
+            time.sleep(wait)
+
+
+rate_limiter = RateLimiter(
+    CONFIG["batching"]["requests_per_minute"],
+    CONFIG["batching"]["tokens_per_minute"]
+)
+
+
+# ===============================================================
+# FUNCIÓN: crear embeddings para un lote (con reintentos)
+# ===============================================================
+
+@retry(
+    retry=retry_if_exception_type(
+        (RateLimitError, APIConnectionError, APITimeoutError, InternalServerError)
+    ),
+    wait=wait_random_exponential(multiplier=1, max=60),
+    stop=stop_after_attempt(CONFIG["batching"]["max_retries"]),
+    reraise=True
+)
+def create_embeddings_batch(
+    texts: List[str],
+    model: str = CONFIG["openai"]["model"]
+) -> Tuple[List[List[float]], int]:
+    """
+    Envía un lote de textos en un único request y devuelve
+    (vectores en el mismo orden que `texts`, tokens consumidos).
+    """
+    rate_limiter.acquire(sum(estimate_tokens(t) for t in texts))
+
+    response = client.embeddings.create(
+        model=model,
+        input=texts
+    )
+
+    # La API devuelve cada vector con su índice de entrada
+    vectors = [item.embedding for item in sorted(response.data, key=lambda d: d.index)]
+    usage = getattr(response, "usage", None)
+    tokens = usage.total_tokens if usage is not None else 0
+
+    return vectors, tokens
+
+
 # ===============================================================
 # FUNCIÓN: procesar múltiples chunks
 # ===============================================================
 
-def process_chunk_list(chunks: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+def process_chunk_list(
+    chunks: List[Dict[str, Any]],
+    max_concurrency: int = CONFIG["batching"]["max_concurrency"]
+) -> List[Dict[str, Any]]:
     """
     Procesa una lista completa de chunks y devuelve
     su lista de embeddings correspondientes.
+
+    Los chunks se agrupan en lotes por presupuesto de tokens y se envían
+    con hasta `max_concurrency` lotes en vuelo. El resultado conserva
+    el orden y los IDs de la entrada.
+
+    Si la caché de embeddings está activa, solo se envían a la API los
+    chunks cuyo texto no esté ya cacheado para el modelo actual.
     """
-    results = []
+    t_total = time.perf_counter()
+    model = CONFIG["openai"]["model"]
+    texts = [chunk["text"] for chunk in chunks]
+    for chunk in chunks:
+        if not chunk["text"].strip():
+            raise ValueError(f"El texto del chunk {chunk['id']} está vacío o es inválido.")
+
+    if EMBEDDING_CACHE_ENABLED:
+        cache = get_embedding_cache()
+        vectors: List[List[float]] = cache.get_many(texts, model)
+    else:
+        cache = None
+        vectors = [None] * len(chunks)
+
+    pending = [i for i, v in enumerate(vectors) if v is None]
+    print(f"Caché: {len(chunks) - len(pending)} chunks reutilizados, {len(pending)} por embeber")
+
+    token_counts = [chunks[i].get("metadata", {}).get("token_count") for i in pending]
+    batches = [[pending[j] for j in batch] for batch in build_batches([texts[i] for i in pending], token_counts=token_counts)]
+    total_tokens = 0
+    done_chunks = 0
+
+    print(f"Lotes: {len(batches)} (concurrencia: {max_concurrency})")
+    t0 = time.perf_counter()
+
+    with ThreadPoolExecutor(max_workers=max_concurrency) as executor:
+        futures = {
+            executor.submit(create_embeddings_batch, [texts[i] for i in batch], model): batch
+            for batch in batches
+        }
+        for future in as_completed(futures):
+            batch = futures[future]
+            batch_vectors, tokens = future.result()
+            for i, vector in zip(batch, batch_vectors):
+                vectors[i] = vector
+
+            if cache is not None:
+                cache.put_many([texts[i] for i in batch], batch_vectors, model)
+
+            total_tokens += tokens
+            done_chunks += len(batch)
+            print(f"[{done_chunks}/{len(pending)}] Lote de {len(batch)} chunks embebido")
+
+    # Throughput de la API solo con los chunks enviados (los de caché no
+    # cuentan); el total incluye la consulta a la caché
+    elapsed = time.perf_counter() - t0
+    total_elapsed = time.perf_counter() - t_total
+    print(
+        f"⏱️  API: {len(pending)} chunks embebidos en {elapsed:.2f}s → "
+        f"{len(pending) / max(elapsed, 1e-9):.1f} chunks/s, "
+        f"{total_tokens / max(elapsed, 1e-9):.0f} tokens/s"
+    )
+    print(
+        f"⏱️  Total: {len(chunks)} chunks (incluye caché) en {total_elapsed:.2f}s → "
+        f"{len(chunks) / max(total_elapsed, 1e-9):.1f} chunks/s"
+    )
 
-    for index, chunk in enumerate(chunks, start=1):
-        print(f"[{index}/{len(chunks)}] Embedding chunk {chunk['id']}...")
+    return [
+        {
+            "id": chunk["id"],
+            "text": chunk["text"],     # ← NECESARIO para CHROMA
+            "embedding": vector,
+            "metadata": chunk.get("metadata", {})
+        }
+        for chunk, vector in zip(chunks, vectors)
+    ]
 
-        embedded = process_chunk(chunk)
-        results.append(embedded)
 
-    return results
+# ===============================================================
+# FUNCIÓN: IDs estables por contenido
+# ===============================================================
+
+def assign_chunk_ids(raw_chunks: List[Union[str, Dict[str, Any]]]) -> List[Dict[str, Any]]:
+    """
+    Convierte los chunks de 02_chunking.py (textos planos o dicts
+    {"text", "metadata"}) al formato estándar con un ID derivado del
+    contenido (sha256 del texto normalizado). Mismo texto → mismo ID entre
+    ejecuciones; los duplicados exactos reciben un sufijo -1, -2, ...
+    """
+    seen: Dict[str, int] = {}
+    chunks = []
+    for raw in raw_chunks:
+        text = raw if isinstance(raw, str) else raw["text"]
+        base_id = content_hash(text)
+        n = seen.get(base_id, 0)
+        seen[base_id] = n + 1
+        chunks.append({
+            "id": base_id if n == 0 else f"{base_id}-{n}",
+            "text": text,
+            "metadata": {} if isinstance(raw, str) else raw.get("metadata", {})
+        })
+    return chunks
+
+
+# ===============================================================
+# FUNCIÓN: guardar embeddings (binario memory-mapped)
+# ===============================================================
+
+def save_embeddings(
+    embeddings: List[Dict[str, Any]],
+    output_prefix: Path,
+    dtype: str = EMBEDDING_STORAGE_DTYPE
+) -> None:
+    """
+    Exporta los embeddings como matriz .npy (float32/float16) más un
+    sidecar .meta.jsonl con IDs, textos y metadatos (mismo orden).
+    """
+    embedding_store.save_embeddings(embeddings, output_prefix, dtype=dtype)
+
+    print(f"Embeddings guardados en: {embedding_store.matrix_path(output_prefix)} "
+          f"(+ {embedding_store.sidecar_path(output_prefix).name})")
 
 
 # ===============================================================
-# FUNCIÓN: guardar embeddings en JSONL
+# FUNCIÓN: guardar embeddings en JSONL (formato anterior)
 # ===============================================================
 
 def save_as_jsonl(
@@ -143,6 +417,7 @@ def save_as_jsonl(
     """
     Exporta los embeddings en formato JSONL.
     Cada línea = un vector con metadatos.
+    Se conserva por compatibilidad; el pipeline usa save_embeddings().
     """
     with open(output_path, "w", encoding="utf-8") as f:
         for row in embeddings:
@@ -170,22 +445,16 @@ def main():
     print(f"Cargando chunks desde: {input_path}")
 
     with open(input_path, "r", encoding="utf-8") as f:
-        raw_chunks: List[str] = json.load(f)
+        raw_chunks: List[Union[str, Dict[str, Any]]] = json.load(f)
 
-    # Convertir texto simple a formato estándar
-    chunks = []
-    for text in raw_chunks:
-        chunks.append({
-            "id": str(uuid.uuid4()),
-            "text": text,
-            "metadata": {}  # opcional
-        })
+    # Convertir texto simple a formato estándar (IDs por contenido)
+    chunks = assign_chunk_ids(raw_chunks)
 
     print(f"Total de chunks: {len(chunks)}")
 
     embeddings = process_chunk_list(chunks)
 
-    save_as_jsonl(embeddings, output_path)
+    save_embeddings(embeddings, output_path)
 
     print("\nProceso completado ✓")
 
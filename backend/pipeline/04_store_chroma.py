@@ -1,66 +1,286 @@
+"""
+STEP 4 — Indexación incremental en ChromaDB
+
+En lugar de borrar y reconstruir la colección en cada ejecución:
+- Cada registro tiene un ID estable por contenido (ver 03_embedding.py)
+  y una huella (texto + metadata + vector)
+- Se compara contra el manifiesto de la última indexación
+- Se hace upsert solo de chunks nuevos o modificados y se eliminan los
+  que ya no existen
+- La entrada se recorre por porciones del tamaño máximo de batch de Chroma
+
+Reconstrucción blue/green (--rebuild): se construye una colección nueva
+`fundamentos_ia__v{n+1}` mientras la API sigue sirviendo la activa, y al
+terminar se mueve el alias (ver collection_alias.py). Se conservan las
+últimas COLLECTION_KEEP_VERSIONS versiones (mínimo 2: activa + anterior),
+y una versión retirada no se borra hasta pasado el período de gracia
+(COLLECTION_ALIAS_POLL_SECONDS + COLLECTION_DRAIN_SECONDS) para que las
+consultas en curso sobre ella terminen.
+
+Uso:
+    python 04_store_chroma.py            # incremental sobre la versión activa
+    python 04_store_chroma.py --full     # ignora el manifiesto (re-sincroniza todo)
+    python 04_store_chroma.py --rebuild  # versión nueva + cambio atómico de alias
+"""
+
+import argparse
+import hashlib
 import json
-from chromadb import PersistentClient
-from chromadb.errors import NotFoundError
+import os
+import time
+from datetime import datetime, timezone
+from itertools import islice
 from pathlib import Path
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+
+import numpy as np
+from chromadb import PersistentClient
+
+import embedding_store
+import collection_alias
+from config import (
+    COLLECTION_ALIAS,
+    COLLECTION_KEEP_VERSIONS,
+    COLLECTION_ALIAS_POLL_SECONDS,
+    COLLECTION_DRAIN_SECONDS
+)
 
 # =========================
 # CONFIG
 # =========================
 BASE_DIR = Path(__file__).resolve().parents[2]
 DATA_DIR = BASE_DIR / "data"
-EMBED_FILE = DATA_DIR / "03_embedding_output.jsonl"
+EMBED_PREFIX = DATA_DIR / "03_embedding_output"              # formato binario (.npy + .meta.jsonl)
+LEGACY_EMBED_FILE = DATA_DIR / "03_embedding_output.jsonl"   # formato anterior
 CHROMA_DIR = DATA_DIR / "04_store_chroma_db_output"
+MANIFEST_FILE = DATA_DIR / "04_store_chroma_manifest.json"
+
+DEFAULT_METADATA = embedding_store.DEFAULT_METADATA
+
 
 # =========================
-# INIT CLIENT
+# LOAD EMBEDDINGS (por porciones)
 # =========================
-print("📌 Inicializando cliente persistente de Chroma...")
-client = PersistentClient(path=str(CHROMA_DIR))
+def iter_legacy_jsonl(path, batch_size):
+    """Lee el JSONL anterior en streaming, con el mismo contrato que iter_batches()."""
+    with open(path, "r", encoding="utf-8") as f:
+        while True:
+            rows = [json.loads(line) for line in islice(f, batch_size)]
+            if not rows:
+                break
+            for record in rows:
+                if "embedding" not in record: raise ValueError("❗ Falta 'embedding'")
+                if "text" not in record: raise ValueError("❗ Falta 'text'")
+                if "id" not in record: raise ValueError("❗ Falta 'id'")
+            yield (
+                [r["id"] for r in rows],
+                [r["text"] for r in rows],
+                [r.get("metadata") for r in rows],
+                np.asarray([r["embedding"] for r in rows], dtype=np.float32)
+            )
+
+
+def iter_input(batch_size: int, prefix: Path = EMBED_PREFIX) -> Iterator[Tuple[List[str], List[str], List[Dict[str, Any]], np.ndarray]]:
+    """Recorre la salida de 03_embedding.py (binaria o JSONL) por porciones."""
+    if embedding_store.exists(prefix):
+        print(f"📂 Leyendo '{embedding_store.matrix_path(prefix)}' (memory-mapped)")
+        return embedding_store.iter_batches(prefix, batch_size)
+
+    print(f"📂 Formato binario no encontrado, leyendo '{LEGACY_EMBED_FILE}'")
+    print("   (conviértelo con: python embedding_store.py convert)")
+    return iter_legacy_jsonl(LEGACY_EMBED_FILE, batch_size)
+
 
 # =========================
-# GET OR CREATE COLLECTION
+# MANIFIESTO
 # =========================
-collection_name = "fundamentos_ia"
+def fingerprint(text: str, metadata: Dict[str, Any], vector: np.ndarray) -> str:
+    """Huella de un registro: cambia si cambia el texto, la metadata o el vector."""
+    h = hashlib.sha256()
+    h.update(text.encode("utf-8"))
+    h.update(json.dumps(metadata, sort_keys=True, ensure_ascii=False).encode("utf-8"))
+    h.update(np.ascontiguousarray(vector, dtype=np.float32).tobytes())
+    return h.hexdigest()
+
+
+def load_manifest(collection_name: str, path: Path = MANIFEST_FILE) -> Optional[Dict[str, str]]:
+    """Devuelve {id: huella} de la última indexación, o None si no aplica."""
+    if not path.exists():
+        return None
+    with open(path, "r", encoding="utf-8") as f:
+        manifest = json.load(f)
+    if manifest.get("collection") != collection_name:
+        return None
+    return manifest.get("entries", {})
+
 
-# 1. Intentar borrar si existe
-try:
-    client.delete_collection(name=collection_name)
-    print(f"🗑️ Colección '{collection_name}' eliminada (limpieza previa).")
-except NotFoundError:
-    print(f"ℹ️ La colección '{collection_name}' no existía, seguimos...")
+def save_manifest(collection_name: str, entries: Dict[str, str], path: Path = MANIFEST_FILE) -> None:
+    """Escribe el manifiesto de forma atómica (archivo temporal + replace)."""
+    tmp = path.with_suffix(path.suffix + ".tmp")
+    with open(tmp, "w", encoding="utf-8") as f:
+        json.dump({
+            "collection": collection_name,
+            "count": len(entries),
+            "updated_at": datetime.now(timezone.utc).isoformat(),
+            "entries": entries,
+        }, f, ensure_ascii=False)
+    os.replace(tmp, path)
 
-# 2. Crear nueva
-print("🆕 Creando nueva colección...")
-collection = client.create_collection(name=collection_name, metadata={"hnsw:space": "cosine"})
 
 # =========================
-# LOAD EMBEDDINGS
+# SINCRONIZACIÓN
 # =========================
-embeddings = []
-with open(EMBED_FILE, "r", encoding="utf-8") as f:
-    for line in f:
-        record = json.loads(line)
+def sync_collection(collection, batch_size: int, manifest: Optional[Dict[str, str]]) -> Dict[str, str]:
+    """
+    Aplica a `collection` la diferencia entre la entrada y el manifiesto.
+    Devuelve el nuevo manifiesto {id: huella}.
+    """
+    if manifest is None:
+        # Sin manifiesto confiable: se toman los IDs presentes en la
+        # colección con huella desconocida (se re-escriben todos).
+        existing = collection.get(include=[])["ids"]
+        manifest = {doc_id: "" for doc_id in existing}
+        print(f"ℹ️ Sin manifiesto: {len(existing)} IDs existentes en la colección")
 
-        if "embedding" not in record: raise ValueError("❗ Falta 'embedding'")
-        if "text" not in record: raise ValueError("❗ Falta 'text'")
-        if "id" not in record: raise ValueError("❗ Falta 'id'")
+    new_entries: Dict[str, str] = {}
+    pending: Dict[str, list] = {"ids": [], "documents": [], "metadatas": [], "embeddings": []}
+    upserted = unchanged = 0
 
-        if "metadata" not in record or not record["metadata"]:
-            record["metadata"] = {"source": "fundamentos_ia"}
+    def flush():
+        nonlocal upserted
+        if not pending["ids"]:
+            return
+        collection.upsert(
+            ids=pending["ids"],
+            embeddings=np.asarray(pending["embeddings"], dtype=np.float32),
+            documents=pending["documents"],
+            metadatas=pending["metadatas"]
+        )
+        upserted += len(pending["ids"])
+        for values in pending.values():
+            values.clear()
 
-        embeddings.append(record)
+    for ids, texts, metadatas, vectors in iter_input(batch_size):
+        for i, (doc_id, text, meta) in enumerate(zip(ids, texts, metadatas)):
+            meta = {**DEFAULT_METADATA, **(meta or {})}
+            fp = fingerprint(text, meta, vectors[i])
+            new_entries[doc_id] = fp
+
+            if manifest.get(doc_id) == fp:
+                unchanged += 1
+                continue
+
+            pending["ids"].append(doc_id)
+            pending["documents"].append(text)
+            pending["metadatas"].append(meta)
+            # Solo las filas modificadas se materializan en float32
+            pending["embeddings"].append(np.asarray(vectors[i], dtype=np.float32))
+            if len(pending["ids"]) >= batch_size:
+                flush()
+    flush()
+
+    removed = [doc_id for doc_id in manifest if doc_id not in new_entries]
+    for start in range(0, len(removed), batch_size):
+        collection.delete(ids=removed[start:start + batch_size])
+
+    print(f"📦 Upsert: {upserted} | Sin cambios: {unchanged} | Eliminados: {len(removed)}")
+    return new_entries
 
-print(f"📦 Cargando {len(embeddings)} embeddings en Chroma...")
 
 # =========================
-# INSERT INTO COLLECTION
+# BLUE/GREEN
 # =========================
-collection.add(
-    ids=[e["id"] for e in embeddings],
-    embeddings=[e["embedding"] for e in embeddings],
-    documents=[e["text"] for e in embeddings],
-    metadatas=[e["metadata"] for e in embeddings]
-)
+def rebuild(client) -> str:
+    """
+    Construye una versión nueva completa y mueve el alias al terminar.
+    Devuelve el nombre de la colección nueva.
+    """
+    versions = collection_alias.list_versions(client)
+    version = (versions[-1] if versions else 0) + 1
+    name = collection_alias.versioned_name(version)
+
+    print(f"🆕 Construyendo '{name}' (la versión activa sigue sirviendo)...")
+    collection = client.create_collection(name=name, metadata={"hnsw:space": "cosine"})
+    entries = sync_collection(collection, client.get_max_batch_size(), manifest={})
+    save_manifest(name, entries)
+
+    collection_alias.write_alias(name, version, revision=collection_alias.content_revision(entries))
+    print(f"🔀 Alias '{COLLECTION_ALIAS}' → '{name}'")
+
+    prune_versions(client, keep=COLLECTION_KEEP_VERSIONS)
+    return name
+
+
+def prune_versions(
+    client,
+    keep: int,
+    grace_seconds: float = COLLECTION_ALIAS_POLL_SECONDS + COLLECTION_DRAIN_SECONDS
+) -> None:
+    """
+    Elimina versiones antiguas, conservando las `keep` más recientes (mínimo 2)
+    y las retiradas hace menos de `grace_seconds`: la API ve el alias nuevo
+    dentro de COLLECTION_ALIAS_POLL_SECONDS y drena la versión anterior en
+    COLLECTION_DRAIN_SECONDS como máximo.
+    """
+    keep = max(keep, 2)
+    active = collection_alias.resolve_collection_name()
+    retired = collection_alias.retired_seconds()
+    for version in collection_alias.list_versions(client)[:-keep]:
+        name = collection_alias.versioned_name(version)
+        if name == active:
+            continue
+        if retired.get(name, grace_seconds) < grace_seconds:
+            print(f"⏳ '{name}' retirada hace {retired[name]:.0f}s: se conserva (consultas en curso)")
+            continue
+        client.delete_collection(name=name)
+        print(f"🗑️ Versión antigua '{name}' eliminada")
+
+
+def run(full: bool = False, new_version: bool = False) -> Tuple[str, int]:
+    """
+    Sincroniza los embeddings de 03 con la colección activa (o una versión
+    nueva si new_version). Devuelve (colección, cantidad de chunks).
+    """
+    # =========================
+    # INIT CLIENT
+    # =========================
+    print("📌 Inicializando cliente persistente de Chroma...")
+    t0 = time.perf_counter()
+    client = PersistentClient(path=str(CHROMA_DIR))
+
+    # read_alias valida que el puntero sea de COLLECTION_ALIAS
+    pointer = collection_alias.read_alias(COLLECTION_ALIAS)
+    if new_version or pointer is None or pointer.get("version") is None:
+        # Primera ejecución con colecciones versionadas, reconstrucción pedida
+        # o alias sobre una colección sin versionar (ej. la de ingest_corpus.py)
+        name = rebuild(client)
+        entries = load_manifest(name) or {}
+    else:
+        # Incremental sobre la versión activa: upsert/delete, nunca se
+        # borra la colección, la API puede seguir consultándola
+        name = pointer["collection"]
+        collection = client.get_collection(name=name)
+        manifest = None if full else load_manifest(name)
+        entries = sync_collection(collection, client.get_max_batch_size(), manifest)
+        save_manifest(name, entries)
+        # Nueva revisión en el puntero: la API invalida sus cachés de respuestas
+        if collection_alias.mark_updated(name, collection_alias.content_revision(entries)):
+            print(f"🔖 Revisión de '{name}' actualizada")
+        # Versiones que quedaron en período de gracia en un --rebuild anterior
+        prune_versions(client, keep=COLLECTION_KEEP_VERSIONS)
+
+    print(f"✅ Vector DB '{name}' sincronizada ({len(entries)} chunks) en {time.perf_counter() - t0:.2f}s")
+    return name, len(entries)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Indexación incremental en ChromaDB")
+    parser.add_argument("--full", action="store_true", help="Ignora el manifiesto y re-sincroniza todo")
+    parser.add_argument("--rebuild", action="store_true", help="Construye una versión nueva y cambia el alias")
+    args = parser.parse_args()
+
+    run(full=args.full, new_version=args.rebuild)
 
-print("✅ Vector DB guardada correctamente")
 
+if __name__ == "__main__":
+    main()
@@ -2,73 +2,157 @@
 STEP 5 — Motor de recuperación
 Responsabilidades:
 - Generar embedding de la query
-- Consultar ChromaDB
+- Consultar el backend de recuperación (ChromaDB o NumPy exacto)
 - Filtrar por distancia
 - Retornar chunks con metadata
+
+Expone una versión síncrona (scripts / CLI) y una asíncrona (API):
+- retrieve()  → cliente OpenAI síncrono
+- aretrieve() → cliente OpenAI asíncrono + búsqueda en un executor acotado
+
+La búsqueda se delega en un backend (retrieval_backends.py) elegido con
+RETRIEVAL_BACKEND en config.py. Con Chroma, la colección se resuelve a
+través del alias y cambia de versión en caliente (blue/green).
 """
 
-from chromadb import PersistentClient
-from pathlib import Path
-from openai import OpenAI
-from config import EMBEDDING_MODEL
+from concurrent.futures import ThreadPoolExecutor
+
+import metrics
+import tracing
+from config import (
+    CACHE_IO_MAX_WORKERS,
+    EMBEDDING_MODEL,
+    RETRIEVAL_MAX_WORKERS,
+    RETRIEVAL_BACKEND
+)
+from query_embedding_cache import create_query_embedding_cache
+from retrieval_backends import create_backend
 
 # =============================
 # INIT
 # =============================
 
-BASE_DIR = Path(__file__).resolve().parents[2]
-DATA_DIR = BASE_DIR / "data"
-CHROMA_DIR = DATA_DIR / "04_store_chroma_db_output"
+# Backend de recuperación seleccionado en config.py ("chroma" | "numpy")
+retrieval_backend = create_backend(RETRIEVAL_BACKEND)
 
-client_chroma = PersistentClient(path=str(CHROMA_DIR))
-collection = client_chroma.get_collection("fundamentos_ia")
-
-from utils import get_openai_client
+from utils import get_openai_client, get_async_openai_client, run_in_executor
 client_openai = get_openai_client()
+client_openai_async = get_async_openai_client()
+
+# Las búsquedas del backend son bloqueantes: se aíslan en un pool acotado
+# para que las consultas concurrentes no bloqueen el event loop.
+retrieval_executor = ThreadPoolExecutor(
+    max_workers=RETRIEVAL_MAX_WORKERS,
+    thread_name_prefix="retrieval"
+)
+
+# Lecturas/escrituras SQLite de las cachés (query y respuestas): fuera del
+# event loop, en su propio pool para no competir con las búsquedas
+cache_executor = ThreadPoolExecutor(
+    max_workers=CACHE_IO_MAX_WORKERS,
+    thread_name_prefix="cache-io"
+)
+
+# Caché de queries: LRU/TTL en memoria + caché persistente compartida con
+# 03_embedding.py (queries repetidas no vuelven a pagar el round trip)
+query_cache = create_query_embedding_cache(EMBEDDING_MODEL, executor=cache_executor)
+metrics.register_stats("query_embedding_cache", query_cache.stats)
 
 # =============================
 # EMBEDDINGS
 # =============================
 
-def embed_query(query: str):
-    """Genera embedding de la query usando el modelo definido en config."""
+def _create_query_embedding(query: str):
     response = client_openai.embeddings.create(
         model=EMBEDDING_MODEL,
         input=query
     )
+    metrics.record_embedding_tokens(getattr(response.usage, "prompt_tokens", 0) or 0)
+    return response.data[0].embedding
+
+
+async def _acreate_query_embedding(query: str):
+    response = await client_openai_async.embeddings.create(
+        model=EMBEDDING_MODEL,
+        input=query
+    )
+    metrics.record_embedding_tokens(getattr(response.usage, "prompt_tokens", 0) or 0)
     return response.data[0].embedding
 
 
+def embed_query(query: str):
+    """Genera embedding de la query usando el modelo definido en config."""
+    with tracing.span("rag.embed_query", **{"embedding.model": EMBEDDING_MODEL}), metrics.stage("embed"):
+        return query_cache.get_or_compute(query, _create_query_embedding)
+
+
+async def aembed_query(query: str):
+    """Versión asíncrona de embed_query()."""
+    with tracing.span("rag.embed_query", **{"embedding.model": EMBEDDING_MODEL}), metrics.stage("embed"):
+        return await query_cache.aget_or_compute(query, _acreate_query_embedding)
+
+
 # =============================
 # RETRIEVE
 # =============================
 
+def query_collection(query_emb, n_results: int):
+    """Búsqueda cruda en el backend activo (bloqueante)."""
+    with tracing.span("rag.vector_search", **{"retrieval.index_version": retrieval_backend.version}) as current, \
+            metrics.stage("retrieve"):
+        results = retrieval_backend.search(query_emb, n_results)
+        current.set_attribute("retrieval.raw_hits", len(results))
+        return results
+
+
+def filter_results(results, distance_threshold: float):
+    """Filtra por distancia los chunks devueltos por el backend."""
+    return [c for c in results if c["distance"] <= distance_threshold]
+
+
+def _retrieve_span(n_results: int, distance_threshold: float):
+    return tracing.span("rag.retrieve", **{
+        "retrieval.n_results": n_results,
+        "retrieval.distance_threshold": distance_threshold,
+    })
+
+
+def retrieve_with_embedding(query: str, n_results: int, distance_threshold: float):
+    """Como retrieve(), pero devuelve también el embedding de la query."""
+
+    query_emb = embed_query(query)
+    with _retrieve_span(n_results, distance_threshold) as current:
+        chunks = filter_results(query_collection(query_emb, n_results), distance_threshold)
+        current.set_attribute("retrieval.hits", len(chunks))
+    return query_emb, chunks
+
+
 def retrieve(query: str, n_results: int, distance_threshold: float):
     """
     Recupera los chunks más relevantes filtrados por distancia.
     Los parámetros SIEMPRE vienen desde rag_query().
     """
 
-    query_emb = embed_query(query)
+    return retrieve_with_embedding(query, n_results, distance_threshold)[1]
 
-    raw = collection.query(
-        query_embeddings=[query_emb],
-        n_results=n_results,
-        include=["documents", "distances", "metadatas"]
-    )
 
-    docs = raw["documents"][0]
-    dists = raw["distances"][0]
-    metas = raw["metadatas"][0]
-
-    # Filtrar y estructurar
-    filtered = []
-    for doc, dist, meta in zip(docs, dists, metas):
-        if dist <= distance_threshold:
-            filtered.append({
-                "document": doc,
-                "distance": float(dist),
-                "metadata": meta
-            })
-
-    return filtered
+async def aretrieve_with_embedding(query: str, n_results: int, distance_threshold: float):
+    """Como aretrieve(), pero devuelve también el embedding de la query."""
+
+    query_emb = await aembed_query(query)
+    with _retrieve_span(n_results, distance_threshold) as current:
+        # run_in_executor copia el contexto: el span de la búsqueda cuelga de este
+        raw = await run_in_executor(retrieval_executor, query_collection, query_emb, n_results)
+        chunks = filter_results(raw, distance_threshold)
+        current.set_attribute("retrieval.hits", len(chunks))
+    return query_emb, chunks
+
+
+async def aretrieve(query: str, n_results: int, distance_threshold: float):
+    """
+    Versión asíncrona de retrieve().
+    El embedding usa el cliente async y la búsqueda corre en
+    retrieval_executor, así el event loop queda libre durante toda la llamada.
+    """
+
+    return (await aretrieve_with_embedding(query, n_results, distance_threshold))[1]
@@ -4,9 +4,25 @@ STEP 6 — Ejecución completa del sistema RAG
 - Lee parámetros desde config.py
 - Recuperación de información (STEP 5)
 - Generación de respuesta LLM (STEP 6)
+
+rag_query() es la versión síncrona (CLI); arag_query() la usa la API
+para no bloquear el event loop mientras se espera a OpenAI.
+Con profile=True el resultado incluye "profile": milisegundos por etapa,
+tokens, origen de la respuesta y (muestreado) un resumen de cProfile.
+
+Antes de llamar al LLM se consultan dos cachés: la exacta
+(response_cache.py) y la semántica para paráfrasis (semantic_cache.py).
+En las versiones async el nivel SQLite de la caché exacta corre en
+query_core.cache_executor, fuera del event loop.
 """
 
-from utils import get_openai_client
+import asyncio
+import sys
+from contextlib import contextmanager
+
+import metrics
+import tracing
+from utils import get_openai_client, get_async_openai_client, run_in_executor
 from config import (
     QUERY,
     DEFAULT_MODE,
@@ -16,23 +32,52 @@ from config import (
     MAX_TOKENS,
     TEMPERATURE,
     SYSTEM_PROMPT,
-    USER_PROMPT_TEMPLATE
+    USER_PROMPT_TEMPLATE,
+    RESPONSE_CACHE_ENABLED,
+    SEMANTIC_CACHE_ENABLED,
+    PROFILE_CPROFILE_SAMPLE_RATE,
+    PROFILE_CPROFILE_TOP_N
 )
+from response_cache import ResponseCache, cache_generation, response_cache_key
+from semantic_cache import SemanticCache
 import importlib
 
 # Import dinámico del motor de recuperación
 query_core = importlib.import_module("05_query_core")
 retrieve = query_core.retrieve
+aretrieve = query_core.aretrieve
+retrieve_with_embedding = query_core.retrieve_with_embedding
+aretrieve_with_embedding = query_core.aretrieve_with_embedding
 
 client_openai = get_openai_client()
+client_openai_async = get_async_openai_client()
+
+# Caché exacta de respuestas (se invalida sola si cambian índice o prompts)
+response_cache = ResponseCache() if RESPONSE_CACHE_ENABLED else None
+
+# Caché semántica: paráfrasis con los mismos chunks recuperados
+semantic_cache = SemanticCache() if SEMANTIC_CACHE_ENABLED else None
+_audit_tasks = set()
+
+if response_cache is not None:
+    metrics.register_stats("response_cache", response_cache.stats)
+if semantic_cache is not None:
+    metrics.register_stats("semantic_cache", semantic_cache.stats)
 
 
 # =============================
 # STEP 6 — LLM Response
 # =============================
-def generar_respuesta(query: str, chunks: list):
-    """Genera respuesta usando los documentos recuperados."""
+def construir_mensajes(query: str, chunks: list):
+    """Arma los mensajes (system + user) para el LLM a partir de los chunks."""
+
+    with tracing.span("rag.build_prompt", **{"prompt.chunks": len(chunks)}) as current:
+        messages = _construir_mensajes(query, chunks)
+        current.set_attribute("prompt.chars", sum(len(m["content"]) for m in messages))
+    return messages
 
+
+def _construir_mensajes(query: str, chunks: list):
     if not chunks:
         context_section = ""
     else:
@@ -45,29 +90,88 @@ def generar_respuesta(query: str, chunks: list):
         context_section=context_section
     )
 
-    completion = client_openai.chat.completions.create(
-        model=LLM_MODEL,
-        messages=[
-            {"role": "system", "content": SYSTEM_PROMPT},
-            {"role": "user", "content": prompt},
-        ],
-        max_tokens=MAX_TOKENS,
-        temperature=TEMPERATURE
-    )
+    return [
+        {"role": "system", "content": SYSTEM_PROMPT},
+        {"role": "user", "content": prompt},
+    ]
+
+
+def _llm_span(stream: bool = False):
+    return tracing.span("llm.completion", kind=tracing.SpanKind.CLIENT, **{
+        "llm.model": LLM_MODEL,
+        "llm.max_tokens": MAX_TOKENS,
+        "llm.stream": stream,
+    })
+
+
+def generar_respuesta(query: str, chunks: list):
+    """Genera respuesta usando los documentos recuperados."""
+
+    messages = construir_mensajes(query, chunks)
+    with _llm_span() as current, metrics.stage("generate"):
+        completion = client_openai.chat.completions.create(
+            model=LLM_MODEL,
+            messages=messages,
+            max_tokens=MAX_TOKENS,
+            temperature=TEMPERATURE
+        )
+        tracing.record_usage(current, completion.usage)
+    metrics.record_usage(completion.usage)
 
     return completion.choices[0].message.content
 
 
+async def agenerar_respuesta(query: str, chunks: list):
+    """Versión asíncrona de generar_respuesta()."""
+
+    messages = construir_mensajes(query, chunks)
+    with _llm_span() as current, metrics.stage("generate"):
+        completion = await client_openai_async.chat.completions.create(
+            model=LLM_MODEL,
+            messages=messages,
+            max_tokens=MAX_TOKENS,
+            temperature=TEMPERATURE
+        )
+        tracing.record_usage(current, completion.usage)
+    metrics.record_usage(completion.usage)
+
+    return completion.choices[0].message.content
+
+
+async def agenerar_respuesta_stream(query: str, chunks: list):
+    """
+    Genera la respuesta en streaming: produce los fragmentos de texto
+    a medida que llegan desde OpenAI.
+    """
+
+    messages = construir_mensajes(query, chunks)
+    with _llm_span(stream=True) as current, metrics.stage("generate"):
+        stream = await client_openai_async.chat.completions.create(
+            model=LLM_MODEL,
+            messages=messages,
+            max_tokens=MAX_TOKENS,
+            temperature=TEMPERATURE,
+            stream=True,
+            stream_options={"include_usage": True}
+        )
+
+        async for event in stream:
+            # El último evento trae solo el usage (include_usage)
+            if getattr(event, "usage", None) is not None:
+                metrics.record_usage(event.usage)
+                tracing.record_usage(current, event.usage)
+            if not event.choices:
+                continue
+            delta = event.choices[0].delta.content
+            if delta:
+                yield delta
+
+
 # =============================
 # FUNCIÓN PRINCIPAL PIPELINE
 # =============================
-def rag_query(
-    query: str = None,
-    mode: str = None,
-    n_results: int = None,
-    distance_threshold: float = None
-):
-    """Pipeline principal del sistema RAG."""
+def _resolver_parametros(query, mode, n_results, distance_threshold):
+    """Completa con los valores de config.py los parámetros no indicados."""
 
     # Query desde config si no se pasa manualmente
     if query is None:
@@ -84,15 +188,250 @@ def rag_query(
     if distance_threshold is None:
         distance_threshold = DISTANCE_THRESHOLD
 
-    chunks = retrieve(query, n_results, distance_threshold)
+    return query, mode, n_results, distance_threshold
+
+
+def rag_cache_key(query: str, n_results: int, distance_threshold: float):
+    """(clave, generación) de la caché de respuestas para estos parámetros."""
+    generation = cache_generation(query_core.retrieval_backend.version)
+    return response_cache_key(query, n_results, distance_threshold, generation), generation
+
+
+def _leer_cache(use_cache) -> bool:
+    """
+    True si hay que consultar la caché de respuestas.
+    Con use_cache=False no se lee la caché, pero la respuesta nueva la refresca.
+    """
+    if response_cache is None:
+        return False
+    if not use_cache:
+        response_cache.record_bypass()
+        return False
+    return True
+
+
+def _buscar_en_cache(query, n_results, distance_threshold, use_cache):
+    """Devuelve (resultado cacheado o None, clave, generación)."""
+    key, generation = rag_cache_key(query, n_results, distance_threshold)
+    cached = response_cache.get(key, generation) if _leer_cache(use_cache) else None
+    if cached is not None:
+        _registrar_origen("response_cache")
+    return cached, key, generation
+
+
+async def _abuscar_en_cache(query, n_results, distance_threshold, use_cache):
+    """Como _buscar_en_cache(), con la lectura (memoria + SQLite) en cache_executor."""
+    key, generation = rag_cache_key(query, n_results, distance_threshold)
+    cached = None
+    if _leer_cache(use_cache):
+        cached = await run_in_executor(query_core.cache_executor, response_cache.get, key, generation)
+    if cached is not None:
+        _registrar_origen("response_cache")
+    return cached, key, generation
+
+
+def _buscar_semantica(query_emb, chunks, generation, use_cache):
+    """Respuesta de una paráfrasis previa con los mismos chunks, o None."""
+    if semantic_cache is None or not use_cache:
+        return None
+    return semantic_cache.lookup(query_emb, [c["id"] for c in chunks], generation)
+
+
+def _registrar_origen(source: str):
+    metrics.RAG_RESULTS.inc(source=source)
+    metrics.annotate(source=source)
+
+
+def _guardar_en_semantica(generation, query_emb, resultado, semantic_hit):
+    _registrar_origen("semantic_cache" if semantic_hit else "llm")
+    if semantic_cache is not None and not semantic_hit:
+        semantic_cache.put(
+            query_emb,
+            [c["id"] for c in resultado["chunks"]],
+            resultado["respuesta"],
+            generation
+        )
+
+
+def _guardar_en_caches(key, generation, query_emb, resultado, semantic_hit):
+    _guardar_en_semantica(generation, query_emb, resultado, semantic_hit)
+    if response_cache is not None:
+        response_cache.put(key, generation, resultado)
+
+
+async def _aguardar_en_caches(key, generation, query_emb, resultado, semantic_hit):
+    """Como _guardar_en_caches(), con la escritura SQLite en cache_executor."""
+    _guardar_en_semantica(generation, query_emb, resultado, semantic_hit)
+    if response_cache is not None:
+        await run_in_executor(query_core.cache_executor, response_cache.put, key, generation, resultado)
+
+
+async def _auditar_hit_semantico(query, chunks, cached_answer):
+    """Re-genera la respuesta de un hit semántico y la compara con la cacheada."""
+    try:
+        fresh = await agenerar_respuesta(query, chunks)
+        if semantic_cache.record_audit(cached_answer, fresh):
+            print(f"⚠️  Falso hit semántico detectado para: {query!r}")
+    except Exception as e:
+        print(f"⚠️  Auditoría de caché semántica fallida: {e}")
+
+
+@contextmanager
+def _perfil(resultado: dict):
+    """Mide el bloque y agrega resultado["profile"] (etapas, tokens, cProfile)."""
+    with metrics.request_profile() as request, \
+            metrics.sampled_cprofile(PROFILE_CPROFILE_SAMPLE_RATE, PROFILE_CPROFILE_TOP_N) as dump:
+        yield
+    resultado["profile"] = {**request.as_dict(), **dump}
+
+
+def rag_query(
+    query: str = None,
+    mode: str = None,
+    n_results: int = None,
+    distance_threshold: float = None,
+    use_cache: bool = True,
+    profile: bool = False
+):
+    """
+    Pipeline principal del sistema RAG.
+    En modo "full" consulta primero las cachés de respuestas
+    (use_cache=False las omite para esta llamada).
+    Con profile=True agrega "profile" al resultado.
+    """
+    if not profile:
+        return _rag_query(query, mode, n_results, distance_threshold, use_cache)
+
+    extra = {}
+    with _perfil(extra):
+        resultado = _rag_query(query, mode, n_results, distance_threshold, use_cache)
+    # Copia: el resultado puede ser el mismo dict guardado en la caché
+    return {**resultado, **extra}
+
+
+def _rag_query(query, mode, n_results, distance_threshold, use_cache):
+    query, mode, n_results, distance_threshold = _resolver_parametros(
+        query, mode, n_results, distance_threshold
+    )
 
     if mode == "raw":
-        return {"query": query, "chunks": chunks}
+        return {"query": query, "chunks": retrieve(query, n_results, distance_threshold)}
+
+    cached, key, generation = _buscar_en_cache(query, n_results, distance_threshold, use_cache)
+    if cached is not None:
+        return {**cached, "query": query}
+
+    query_emb, chunks = retrieve_with_embedding(query, n_results, distance_threshold)
 
-    # Generación final
-    respuesta = generar_respuesta(query, chunks)
+    respuesta = _buscar_semantica(query_emb, chunks, generation, use_cache)
+    semantic_hit = respuesta is not None
+    if semantic_hit and semantic_cache.should_audit():
+        semantic_cache.record_audit(respuesta, generar_respuesta(query, chunks))
+
+    if not semantic_hit:
+        # Generación final
+        respuesta = generar_respuesta(query, chunks)
+
+    resultado = {"query": query, "chunks": chunks, "respuesta": respuesta}
+    _guardar_en_caches(key, generation, query_emb, resultado, semantic_hit)
+    return resultado
+
+
+async def arag_query(
+    query: str = None,
+    mode: str = None,
+    n_results: int = None,
+    distance_threshold: float = None,
+    use_cache: bool = True,
+    profile: bool = False
+):
+    """Versión asíncrona de rag_query() (usada por la API)."""
+    if not profile:
+        return await _arag_query(query, mode, n_results, distance_threshold, use_cache)
+
+    extra = {}
+    with _perfil(extra):
+        resultado = await _arag_query(query, mode, n_results, distance_threshold, use_cache)
+    return {**resultado, **extra}
+
+
+async def _arag_query(query, mode, n_results, distance_threshold, use_cache):
+    query, mode, n_results, distance_threshold = _resolver_parametros(
+        query, mode, n_results, distance_threshold
+    )
+
+    if mode == "raw":
+        return {"query": query, "chunks": await aretrieve(query, n_results, distance_threshold)}
+
+    cached, key, generation = await _abuscar_en_cache(query, n_results, distance_threshold, use_cache)
+    if cached is not None:
+        return {**cached, "query": query}
+
+    query_emb, chunks = await aretrieve_with_embedding(query, n_results, distance_threshold)
+
+    respuesta = _buscar_semantica(query_emb, chunks, generation, use_cache)
+    semantic_hit = respuesta is not None
+    if semantic_hit and semantic_cache.should_audit():
+        # La auditoría corre en segundo plano: no agrega latencia al hit
+        task = asyncio.create_task(_auditar_hit_semantico(query, chunks, respuesta))
+        _audit_tasks.add(task)
+        task.add_done_callback(_audit_tasks.discard)
+
+    if not semantic_hit:
+        respuesta = await agenerar_respuesta(query, chunks)
+
+    resultado = {"query": query, "chunks": chunks, "respuesta": respuesta}
+    await _aguardar_en_caches(key, generation, query_emb, resultado, semantic_hit)
+    return resultado
+
+
+async def arag_query_stream(
+    query: str = None,
+    n_results: int = None,
+    distance_threshold: float = None,
+    use_cache: bool = True
+):
+    """
+    Versión en streaming de arag_query() (modo "full").
+    Produce eventos (tipo, payload):
+    - ("chunks", [...])  → chunks recuperados, antes de generar
+    - ("token", "...")   → fragmentos de la respuesta
+    - ("done", {...})    → resultado completo {"query", "chunks", "respuesta"}
+    Un hit de caché se emite como un único token.
+    """
+
+    query, _, n_results, distance_threshold = _resolver_parametros(
+        query, "full", n_results, distance_threshold
+    )
+
+    cached, key, generation = await _abuscar_en_cache(query, n_results, distance_threshold, use_cache)
+    if cached is not None:
+        yield "chunks", cached["chunks"]
+        yield "token", cached["respuesta"]
+        yield "done", {**cached, "query": query}
+        return
+
+    query_emb, chunks = await aretrieve_with_embedding(query, n_results, distance_threshold)
+    yield "chunks", chunks
+
+    respuesta = _buscar_semantica(query_emb, chunks, generation, use_cache)
+    semantic_hit = respuesta is not None
+    if semantic_hit:
+        if semantic_cache.should_audit():
+            task = asyncio.create_task(_auditar_hit_semantico(query, chunks, respuesta))
+            _audit_tasks.add(task)
+            task.add_done_callback(_audit_tasks.discard)
+        yield "token", respuesta
+    else:
+        partes = []
+        async for token in agenerar_respuesta_stream(query, chunks):
+            partes.append(token)
+            yield "token", token
+        respuesta = "".join(partes)
 
-    return {"query": query, "chunks": chunks, "respuesta": respuesta}
+    resultado = {"query": query, "chunks": chunks, "respuesta": respuesta}
+    await _aguardar_en_caches(key, generation, query_emb, resultado, semantic_hit)
+    yield "done", resultado
 
 
 # =============================
@@ -144,5 +483,14 @@ def imprimir_resultado(resultado: dict):
 
 # Si ejecutas el archivo → correr automático
 if __name__ == "__main__":
-    resultado = rag_query()
+    resultado = rag_query(profile="--profile" in sys.argv)
     imprimir_resultado(resultado)
+    if "profile" in resultado:
+        perfil = resultado["profile"]
+        print("=== PROFILE ===")
+        for nombre, etapa in perfil["stages"].items():
+            print(f"  {nombre:<10} {etapa['ms']:>9.1f} ms  ({etapa['calls']} llamadas)")
+        print(f"  {'total':<10} {perfil['total_ms']:>9.1f} ms")
+        print(f"  tokens: {perfil['tokens']}  origen: {perfil.get('source', 'N/A')}")
+        if "cprofile" in perfil:
+            print(perfil["cprofile"])
@@ -0,0 +1,178 @@
+"""
+Colecciones versionadas (blue/green) + alias
+
+Cada reconstrucción completa crea una colección nueva
+`fundamentos_ia__v{n}`; el alias (un archivo puntero por alias,
+`data/04_store_chroma_alias_<alias>.json`) indica cuál está activa.
+El cambio de versión es un os.replace() atómico del puntero:
+- 04_store_chroma.py construye la versión nueva y luego mueve el alias
+- 05_query_core.py detecta el cambio y pasa a la nueva versión sin reinicio
+
+El puntero lleva además una `revision` (hash del contenido indexado): las
+escrituras incrementales sobre la colección activa (04 sin --rebuild,
+ingest_corpus.py) la actualizan, y con ella cambia la versión del índice
+que usan las cachés de respuestas.
+
+Y `retired`: cuándo dejó de estar activa cada versión anterior, para que
+04 no borre una versión que la API todavía puede estar consultando.
+"""
+
+import hashlib
+import json
+import os
+import re
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Tuple
+
+from config import COLLECTION_ALIAS
+
+BASE_DIR = Path(__file__).resolve().parents[2]
+DATA_DIR = BASE_DIR / "data"
+# Puntero único de versiones anteriores (solo lectura, para migrar)
+LEGACY_ALIAS_FILE = DATA_DIR / "04_store_chroma_alias.json"
+
+_VERSION_RE = re.compile(r"^(?P<alias>.+)__v(?P<version>\d+)$")
+# Versiones retiradas que se recuerdan en el puntero
+MAX_RETIRED = 16
+
+
+def alias_file(alias: str = COLLECTION_ALIAS) -> Path:
+    """Archivo puntero del alias (cada alias tiene el suyo)."""
+    return DATA_DIR / f"04_store_chroma_alias_{alias}.json"
+
+
+def versioned_name(version: int, alias: str = COLLECTION_ALIAS) -> str:
+    return f"{alias}__v{version}"
+
+
+def parse_version(name: str, alias: str = COLLECTION_ALIAS) -> Optional[int]:
+    """Número de versión de una colección `alias__v{n}` (None si no aplica)."""
+    match = _VERSION_RE.match(name)
+    if not match or match.group("alias") != alias:
+        return None
+    return int(match.group("version"))
+
+
+def list_versions(client, alias: str = COLLECTION_ALIAS) -> List[int]:
+    """Versiones existentes en Chroma para el alias, ordenadas ascendentemente."""
+    versions = []
+    for collection in client.list_collections():
+        name = collection if isinstance(collection, str) else collection.name
+        version = parse_version(name, alias)
+        if version is not None:
+            versions.append(version)
+    return sorted(versions)
+
+
+def content_revision(entries: Dict[str, Any]) -> str:
+    """Hash del contenido indexado ({id: huella}) que identifica la revisión."""
+    raw = json.dumps(entries, sort_keys=True, ensure_ascii=False)
+    return hashlib.sha256(raw.encode("utf-8")).hexdigest()[:16]
+
+
+def _load(path: Path) -> Optional[Dict]:
+    try:
+        with open(path, "r", encoding="utf-8") as f:
+            return json.load(f)
+    except FileNotFoundError:
+        return None
+
+
+def read_alias(alias: str = COLLECTION_ALIAS, path: Optional[Path] = None) -> Optional[Dict]:
+    """
+    Lee el puntero {"alias", "collection", "version", "revision", "updated_at", "retired"} del alias.
+    Un puntero que pertenece a otro alias es un error (no se sirve su colección).
+    """
+    if path is None:
+        path = alias_file(alias)
+        if not path.exists():
+            # El puntero antiguo era compartido: solo vale si es de este alias
+            pointer = _load(LEGACY_ALIAS_FILE)
+            return pointer if pointer and pointer.get("alias") == alias else None
+
+    pointer = _load(path)
+    if pointer is not None and pointer.get("alias") != alias:
+        raise ValueError(f"❗ El puntero '{path}' es del alias '{pointer.get('alias')}', no de '{alias}'")
+    return pointer
+
+
+def write_alias(
+    collection_name: str,
+    version: Optional[int],
+    alias: str = COLLECTION_ALIAS,
+    path: Optional[Path] = None,
+    revision: Optional[str] = None
+) -> None:
+    """
+    Apunta el alias a `collection_name` de forma atómica. Si la colección
+    cambia, la anterior queda en `retired` con la hora del cambio.
+    """
+    path = path or alias_file(alias)
+    updated_at = datetime.now(timezone.utc).isoformat()
+    if path.exists():
+        previous = read_alias(alias, path)
+    else:
+        # Primer puntero propio: la colección del puntero antiguo queda retirada
+        previous = read_alias(alias) if path == alias_file(alias) else None
+    previous = previous or {}
+
+    retired = dict(previous.get("retired") or {})
+    if previous.get("collection") and previous["collection"] != collection_name:
+        retired[previous["collection"]] = updated_at
+    retired.pop(collection_name, None)
+    retired = dict(sorted(retired.items(), key=lambda item: item[1])[-MAX_RETIRED:])
+
+    tmp = path.with_suffix(path.suffix + ".tmp")
+    with open(tmp, "w", encoding="utf-8") as f:
+        json.dump({
+            "alias": alias,
+            "collection": collection_name,
+            "version": version,
+            "revision": revision,
+            "updated_at": updated_at,
+            "retired": retired,
+        }, f, ensure_ascii=False)
+    os.replace(tmp, path)
+
+
+def retired_seconds(alias: str = COLLECTION_ALIAS) -> Dict[str, float]:
+    """Segundos desde que cada versión retirada dejó de estar activa."""
+    pointer = read_alias(alias) or {}
+    now = datetime.now(timezone.utc)
+    return {
+        name: (now - datetime.fromisoformat(retired_at)).total_seconds()
+        for name, retired_at in (pointer.get("retired") or {}).items()
+    }
+
+
+def mark_updated(collection_name: str, revision: str, alias: str = COLLECTION_ALIAS) -> bool:
+    """
+    Registra en el puntero la nueva revisión de `collection_name` si es la
+    colección que sirve el alias. Devuelve True si el puntero cambió.
+    """
+    pointer = read_alias(alias)
+    if pointer:
+        if pointer["collection"] != collection_name or pointer.get("revision") == revision:
+            return False
+        version = pointer.get("version")
+    elif collection_name == alias:
+        # Colección sin versionar servida directamente por el alias
+        version = None
+    else:
+        return False
+    write_alias(collection_name, version, alias, revision=revision)
+    return True
+
+
+def resolve_pointer(alias: str = COLLECTION_ALIAS, path: Optional[Path] = None) -> Tuple[str, Optional[str]]:
+    """(colección activa, revisión); sin puntero se usa la colección sin versionar."""
+    pointer = read_alias(alias, path)
+    if pointer:
+        return pointer["collection"], pointer.get("revision")
+    return alias, None
+
+
+def resolve_collection_name(alias: str = COLLECTION_ALIAS, path: Optional[Path] = None) -> str:
+    """Nombre de la colección activa; sin puntero se usa la colección sin versionar."""
+    return resolve_pointer(alias, path)[0]
@@ -2,6 +2,8 @@
 # PANEL DE CONTROL DEL SISTEMA
 # ============================
 
+import os
+
 # ------- Query principal -------
 QUERY = "Fecha completa de la primera edicion del libro"
 # ------- Modo de operación -------
@@ -9,18 +11,108 @@ QUERY = "Fecha completa de la primera edicion del libro"
 # "raw"  → solo recuperación
 DEFAULT_MODE = "full"
 
+# ------- Extracción (Step 1) -------
+# Procesos para extraer páginas del PDF en paralelo (None → os.cpu_count())
+EXTRACTION_WORKERS = None
+# Rango de páginas a procesar (índices base 0, fin excluido)
+EXTRACTION_START_PAGE = 0
+EXTRACTION_END_PAGE = 212
+
+# ------- Chunking (Step 2) -------
+# "words": ventana móvil de palabras | "tokens": ventana de tokens (token_chunking.py)
+CHUNK_STRATEGY = "words"
+
+# Ventana móvil de palabras sobre el texto limpio (continúa entre páginas)
+CHUNK_SIZE_WORDS = 180
+CHUNK_OVERLAP_WORDS = 60
+
+# Ventana de tokens: tokenizer del Hugging Face Hub (mismo vocabulario que
+# los modelos de embeddings de OpenAI, cl100k_base) o ruta a un tokenizer.json
+CHUNK_TOKENIZER = "Xenova/text-embedding-ada-002"
+CHUNK_TARGET_TOKENS = 256
+CHUNK_MAX_TOKENS = 320
+CHUNK_OVERLAP_TOKENS = 64
+CHUNK_SNAP_SENTENCES = True          # cortar en finales de oración
+
 # ------- Embeddings -------
 EMBEDDING_MODEL = "text-embedding-3-large"
 
+# Caché persistente de embeddings (data/embedding_cache.sqlite3),
+# compartida por 03_embedding.py y 05_query_core.py
+EMBEDDING_CACHE_ENABLED = True
+EMBEDDING_CACHE_MAX_MB = 512
+
+# Caché de embeddings de queries (05_query_core.embed_query)
+QUERY_EMBEDDING_CACHE_SIZE = 2048           # entradas LRU en memoria
+QUERY_EMBEDDING_CACHE_TTL_SECONDS = 3600
+QUERY_EMBEDDING_CACHE_DISK_TIER = True      # respaldo en la caché persistente
+
+# Formato binario de salida de 03_embedding.py (.npy + sidecar .meta.jsonl)
+# "float32" (exacto) o "float16" (mitad de tamaño)
+EMBEDDING_STORAGE_DTYPE = "float32"
+
+# ------- Colecciones Chroma (Step 4) -------
+# Alias lógico; las versiones reales son "<alias>__v{n}" (blue/green).
+# Variable de entorno COLLECTION_ALIAS para servir otra colección (ej. "corpus")
+COLLECTION_ALIAS = os.getenv("COLLECTION_ALIAS", "fundamentos_ia")
+COLLECTION_KEEP_VERSIONS = 2         # activa + anterior (mínimo 2: consultas en curso)
+COLLECTION_ALIAS_POLL_SECONDS = 2.0  # cada cuánto la API revisa el alias
+COLLECTION_DRAIN_SECONDS = 30.0      # espera máxima a las consultas sobre la versión anterior
+
+# ------- Corpus multi-documento (ingest_corpus.py) -------
+# Se indexan todos los *.pdf de CORPUS_DIR (relativo a la raíz del proyecto),
+# un documento por proceso, en la colección CORPUS_COLLECTION
+CORPUS_DIR = "data"
+CORPUS_COLLECTION = "corpus"
+CORPUS_WORKERS = None                # documentos en paralelo (None → os.cpu_count())
+
 # ------- Recuperación (Step 5) -------
+# Backend de búsqueda: "chroma" (HNSW) o "numpy" (exacta, en memoria)
+RETRIEVAL_BACKEND = "chroma"
+NUMPY_BACKEND_DTYPE = "float32"  # "float16" → mitad de memoria
 DEFAULT_N_RESULTS = 8
 DISTANCE_THRESHOLD = 0.7
 
+# ------- Concurrencia (API async) -------
+# Hilos dedicados a búsquedas del backend (bloqueantes) desde el event loop
+RETRIEVAL_MAX_WORKERS = 8
+# Hilos para el nivel SQLite de las cachés (embeddings de queries y respuestas)
+CACHE_IO_MAX_WORKERS = 4
+
 # ------- LLM (Step 6) -------
 LLM_MODEL = "gpt-4o-mini"
 MAX_TOKENS = 350
 TEMPERATURE = 0.4
 
+# ------- Caché de respuestas (Step 6) -------
+# Respuestas exactas por (query normalizada, parámetros, prompts, versión del índice)
+RESPONSE_CACHE_ENABLED = True
+RESPONSE_CACHE_SIZE = 1024              # entradas en memoria
+RESPONSE_CACHE_TTL_SECONDS = 86400
+RESPONSE_CACHE_MAX_ENTRIES = 50_000     # entradas en data/response_cache.sqlite3
+
+# ------- Caché semántica (paráfrasis) -------
+# Reutiliza la respuesta si la query es casi idéntica (coseno) Y la
+# recuperación devuelve exactamente los mismos chunks
+SEMANTIC_CACHE_ENABLED = True
+SEMANTIC_CACHE_THRESHOLD = 0.92          # similitud coseno mínima
+SEMANTIC_CACHE_MAX_ENTRIES = 2000
+SEMANTIC_CACHE_AUDIT_RATE = 0.05         # fracción de hits re-generados para auditar
+SEMANTIC_CACHE_AUDIT_MIN_OVERLAP = 0.5   # Jaccard mínimo para no contar falso hit
+
+# ------- Trazas (OpenTelemetry) -------
+# "none" | "console" | "file" | "otlp"
+# - file: una línea JSON por span en TRACING_FILE (uso offline)
+# - otlp: gRPC; endpoint según OTEL_EXPORTER_OTLP_ENDPOINT (default localhost:4317)
+TRACING_EXPORTER = "none"
+TRACING_FILE = "data/traces.jsonl"       # relativo a la raíz del proyecto
+TRACING_SERVICE_NAME = "rag-chatbot"
+
+# ------- Perfil por solicitud (rag_query(profile=True) / ?profile=1) -------
+# Fracción de consultas perfiladas que además corren bajo cProfile
+PROFILE_CPROFILE_SAMPLE_RATE = 0.1
+PROFILE_CPROFILE_TOP_N = 30              # funciones en el resumen (tiempo acumulado)
+
 # ------- Prompts -------
 # SYSTEM_PROMPT = """
 # Eres un asistente experto en recuperación aumentada (RAG). Tu trabajo es responder preguntas usando principalmente la información proporcionada en los fragmentos de contexto (chunks). Sigue este flujo interno de procesamiento:
@@ -0,0 +1,237 @@
+"""
+Caché persistente de embeddings (direccionada por contenido)
+
+Compartida por el pipeline de indexación (03_embedding.py) y el motor de
+consultas (05_query_core.py):
+- Clave: sha256(modelo, dimensiones, texto normalizado)
+- Almacenamiento: SQLite en modo WAL (seguro entre procesos / workers)
+- Vectores guardados como float32 binario
+- Desalojo LRU acotado por tamaño total (contador de bytes en memoria; la
+  suma real se recalcula al superar el límite o cada SIZE_RESYNC_SECONDS,
+  porque otros procesos también escriben)
+- Contadores de hits / misses
+"""
+
+import hashlib
+import re
+import sqlite3
+import threading
+import time
+import unicodedata
+from array import array
+from pathlib import Path
+from typing import Dict, List, Optional, Sequence
+
+from config import EMBEDDING_CACHE_MAX_MB
+
+BASE_DIR = Path(__file__).resolve().parents[2]
+DATA_DIR = BASE_DIR / "data"
+DEFAULT_CACHE_PATH = DATA_DIR / "embedding_cache.sqlite3"
+
+_WHITESPACE = re.compile(r"\s+")
+
+# Cada cuánto el contador de bytes se re-sincroniza con SUM(size)
+SIZE_RESYNC_SECONDS = 60.0
+
+
+# =============================
+# NORMALIZACIÓN Y HASH
+# =============================
+
+def normalize_text(text: str) -> str:
+    """Normaliza Unicode (NFC) y compacta espacios."""
+    return _WHITESPACE.sub(" ", unicodedata.normalize("NFC", text)).strip()
+
+
+def content_hash(text: str) -> str:
+    """sha256 del texto normalizado (ID estable de un chunk)."""
+    return hashlib.sha256(normalize_text(text).encode("utf-8")).hexdigest()
+
+
+def cache_key(text: str, model: str, dimensions: Optional[int] = None) -> str:
+    """Clave de caché: (modelo, dimensiones, sha256 del texto normalizado)."""
+    raw = f"{model}\x00{dimensions or 'default'}\x00{content_hash(text)}"
+    return hashlib.sha256(raw.encode("utf-8")).hexdigest()
+
+
+# =============================
+# CACHÉ
+# =============================
+
+class EmbeddingCache:
+    """Caché de embeddings en SQLite con desalojo LRU por tamaño."""
+
+    def __init__(self, path: Path = DEFAULT_CACHE_PATH, max_bytes: int = EMBEDDING_CACHE_MAX_MB * 1024 * 1024):
+        self.path = Path(path)
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._lock = threading.Lock()
+
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self._conn = sqlite3.connect(str(self.path), check_same_thread=False, timeout=30)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.execute(
+            """
+            CREATE TABLE IF NOT EXISTS embeddings (
+                key TEXT PRIMARY KEY,
+                model TEXT NOT NULL,
+                dimensions INTEGER,
+                vector BLOB NOT NULL,
+                size INTEGER NOT NULL,
+                last_access REAL NOT NULL
+            )
+            """
+        )
+        self._conn.execute(
+            "CREATE INDEX IF NOT EXISTS idx_embeddings_last_access ON embeddings(last_access)"
+        )
+        self._conn.commit()
+        self._sync_size()
+
+    def _sync_size(self) -> None:
+        """Recalcula el total de bytes (escaneo completo de la tabla)."""
+        self._size_bytes = self._conn.execute("SELECT COALESCE(SUM(size), 0) FROM embeddings").fetchone()[0]
+        self._size_synced_at = time.monotonic()
+
+    # ---------- lectura ----------
+
+    def get_many(
+        self,
+        texts: Sequence[str],
+        model: str,
+        dimensions: Optional[int] = None
+    ) -> List[Optional[List[float]]]:
+        """Devuelve un vector por texto (None si no está en caché)."""
+        keys = [cache_key(t, model, dimensions) for t in texts]
+        found: Dict[str, bytes] = {}
+
+        with self._lock:
+            # SQLite limita la cantidad de parámetros por sentencia
+            for start in range(0, len(keys), 500):
+                part = keys[start:start + 500]
+                placeholders = ",".join("?" * len(part))
+                rows = self._conn.execute(
+                    f"SELECT key, vector FROM embeddings WHERE key IN ({placeholders})",
+                    part
+                ).fetchall()
+                found.update(rows)
+
+            if found:
+                now = time.time()
+                self._conn.executemany(
+                    "UPDATE embeddings SET last_access = ? WHERE key = ?",
+                    [(now, k) for k in found]
+                )
+                self._conn.commit()
+
+            hits = sum(1 for k in keys if k in found)
+            self.hits += hits
+            self.misses += len(keys) - hits
+
+        return [
+            array("f", found[k]).tolist() if k in found else None
+            for k in keys
+        ]
+
+    def get(self, text: str, model: str, dimensions: Optional[int] = None) -> Optional[List[float]]:
+        return self.get_many([text], model, dimensions)[0]
+
+    # ---------- escritura ----------
+
+    def put_many(
+        self,
+        texts: Sequence[str],
+        vectors: Sequence[Sequence[float]],
+        model: str,
+        dimensions: Optional[int] = None
+    ) -> None:
+        now = time.time()
+        rows = []
+        for text, vector in zip(texts, vectors):
+            blob = array("f", vector).tobytes()
+            rows.append((cache_key(text, model, dimensions), model, dimensions, blob, len(blob), now))
+
+        with self._lock:
+            # Bytes de las filas que se reemplazan (el contador no debe sumarlas dos veces)
+            replaced = 0
+            for start in range(0, len(rows), 500):
+                part = [row[0] for row in rows[start:start + 500]]
+                placeholders = ",".join("?" * len(part))
+                replaced += self._conn.execute(
+                    f"SELECT COALESCE(SUM(size), 0) FROM embeddings WHERE key IN ({placeholders})",
+                    part
+                ).fetchone()[0]
+
+            self._conn.executemany(
+                "INSERT OR REPLACE INTO embeddings (key, model, dimensions, vector, size, last_access) "
+                "VALUES (?, ?, ?, ?, ?, ?)",
+                rows
+            )
+            self._conn.commit()
+            self._size_bytes += sum(row[4] for row in rows) - replaced
+            self._evict()
+
+    def put(self, text: str, vector: Sequence[float], model: str, dimensions: Optional[int] = None) -> None:
+        self.put_many([text], [vector], model, dimensions)
+
+    def _evict(self) -> None:
+        """Desaloja las entradas menos usadas hasta quedar en el 90% del límite."""
+        if self._size_bytes <= self.max_bytes and time.monotonic() - self._size_synced_at < SIZE_RESYNC_SECONDS:
+            return
+        # Antes de desalojar se confirma con la suma real (incluye otros procesos)
+        self._sync_size()
+        total = self._size_bytes
+        if total <= self.max_bytes:
+            return
+
+        target = int(self.max_bytes * 0.9)
+        rows = self._conn.execute(
+            "SELECT key, size FROM embeddings ORDER BY last_access ASC"
+        )
+        to_delete = []
+        for key, size in rows:
+            if total <= target:
+                break
+            to_delete.append((key,))
+            total -= size
+
+        self._conn.executemany("DELETE FROM embeddings WHERE key = ?", to_delete)
+        self._conn.commit()
+        self._size_bytes = total
+        self.evictions += len(to_delete)
+
+    # ---------- métricas ----------
+
+    def stats(self) -> Dict[str, float]:
+        with self._lock:
+            entries, size = self._conn.execute(
+                "SELECT COUNT(*), COALESCE(SUM(size), 0) FROM embeddings"
+            ).fetchone()
+        lookups = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / lookups if lookups else 0.0,
+            "evictions": self.evictions,
+            "entries": entries,
+            "size_bytes": size,
+            "max_bytes": self.max_bytes,
+        }
+
+    def close(self) -> None:
+        with self._lock:
+            self._conn.close()
+
+
+_default_cache: Optional[EmbeddingCache] = None
+
+
+def get_embedding_cache() -> EmbeddingCache:
+    """Instancia compartida de la caché (singleton por proceso)."""
+    global _default_cache
+    if _default_cache is None:
+        _default_cache = EmbeddingCache()
+    return _default_cache
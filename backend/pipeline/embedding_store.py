@@ -0,0 +1,241 @@
+"""
+Formato binario de embeddings (memory-mapped)
+
+Reemplaza a 03_embedding_output.jsonl, donde cada vector de 3072
+dimensiones se escribía como texto decimal:
+- <prefijo>.npy        → matriz (N, D) float32 o float16 (formato .npy estándar)
+- <prefijo>.meta.jsonl → una línea por fila: {"id", "text", "metadata"}
+- <prefijo>.manifest.json → filas, dimensión y (tamaño, mtime) de los dos
+  archivos anteriores; se reemplaza último
+
+La fila i de la matriz corresponde a la línea i del sidecar. La matriz se
+abre con np.load(mmap_mode="r"): no se copia a RAM y se puede leer por
+porciones.
+
+Matriz y sidecar no se pueden reemplazar juntos de forma atómica: un lector
+que llega entre los dos os.replace() vería un par mezclado. check_pair()
+compara ambos con el manifiesto (os.replace conserva tamaño y mtime) y
+rechaza el par mientras la escritura no haya terminado.
+
+Uso como script (conversión desde el JSONL existente):
+    python embedding_store.py convert [--dtype float16]
+"""
+
+import argparse
+import json
+import os
+from itertools import islice
+from pathlib import Path
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+BASE_DIR = Path(__file__).resolve().parents[2]
+DATA_DIR = BASE_DIR / "data"
+DEFAULT_PREFIX = DATA_DIR / "03_embedding_output"
+LEGACY_JSONL = DATA_DIR / "03_embedding_output.jsonl"
+
+# Metadata mínima de cada chunk (la completan 04_store_chroma.py y NumpyBackend)
+DEFAULT_METADATA = {"source": "fundamentos_ia"}
+
+
+def matrix_path(prefix: Path) -> Path:
+    return Path(f"{prefix}.npy")
+
+
+def sidecar_path(prefix: Path) -> Path:
+    return Path(f"{prefix}.meta.jsonl")
+
+
+def manifest_path(prefix: Path) -> Path:
+    return Path(f"{prefix}.manifest.json")
+
+
+def _stamp(path: Path) -> List[int]:
+    stat = path.stat()
+    return [stat.st_size, stat.st_mtime_ns]
+
+
+# =============================
+# ESCRITURA
+# =============================
+
+def save_embeddings(
+    records: Sequence[Dict[str, Any]],
+    prefix: Path = DEFAULT_PREFIX,
+    dtype: str = "float32"
+) -> None:
+    """
+    Guarda registros {"id", "text", "embedding", "metadata"} en formato
+    binario (matriz .npy + sidecar .meta.jsonl).
+    """
+    if not records:
+        raise ValueError("No hay embeddings para guardar.")
+
+    dim = len(records[0]["embedding"])
+    _write(iter(records), len(records), dim, Path(prefix), dtype)
+
+
+def _write(records: Iterator[Dict[str, Any]], n: int, dim: int, prefix: Path, dtype: str) -> None:
+    """Escribe fila a fila: la memoria usada no depende del tamaño total."""
+    prefix.parent.mkdir(parents=True, exist_ok=True)
+    tmp_matrix = Path(f"{prefix}.npy.tmp")
+    tmp_sidecar = Path(f"{prefix}.meta.jsonl.tmp")
+
+    matrix = np.lib.format.open_memmap(tmp_matrix, mode="w+", dtype=np.dtype(dtype), shape=(n, dim))
+    written = 0
+    with open(tmp_sidecar, "w", encoding="utf-8") as f:
+        for i, record in enumerate(records):
+            vector = record["embedding"]
+            if len(vector) != dim:
+                raise ValueError(f"❗ Dimensión inconsistente en '{record['id']}': {len(vector)} != {dim}")
+            matrix[i] = vector
+            f.write(json.dumps({
+                "id": record["id"],
+                "text": record["text"],
+                "metadata": record.get("metadata") or {}
+            }, ensure_ascii=False) + "\n")
+            written += 1
+
+    if written != n:
+        raise ValueError(f"❗ Se esperaban {n} registros y se escribieron {written}")
+
+    matrix.flush()
+    del matrix
+
+    tmp_manifest = Path(f"{prefix}.manifest.json.tmp")
+    with open(tmp_manifest, "w", encoding="utf-8") as f:
+        json.dump({
+            "rows": n,
+            "dim": dim,
+            "dtype": dtype,
+            "matrix": _stamp(tmp_matrix),
+            "sidecar": _stamp(tmp_sidecar),
+        }, f)
+
+    # Cada archivo se reemplaza atómicamente; el manifiesto va último y
+    # check_pair() detecta un par matriz/sidecar a medias
+    tmp_matrix.replace(matrix_path(prefix))
+    tmp_sidecar.replace(sidecar_path(prefix))
+    os.replace(tmp_manifest, manifest_path(prefix))
+
+
+# =============================
+# LECTURA
+# =============================
+
+def exists(prefix: Path = DEFAULT_PREFIX) -> bool:
+    return matrix_path(prefix).exists() and sidecar_path(prefix).exists()
+
+
+def check_pair(prefix: Path = DEFAULT_PREFIX) -> Optional[int]:
+    """
+    Verifica que matriz y sidecar sean los de la misma escritura.
+    Devuelve la cantidad de filas (None si no hay manifiesto: archivos
+    anteriores a este formato, sin verificación).
+
+    Raises:
+        ValueError: Si hay una escritura en curso o los archivos no coinciden
+    """
+    try:
+        with open(manifest_path(prefix), "r", encoding="utf-8") as f:
+            manifest = json.load(f)
+    except FileNotFoundError:
+        return None
+
+    if _stamp(matrix_path(prefix)) != manifest["matrix"] or _stamp(sidecar_path(prefix)) != manifest["sidecar"]:
+        raise ValueError(f"❗ Matriz y sidecar de '{prefix}' no corresponden al manifiesto (¿escritura en curso?)")
+    return manifest["rows"]
+
+
+def load_matrix(prefix: Path = DEFAULT_PREFIX) -> np.ndarray:
+    """Abre la matriz memory-mapped (solo lectura, sin copiar a RAM)."""
+    return np.load(matrix_path(prefix), mmap_mode="r")
+
+
+def iter_sidecar(prefix: Path = DEFAULT_PREFIX) -> Iterator[Dict[str, Any]]:
+    with open(sidecar_path(prefix), "r", encoding="utf-8") as f:
+        for line in f:
+            yield json.loads(line)
+
+
+def iter_batches(
+    prefix: Path = DEFAULT_PREFIX,
+    batch_size: int = 1000
+) -> Iterator[Tuple[List[str], List[str], List[Dict[str, Any]], np.ndarray]]:
+    """
+    Recorre el archivo por porciones: (ids, textos, metadatas, vectores).
+    `vectores` es una vista de la matriz memory-mapped (zero-copy).
+    """
+    check_pair(prefix)
+    matrix = load_matrix(prefix)
+    sidecar = iter_sidecar(prefix)
+    start = 0
+
+    while True:
+        rows = list(islice(sidecar, batch_size))
+        if not rows:
+            break
+        end = start + len(rows)
+        yield (
+            [r["id"] for r in rows],
+            [r["text"] for r in rows],
+            [r["metadata"] for r in rows],
+            matrix[start:end]
+        )
+        start = end
+
+    if start != matrix.shape[0]:
+        raise ValueError(f"❗ Sidecar ({start} filas) y matriz ({matrix.shape[0]} filas) no coinciden")
+
+
+# =============================
+# CONVERSIÓN DESDE JSONL
+# =============================
+
+def _iter_jsonl(path: Path) -> Iterator[Dict[str, Any]]:
+    with open(path, "r", encoding="utf-8") as f:
+        for line in f:
+            if line.strip():
+                yield json.loads(line)
+
+
+def convert_jsonl(
+    jsonl_path: Path = LEGACY_JSONL,
+    prefix: Path = DEFAULT_PREFIX,
+    dtype: str = "float32"
+) -> int:
+    """
+    Convierte el 03_embedding_output.jsonl existente al formato binario.
+    Lee el JSONL en streaming (dos pasadas): nunca lo carga entero.
+    Devuelve la cantidad de registros convertidos.
+    """
+    n, dim = 0, None
+    for record in _iter_jsonl(jsonl_path):
+        if dim is None:
+            dim = len(record["embedding"])
+        n += 1
+
+    if n == 0:
+        raise ValueError(f"❗ '{jsonl_path}' no contiene embeddings")
+
+    _write(_iter_jsonl(jsonl_path), n, dim, Path(prefix), dtype)
+    return n
+
+
+def main(argv: Optional[Iterable[str]] = None):
+    parser = argparse.ArgumentParser(description="Formato binario de embeddings")
+    sub = parser.add_subparsers(dest="command", required=True)
+    convert = sub.add_parser("convert", help="Convierte el JSONL existente a .npy + sidecar")
+    convert.add_argument("--input", type=Path, default=LEGACY_JSONL)
+    convert.add_argument("--prefix", type=Path, default=DEFAULT_PREFIX)
+    convert.add_argument("--dtype", choices=["float32", "float16"], default="float32")
+    args = parser.parse_args(argv)
+
+    if args.command == "convert":
+        n = convert_jsonl(args.input, args.prefix, args.dtype)
+        print(f"✅ {n} embeddings convertidos → '{matrix_path(args.prefix)}' + '{sidecar_path(args.prefix)}'")
+
+
+if __name__ == "__main__":
+    main()
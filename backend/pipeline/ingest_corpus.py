@@ -0,0 +1,364 @@
+"""
+Ingesta de un corpus multi-documento (directorio de PDFs)
+
+Indexa todos los *.pdf de un directorio (CORPUS_DIR) en una colección
+Chroma (CORPUS_COLLECTION), en lugar del único PDF de 01–04:
+
+- Cada documento se extrae y se divide en chunks en su propio proceso
+  (ProcessPoolExecutor); mientras tanto el proceso principal embebe e
+  indexa los documentos que ya terminaron
+- Cada chunk lleva en metadata `source` (nombre del archivo normalizado),
+  `file`, `volume` (si el nombre indica "VOLUMEN I", "Vol. 2", ...) y su
+  procedencia (page_start/page_end, char_start/char_end)
+- Los IDs son "<source>:<hash del texto>": el mismo párrafo en dos
+  documentos no colisiona
+- La colección se actualiza por documento: un manifiesto guarda la huella
+  de cada PDF (contenido + parámetros de chunking + modelo) y sus IDs.
+  Agregar un libro solo procesa ese libro; un PDF modificado reemplaza
+  sus chunks y uno eliminado del directorio se borra del índice
+
+Para consultar el corpus desde la API: COLLECTION_ALIAS=corpus. Cada
+documento indexado actualiza la revisión del puntero de ese alias, y la
+API descarta las respuestas cacheadas con el contenido anterior.
+
+Uso:
+    python ingest_corpus.py [--dir data] [--collection corpus] [--workers N]
+    python ingest_corpus.py --force            # re-procesa todos los documentos
+    python ingest_corpus.py --keep-missing     # no borra documentos ausentes
+"""
+
+import argparse
+import hashlib
+import importlib
+import json
+import os
+import re
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import Any, Dict, List, Optional
+
+from config import (
+    CHUNK_MAX_TOKENS,
+    CHUNK_OVERLAP_TOKENS,
+    CHUNK_OVERLAP_WORDS,
+    CHUNK_SIZE_WORDS,
+    CHUNK_SNAP_SENTENCES,
+    CHUNK_STRATEGY,
+    CHUNK_TARGET_TOKENS,
+    CHUNK_TOKENIZER,
+    CORPUS_COLLECTION,
+    CORPUS_DIR,
+    CORPUS_WORKERS,
+    EMBEDDING_MODEL
+)
+import collection_alias
+from run_pipeline import FileHasher
+
+BASE_DIR = Path(__file__).resolve().parents[2]
+DATA_DIR = BASE_DIR / "data"
+CHROMA_DIR = DATA_DIR / "04_store_chroma_db_output"
+
+# "VOLUMEN_I", "Volumen 2", "vol.III", "VOL-4"
+VOLUME_PATTERN = re.compile(r"VOL(?:UMEN|UME)?[\s._-]*([IVXLC]+|\d+)(?=$|[^A-Za-z0-9])", flags=re.IGNORECASE)
+NON_ALNUM_PATTERN = re.compile(r"[^a-z0-9]+")
+
+
+def manifest_path(collection_name: str) -> Path:
+    return DATA_DIR / f"corpus_manifest_{collection_name}.json"
+
+
+def resolve_workers(workers: Optional[int] = None) -> int:
+    if workers is None:
+        workers = CORPUS_WORKERS
+    return max(1, workers or os.cpu_count() or 1)
+
+
+# =========================
+# DOCUMENTOS
+# =========================
+
+def document_metadata(pdf_path: Path) -> Dict[str, str]:
+    """Metadata de documento derivada del nombre del archivo."""
+    meta = {
+        "source": NON_ALNUM_PATTERN.sub("_", pdf_path.stem.lower()).strip("_"),
+        "file": pdf_path.name,
+    }
+    match = VOLUME_PATTERN.search(pdf_path.stem)
+    if match:
+        meta["volume"] = match.group(1).upper()
+    return meta
+
+
+def chunk_options(
+    strategy: str = CHUNK_STRATEGY,
+    chunk_size_words: int = CHUNK_SIZE_WORDS,
+    overlap: int = CHUNK_OVERLAP_WORDS
+) -> Dict[str, Any]:
+    """Argumentos de chunk_pages() (02); las opciones de tokens salen de config.py."""
+    options = {"strategy": strategy, "chunk_size_words": chunk_size_words, "overlap": overlap}
+    if strategy == "tokens":
+        options.update({
+            "tokenizer": CHUNK_TOKENIZER,
+            "target_tokens": CHUNK_TARGET_TOKENS,
+            "max_tokens": CHUNK_MAX_TOKENS,
+            "overlap_tokens": CHUNK_OVERLAP_TOKENS,
+            "snap_sentences": CHUNK_SNAP_SENTENCES,
+        })
+    return options
+
+
+def _prepare_document(pdf_path: str, doc_meta: Dict[str, str], options: Dict[str, Any]) -> Dict[str, Any]:
+    """Extracción + limpieza + chunking de un documento; corre en un proceso del pool."""
+    extraction = importlib.import_module("01_extraction")
+    chunking = importlib.import_module("02_chunking")
+
+    t0 = time.perf_counter()
+    pages = 0
+
+    def counted(items):
+        nonlocal pages
+        for item in items:
+            pages += 1
+            yield item
+
+    raw_pages = counted(extraction.iter_pages(pdf_path, start_page=0, end_page=None))
+    chunks = [
+        {"text": chunk["text"], "metadata": {**doc_meta, **chunk["metadata"]}}
+        for chunk in chunking.chunk_pages(chunking.iter_clean_pages(raw_pages), **options)
+    ]
+    return {"pages": pages, "chunks": chunks, "seconds": time.perf_counter() - t0}
+
+
+# =========================
+# MANIFIESTO
+# =========================
+
+def load_manifest(collection_name: str) -> Dict[str, Any]:
+    path = manifest_path(collection_name)
+    if not path.exists():
+        return {"collection": collection_name, "documents": {}, "files": {}}
+    with open(path, "r", encoding="utf-8") as f:
+        return json.load(f)
+
+
+def save_manifest(manifest: Dict[str, Any]) -> None:
+    """Escritura atómica tras cada documento: una ingesta interrumpida no repite lo hecho."""
+    path = manifest_path(manifest["collection"])
+    tmp = path.with_suffix(path.suffix + ".tmp")
+    with open(tmp, "w", encoding="utf-8") as f:
+        json.dump(manifest, f, ensure_ascii=False)
+    os.replace(tmp, path)
+
+
+def publish_revision(manifest: Dict[str, Any]) -> None:
+    """Revisión del contenido indexado en el puntero del alias homónimo (invalida cachés de la API)."""
+    revision = collection_alias.content_revision(
+        {source: doc["fingerprint"] for source, doc in manifest["documents"].items()}
+    )
+    collection_alias.mark_updated(manifest["collection"], revision, alias=manifest["collection"])
+
+
+def document_fingerprint(file_digest: str, params: Dict[str, Any]) -> str:
+    payload = json.dumps({"file": file_digest, **params}, sort_keys=True)
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+# =========================
+# ÍNDICE
+# =========================
+
+def _upsert(collection, records: List[Dict[str, Any]], batch_size: int) -> None:
+    for start in range(0, len(records), batch_size):
+        batch = records[start:start + batch_size]
+        collection.upsert(
+            ids=[r["id"] for r in batch],
+            embeddings=[r["embedding"] for r in batch],
+            documents=[r["text"] for r in batch],
+            metadatas=[r["metadata"] for r in batch]
+        )
+
+
+def _delete(collection, ids: List[str], batch_size: int) -> None:
+    for start in range(0, len(ids), batch_size):
+        collection.delete(ids=ids[start:start + batch_size])
+
+
+# =========================
+# INGESTA
+# =========================
+
+def ingest_corpus(
+    corpus_dir: Path,
+    collection_name: str = CORPUS_COLLECTION,
+    workers: Optional[int] = None,
+    chunk_size_words: int = CHUNK_SIZE_WORDS,
+    overlap: int = CHUNK_OVERLAP_WORDS,
+    strategy: str = CHUNK_STRATEGY,
+    force: bool = False,
+    keep_missing: bool = False
+) -> Dict[str, Any]:
+    """
+    Sincroniza la colección con los PDFs de `corpus_dir`, documento por documento.
+
+    Returns:
+        {"documents": [fila por documento procesado], "skipped": [...],
+         "removed": [...], "seconds": tiempo total}
+    """
+    t_start = time.perf_counter()
+    manifest = load_manifest(collection_name)
+    hasher = FileHasher(manifest.setdefault("files", {}))
+    options = chunk_options(strategy, chunk_size_words, overlap)
+    params = {**options, "model": EMBEDDING_MODEL}
+
+    documents: Dict[str, Dict[str, Any]] = {}
+    for pdf in sorted(corpus_dir.glob("*.pdf")):
+        meta = document_metadata(pdf)
+        if meta["source"] in documents:
+            raise ValueError(f"❗ '{pdf.name}' y '{documents[meta['source']]['path'].name}' "
+                             f"producen el mismo source '{meta['source']}'")
+        documents[meta["source"]] = {
+            "path": pdf,
+            "meta": meta,
+            "fingerprint": document_fingerprint(hasher.digest(pdf), params),
+        }
+
+    indexed = manifest["documents"]
+    pending = [
+        source for source, doc in documents.items()
+        if force or indexed.get(source, {}).get("fingerprint") != doc["fingerprint"]
+    ]
+    skipped = [source for source in documents if source not in pending]
+    missing = [] if keep_missing else [source for source in indexed if source not in documents]
+
+    report: Dict[str, Any] = {"documents": [], "skipped": skipped, "removed": missing}
+    print(f"📚 {len(documents)} PDF(s) en '{corpus_dir}': {len(pending)} por procesar, "
+          f"{len(skipped)} al día, {len(missing)} eliminados")
+
+    if pending or missing:
+        # Solo se cargan Chroma y el cliente de OpenAI si hay algo que hacer
+        from chromadb import PersistentClient
+        client = PersistentClient(path=str(CHROMA_DIR))
+        collection = client.get_or_create_collection(name=collection_name, metadata={"hnsw:space": "cosine"})
+        batch_size = client.get_max_batch_size()
+
+        for source in missing:
+            _delete(collection, indexed[source]["ids"], batch_size)
+            del indexed[source]
+            save_manifest(manifest)
+            publish_revision(manifest)
+            print(f"🗑️ '{source}' eliminado del índice")
+
+    if pending:
+        embedding = importlib.import_module("03_embedding")
+        workers = min(resolve_workers(workers), len(pending))
+        print(f"⚙️ Extracción y chunking con {workers} proceso(s)")
+
+        with ProcessPoolExecutor(max_workers=workers) as executor:
+            futures = {
+                executor.submit(
+                    _prepare_document, str(documents[source]["path"]),
+                    documents[source]["meta"], options
+                ): source
+                for source in pending
+            }
+            # Cada documento se indexa en cuanto termina su extracción,
+            # mientras los demás siguen en el pool
+            for future in as_completed(futures):
+                source = futures[future]
+                prepared = future.result()
+
+                chunks = embedding.assign_chunk_ids(prepared["chunks"])
+                for chunk in chunks:
+                    chunk["id"] = f"{source}:{chunk['id']}"
+
+                t0 = time.perf_counter()
+                records = embedding.process_chunk_list(chunks) if chunks else []
+                embed_s = time.perf_counter() - t0
+
+                t0 = time.perf_counter()
+                new_ids = [r["id"] for r in records]
+                _upsert(collection, records, batch_size)
+                stale = sorted(set(indexed.get(source, {}).get("ids", [])) - set(new_ids))
+                _delete(collection, stale, batch_size)
+                index_s = time.perf_counter() - t0
+
+                indexed[source] = {
+                    "file": documents[source]["path"].name,
+                    "fingerprint": documents[source]["fingerprint"],
+                    "pages": prepared["pages"],
+                    "ids": new_ids,
+                    "updated_at": datetime.now(timezone.utc).isoformat(),
+                }
+                save_manifest(manifest)
+                publish_revision(manifest)
+
+                row = {
+                    "source": source,
+                    "pages": prepared["pages"],
+                    "chunks": len(records),
+                    "removed": len(stale),
+                    "extract_s": prepared["seconds"],
+                    "embed_s": embed_s,
+                    "index_s": index_s,
+                }
+                report["documents"].append(row)
+                print(f"✅ '{source}': {row['pages']} páginas → {row['chunks']} chunks "
+                      f"(extracción {row['extract_s']:.2f}s, embeddings {embed_s:.2f}s, índice {index_s:.2f}s)")
+
+    save_manifest(manifest)
+    report["seconds"] = time.perf_counter() - t_start
+    return report
+
+
+def print_report(report: Dict[str, Any]) -> None:
+    rows = report["documents"]
+    if not rows:
+        print(f"\n⏭️ Sin cambios: {len(report['skipped'])} documento(s) al día ({report['seconds']:.2f}s)")
+        return
+    print(f"\n{'documento':<40}{'págs':>6}{'chunks':>8}{'segundos':>10}{'págs/s':>9}{'chunks/s':>10}")
+    for row in rows:
+        seconds = row["extract_s"] + row["embed_s"] + row["index_s"]
+        print(f"{row['source'][:39]:<40}{row['pages']:>6}{row['chunks']:>8}{seconds:>10.2f}"
+              f"{row['pages'] / max(seconds, 1e-9):>9.1f}{row['chunks'] / max(seconds, 1e-9):>10.1f}")
+
+    pages = sum(row["pages"] for row in rows)
+    chunks = sum(row["chunks"] for row in rows)
+    total = report["seconds"]
+    print(f"{'total (pared)':<40}{pages:>6}{chunks:>8}{total:>10.2f}"
+          f"{pages / max(total, 1e-9):>9.1f}{chunks / max(total, 1e-9):>10.1f}")
+    print(f"⏭️ Al día: {len(report['skipped'])} | 🗑️ Eliminados: {len(report['removed'])}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Ingesta de un directorio de PDFs (por documento, en paralelo)")
+    parser.add_argument("--dir", type=Path, default=BASE_DIR / CORPUS_DIR)
+    parser.add_argument("--collection", default=CORPUS_COLLECTION)
+    parser.add_argument("--workers", type=int, default=None, help="Procesos (default: CORPUS_WORKERS / núcleos)")
+    parser.add_argument("--chunk-size", type=int, default=CHUNK_SIZE_WORDS)
+    parser.add_argument("--overlap", type=int, default=CHUNK_OVERLAP_WORDS)
+    parser.add_argument("--strategy", choices=["words", "tokens"], default=CHUNK_STRATEGY)
+    parser.add_argument("--force", action="store_true", help="Re-procesa todos los documentos")
+    parser.add_argument("--keep-missing", action="store_true", help="No borra del índice los PDFs ausentes")
+    args = parser.parse_args()
+
+    if not args.dir.is_dir():
+        print(f"❌ No existe el directorio '{args.dir}'.")
+        return
+
+    report = ingest_corpus(
+        args.dir,
+        collection_name=args.collection,
+        workers=args.workers,
+        chunk_size_words=args.chunk_size,
+        overlap=args.overlap,
+        strategy=args.strategy,
+        force=args.force,
+        keep_missing=args.keep_missing
+    )
+    print_report(report)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,387 @@
+"""
+Métricas del pipeline y de la API (formato de texto de Prometheus)
+
+Registro mínimo en proceso, sin dependencias:
+- Counter:   contadores monotónicos (tokens, errores, ...)
+- Histogram: buckets fijos de latencia por etapa (embed, retrieve, generate, mongo)
+- Collectors: funciones que se evalúan al hacer scrape (stats de las cachés)
+
+En el camino caliente solo hay una búsqueda en un dict, un bisect y una
+suma bajo un lock; el formateo ocurre únicamente al llamar render().
+
+Además, request_profile() acumula las etapas y tokens de una sola
+solicitud (contextvar) para el header Server-Timing y el modo ?profile=1.
+
+Uso:
+    import metrics
+    with metrics.stage("retrieve"):
+        ...
+    @timed(MONGO_SECONDS, MONGO_ERRORS, op="get_user")
+    async def get_user(...): ...
+"""
+
+import bisect
+import cProfile
+import functools
+import inspect
+import io
+import pstats
+import random
+import threading
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Callable, Dict, Iterable, List, Optional, Tuple
+
+LabelKey = Tuple[Tuple[str, str], ...]
+
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+
+
+def _label_key(labels: Dict[str, object]) -> LabelKey:
+    return tuple(sorted((k, str(v)) for k, v in labels.items()))
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _format_labels(key: LabelKey, extra: Optional[Tuple[str, str]] = None) -> str:
+    pairs = list(key) + ([extra] if extra else [])
+    if not pairs:
+        return ""
+    return "{" + ",".join(f'{k}="{_escape(v)}"' for k, v in pairs) + "}"
+
+
+class Counter:
+    def __init__(self, name: str, help_text: str):
+        self.name = name
+        self.help = help_text
+        self._values: Dict[LabelKey, float] = {}
+        self._lock = threading.Lock()
+
+    def inc(self, amount: float = 1.0, **labels) -> None:
+        key = _label_key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0.0) + amount
+
+    def render(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} counter"]
+        with self._lock:
+            for key, value in sorted(self._values.items()):
+                lines.append(f"{self.name}{_format_labels(key)} {value}")
+        return lines
+
+
+class Histogram:
+    def __init__(self, name: str, help_text: str, buckets: Iterable[float] = DEFAULT_BUCKETS):
+        self.name = name
+        self.help = help_text
+        self.buckets = tuple(sorted(buckets))
+        # Por etiqueta: [conteo por bucket..., +Inf], suma, total
+        self._series: Dict[LabelKey, Tuple[List[int], List[float]]] = {}
+        self._lock = threading.Lock()
+
+    def observe(self, value: float, **labels) -> None:
+        key = _label_key(labels)
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            series = self._series.get(key)
+            if series is None:
+                series = ([0] * (len(self.buckets) + 1), [0.0])
+                self._series[key] = series
+            series[0][index] += 1
+            series[1][0] += value
+
+    @contextmanager
+    def time(self, **labels):
+        t0 = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - t0, **labels)
+
+    def render(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} histogram"]
+        with self._lock:
+            for key, (counts, total) in sorted(self._series.items()):
+                cumulative = 0
+                for bound, count in zip(self.buckets, counts):
+                    cumulative += count
+                    lines.append(f"{self.name}_bucket{_format_labels(key, ('le', repr(bound)))} {cumulative}")
+                cumulative += counts[-1]
+                lines.append(f"{self.name}_bucket{_format_labels(key, ('le', '+Inf'))} {cumulative}")
+                lines.append(f"{self.name}_sum{_format_labels(key)} {total[0]}")
+                lines.append(f"{self.name}_count{_format_labels(key)} {cumulative}")
+        return lines
+
+
+# =============================
+# REGISTRO
+# =============================
+
+_metrics: Dict[str, object] = {}
+# Collector: () -> [(nombre, tipo, ayuda, {labels}, valor)]
+_collectors: List[Callable[[], Iterable[Tuple[str, str, str, Dict[str, object], float]]]] = []
+_registry_lock = threading.Lock()
+
+
+def counter(name: str, help_text: str) -> Counter:
+    """Devuelve el contador `name`, creándolo si no existe."""
+    with _registry_lock:
+        if name not in _metrics:
+            _metrics[name] = Counter(name, help_text)
+        return _metrics[name]
+
+
+def histogram(name: str, help_text: str, buckets: Iterable[float] = DEFAULT_BUCKETS) -> Histogram:
+    """Devuelve el histograma `name`, creándolo si no existe."""
+    with _registry_lock:
+        if name not in _metrics:
+            _metrics[name] = Histogram(name, help_text, buckets)
+        return _metrics[name]
+
+
+def register_collector(collector: Callable) -> None:
+    """Registra una función que produce métricas al momento del scrape."""
+    with _registry_lock:
+        _collectors.append(collector)
+
+
+def render() -> str:
+    """Todas las métricas en formato de texto de Prometheus."""
+    with _registry_lock:
+        metrics = list(_metrics.values())
+        collectors = list(_collectors)
+
+    lines: List[str] = []
+    for metric in metrics:
+        lines.extend(metric.render())
+
+    families: Dict[str, Tuple[str, str, List[str]]] = {}
+    for collector in collectors:
+        try:
+            samples = list(collector())
+        except Exception:
+            continue
+        for name, kind, help_text, labels, value in samples:
+            family = families.setdefault(name, (kind, help_text, []))
+            family[2].append(f"{name}{_format_labels(_label_key(labels))} {float(value)}")
+    for name, (kind, help_text, samples) in families.items():
+        lines.append(f"# HELP {name} {help_text}")
+        lines.append(f"# TYPE {name} {kind}")
+        lines.extend(samples)
+
+    return "\n".join(lines) + "\n"
+
+
+def register_stats(prefix: str, stats: Callable[[], Dict[str, object]]) -> None:
+    """
+    Exporta como gauges `<prefix>_<clave>` los valores numéricos de una
+    función stats() existente (cachés, colas, ...).
+    """
+    def collector():
+        for key, value in stats().items():
+            if isinstance(value, (int, float)) and not isinstance(value, bool):
+                yield f"{prefix}_{key}", "gauge", f"{prefix}: {key}", {}, value
+    register_collector(collector)
+
+
+def timed(hist: Histogram, errors: Optional[Counter] = None, **labels):
+    """
+    Decorador: observa la duración de la función (sync o async) en `hist`
+    y cuenta sus excepciones en `errors`.
+    """
+    def decorator(func):
+        if inspect.iscoroutinefunction(func):
+            @functools.wraps(func)
+            async def async_wrapper(*args, **kwargs):
+                t0 = time.perf_counter()
+                try:
+                    return await func(*args, **kwargs)
+                except Exception:
+                    if errors is not None:
+                        errors.inc(**labels)
+                    raise
+                finally:
+                    hist.observe(time.perf_counter() - t0, **labels)
+            return async_wrapper
+
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            t0 = time.perf_counter()
+            try:
+                return func(*args, **kwargs)
+            except Exception:
+                if errors is not None:
+                    errors.inc(**labels)
+                raise
+            finally:
+                hist.observe(time.perf_counter() - t0, **labels)
+        return wrapper
+    return decorator
+
+
+# =============================
+# MÉTRICAS COMUNES
+# =============================
+
+STAGE_SECONDS = histogram("rag_stage_seconds", "Duración de cada etapa del pipeline RAG")
+STAGE_ERRORS = counter("rag_stage_errors_total", "Errores por etapa del pipeline RAG")
+LLM_TOKENS = counter("rag_llm_tokens_total", "Tokens consumidos por el LLM (kind=prompt|completion)")
+EMBEDDING_TOKENS = counter("rag_embedding_tokens_total", "Tokens enviados al modelo de embeddings")
+RAG_RESULTS = counter("rag_answers_total", "Respuestas RAG por origen (source=response_cache|semantic_cache|llm)")
+MONGO_SECONDS = histogram("mongo_operation_seconds", "Duración de las operaciones del repository MongoDB")
+MONGO_ERRORS = counter("mongo_operation_errors_total", "Errores de las operaciones del repository MongoDB")
+
+
+@contextmanager
+def stage(name: str):
+    """Mide una etapa del pipeline (rag_stage_seconds) y cuenta sus errores."""
+    t0 = time.perf_counter()
+    try:
+        yield
+    except Exception:
+        STAGE_ERRORS.inc(stage=name)
+        raise
+    finally:
+        elapsed = time.perf_counter() - t0
+        STAGE_SECONDS.observe(elapsed, stage=name)
+        profile = _current_profile.get()
+        if profile is not None:
+            profile.add_stage(name, elapsed)
+
+
+def record_usage(usage) -> None:
+    """Suma el `usage` de una completion de OpenAI a los contadores de tokens."""
+    if usage is None:
+        return
+    prompt_tokens = getattr(usage, "prompt_tokens", 0) or 0
+    completion_tokens = getattr(usage, "completion_tokens", 0) or 0
+    LLM_TOKENS.inc(prompt_tokens, kind="prompt")
+    LLM_TOKENS.inc(completion_tokens, kind="completion")
+    add_tokens(prompt=prompt_tokens, completion=completion_tokens)
+
+
+def record_embedding_tokens(tokens: int) -> None:
+    """Suma los tokens enviados al modelo de embeddings."""
+    EMBEDDING_TOKENS.inc(tokens)
+    add_tokens(embedding=tokens)
+
+
+# =============================
+# PERFIL POR SOLICITUD
+# =============================
+
+class RequestProfile:
+    """
+    Etapas y tokens de una solicitud. Se comparte por contextvar, así que
+    también lo alimentan las etapas que corren en los executors
+    (run_in_executor copia el contexto).
+    """
+
+    def __init__(self):
+        self.started = time.perf_counter()
+        self.stages: Dict[str, List[float]] = {}
+        self.tokens: Dict[str, int] = {}
+        self.info: Dict[str, object] = {}
+        self._lock = threading.Lock()
+
+    def add_stage(self, name: str, seconds: float) -> None:
+        with self._lock:
+            self.stages.setdefault(name, []).append(seconds * 1000)
+
+    def add_tokens(self, **tokens: int) -> None:
+        with self._lock:
+            for kind, amount in tokens.items():
+                self.tokens[kind] = self.tokens.get(kind, 0) + amount
+
+    def stage_ms(self) -> Dict[str, float]:
+        """Milisegundos totales por etapa (una etapa puede repetirse)."""
+        with self._lock:
+            return {name: sum(values) for name, values in self.stages.items()}
+
+    def server_timing(self) -> str:
+        """Valor del header Server-Timing: `embed;dur=12.3, retrieve;dur=4.5, ...`"""
+        entries = [f"{name};dur={ms:.1f}" for name, ms in self.stage_ms().items()]
+        entries.append(f"total;dur={(time.perf_counter() - self.started) * 1000:.1f}")
+        if "source" in self.info:
+            entries.append(f'source;desc="{self.info["source"]}"')
+        return ", ".join(entries)
+
+    def as_dict(self) -> Dict[str, object]:
+        with self._lock:
+            stages = {
+                name: {"ms": round(sum(values), 3), "calls": len(values)}
+                for name, values in self.stages.items()
+            }
+            return {
+                "total_ms": round((time.perf_counter() - self.started) * 1000, 3),
+                "stages": stages,
+                "tokens": dict(self.tokens),
+                **self.info,
+            }
+
+
+_current_profile: ContextVar[Optional[RequestProfile]] = ContextVar("rag_request_profile", default=None)
+
+
+@contextmanager
+def request_profile():
+    """
+    Activa un RequestProfile para el contexto actual. Si ya hay uno activo
+    (p. ej. abierto por el endpoint) se reutiliza.
+    """
+    profile = _current_profile.get()
+    if profile is not None:
+        yield profile
+        return
+    profile = RequestProfile()
+    token = _current_profile.set(profile)
+    try:
+        yield profile
+    finally:
+        _current_profile.reset(token)
+
+
+def add_tokens(**tokens: int) -> None:
+    profile = _current_profile.get()
+    if profile is not None:
+        profile.add_tokens(**tokens)
+
+
+def annotate(**info) -> None:
+    """Agrega datos al perfil activo (p. ej. source="response_cache")."""
+    profile = _current_profile.get()
+    if profile is not None:
+        profile.info.update(info)
+
+
+_cprofile_lock = threading.Lock()
+
+
+@contextmanager
+def sampled_cprofile(sample_rate: float, top_n: int = 30):
+    """
+    Con probabilidad `sample_rate` ejecuta el bloque bajo cProfile y deja
+    en el dict producido el resumen (funciones por tiempo acumulado).
+    Un solo perfil a la vez: cProfile no admite perfiles concurrentes, y
+    con asyncio también mide las corrutinas de otras solicitudes del loop.
+    """
+    result: Dict[str, object] = {}
+    if random.random() >= sample_rate or not _cprofile_lock.acquire(blocking=False):
+        yield result
+        return
+
+    profiler = cProfile.Profile()
+    try:
+        profiler.enable()
+        try:
+            yield result
+        finally:
+            profiler.disable()
+        out = io.StringIO()
+        pstats.Stats(profiler, stream=out).sort_stats("cumulative").print_stats(top_n)
+        result["cprofile"] = out.getvalue()
+    finally:
+        _cprofile_lock.release()
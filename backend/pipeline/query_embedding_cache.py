@@ -0,0 +1,157 @@
+"""
+Caché de embeddings de queries (usada por 05_query_core.embed_query)
+
+Dos niveles:
+- Memoria: LRU con TTL (cachetools.TTLCache), por proceso
+- Disco (opcional): EmbeddingCache compartida (SQLite), la ven todos los
+  workers de la API y también 03_embedding.py
+
+Clave: (EMBEDDING_MODEL, query normalizada). La normalización ignora
+mayúsculas y espacios, así "¿Qué es IA?" y "¿qué es  ia?" comparten entrada.
+
+En la API (aget_or_compute) el nivel de disco corre en un executor acotado:
+el event loop solo toca la memoria.
+
+Métricas: hits por nivel, misses, hit rate y latencia ahorrada (hits por
+la latencia media observada de la API de embeddings).
+"""
+
+import threading
+import time
+from concurrent.futures import Executor
+from typing import Awaitable, Callable, Dict, List, Optional
+
+from cachetools import TTLCache
+
+from config import (
+    EMBEDDING_CACHE_ENABLED,
+    QUERY_EMBEDDING_CACHE_SIZE,
+    QUERY_EMBEDDING_CACHE_TTL_SECONDS,
+    QUERY_EMBEDDING_CACHE_DISK_TIER
+)
+from embedding_cache import EmbeddingCache, get_embedding_cache, normalize_text
+from utils import run_in_executor
+
+
+def normalize_query(query: str) -> str:
+    """Normalización de queries: Unicode NFC, espacios compactados, sin mayúsculas."""
+    return normalize_text(query).casefold()
+
+
+class QueryEmbeddingCache:
+    """Caché en memoria (LRU + TTL) con nivel opcional en disco."""
+
+    def __init__(
+        self,
+        model: str,
+        maxsize: int = QUERY_EMBEDDING_CACHE_SIZE,
+        ttl: float = QUERY_EMBEDDING_CACHE_TTL_SECONDS,
+        disk: Optional[EmbeddingCache] = None,
+        executor: Optional[Executor] = None
+    ):
+        self.model = model
+        self.disk = disk
+        self.executor = executor
+        self._memory = TTLCache(maxsize=maxsize, ttl=ttl)
+        self._lock = threading.Lock()
+
+        self.memory_hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+        self._api_seconds_total = 0.0
+
+    # ---------- lectura / escritura ----------
+
+    def _get_memory(self, key: str) -> Optional[List[float]]:
+        with self._lock:
+            vector = self._memory.get(key)
+            if vector is not None:
+                self.memory_hits += 1
+            return vector
+
+    def _get_disk(self, key: str) -> Optional[List[float]]:
+        """Nivel de disco (bloqueante); cuenta el hit o el miss."""
+        vector = self.disk.get(key, self.model) if self.disk is not None else None
+        with self._lock:
+            if vector is not None:
+                self._memory[key] = vector
+                self.disk_hits += 1
+            else:
+                self.misses += 1
+        return vector
+
+    def _put_memory(self, key: str, vector: List[float], api_seconds: float) -> None:
+        with self._lock:
+            self._memory[key] = vector
+            self._api_seconds_total += api_seconds
+
+    def get(self, query: str) -> Optional[List[float]]:
+        key = normalize_query(query)
+        vector = self._get_memory(key)
+        return vector if vector is not None else self._get_disk(key)
+
+    def put(self, query: str, vector: List[float], api_seconds: float = 0.0) -> None:
+        key = normalize_query(query)
+        self._put_memory(key, vector, api_seconds)
+        if self.disk is not None:
+            self.disk.put(key, vector, self.model)
+
+    async def aget(self, query: str) -> Optional[List[float]]:
+        """Como get(), con el nivel de disco en el executor."""
+        key = normalize_query(query)
+        vector = self._get_memory(key)
+        if vector is not None:
+            return vector
+        if self.disk is None:
+            return self._get_disk(key)  # solo cuenta el miss
+        return await run_in_executor(self.executor, self._get_disk, key)
+
+    async def aput(self, query: str, vector: List[float], api_seconds: float = 0.0) -> None:
+        """Como put(), con el nivel de disco en el executor."""
+        key = normalize_query(query)
+        self._put_memory(key, vector, api_seconds)
+        if self.disk is not None:
+            await run_in_executor(self.executor, self.disk.put, key, vector, self.model)
+
+    # ---------- lookup completo ----------
+
+    def get_or_compute(self, query: str, compute: Callable[[str], List[float]]) -> List[float]:
+        vector = self.get(query)
+        if vector is not None:
+            return vector
+        t0 = time.perf_counter()
+        vector = compute(query)
+        self.put(query, vector, time.perf_counter() - t0)
+        return vector
+
+    async def aget_or_compute(self, query: str, compute: Callable[[str], Awaitable[List[float]]]) -> List[float]:
+        vector = await self.aget(query)
+        if vector is not None:
+            return vector
+        t0 = time.perf_counter()
+        vector = await compute(query)
+        await self.aput(query, vector, time.perf_counter() - t0)
+        return vector
+
+    # ---------- métricas ----------
+
+    def stats(self) -> Dict[str, float]:
+        with self._lock:
+            hits = self.memory_hits + self.disk_hits
+            lookups = hits + self.misses
+            avg_api = self._api_seconds_total / self.misses if self.misses else 0.0
+            return {
+                "memory_hits": self.memory_hits,
+                "disk_hits": self.disk_hits,
+                "misses": self.misses,
+                "hit_rate": hits / lookups if lookups else 0.0,
+                "avg_api_latency_ms": avg_api * 1000,
+                "saved_latency_ms": hits * avg_api * 1000,
+                "memory_entries": len(self._memory),
+            }
+
+
+def create_query_embedding_cache(model: str, executor: Optional[Executor] = None) -> QueryEmbeddingCache:
+    """Caché de queries según config.py (nivel de disco opcional, en `executor` desde async)."""
+    disk = get_embedding_cache() if (EMBEDDING_CACHE_ENABLED and QUERY_EMBEDDING_CACHE_DISK_TIER) else None
+    return QueryEmbeddingCache(model, disk=disk, executor=executor)
@@ -0,0 +1,177 @@
+"""
+Caché exacta de respuestas RAG (usada por 06_rag_response.rag_query)
+
+Con la misma versión del índice, la misma query normalizada, los mismos
+parámetros de recuperación, el mismo modelo/temperatura y los mismos
+prompts, la respuesta es equivalente: se reutiliza sin llamar a OpenAI.
+
+- Clave: sha256 de todos esos parámetros
+- Generación: hash de (versión del índice, prompts, modelos). Si cambia,
+  se descarta todo lo cacheado de generaciones anteriores (invalidación
+  automática al publicar una colección nueva, al sincronizar la activa
+  —cambia la revisión del puntero— o al editar config.py)
+- Niveles: memoria (LRU + TTL) y SQLite persistente (compartido entre workers)
+"""
+
+import functools
+import hashlib
+import json
+import sqlite3
+import threading
+import time
+from pathlib import Path
+from typing import Any, Dict, Optional
+
+from cachetools import TTLCache
+
+from config import (
+    EMBEDDING_MODEL,
+    LLM_MODEL,
+    MAX_TOKENS,
+    TEMPERATURE,
+    SYSTEM_PROMPT,
+    USER_PROMPT_TEMPLATE,
+    RESPONSE_CACHE_SIZE,
+    RESPONSE_CACHE_TTL_SECONDS,
+    RESPONSE_CACHE_MAX_ENTRIES
+)
+from query_embedding_cache import normalize_query
+
+BASE_DIR = Path(__file__).resolve().parents[2]
+DATA_DIR = BASE_DIR / "data"
+DEFAULT_CACHE_PATH = DATA_DIR / "response_cache.sqlite3"
+
+
+def _sha256(value: Any) -> str:
+    raw = json.dumps(value, sort_keys=True, ensure_ascii=False)
+    return hashlib.sha256(raw.encode("utf-8")).hexdigest()
+
+
+@functools.lru_cache(maxsize=16)
+def cache_generation(index_version: str) -> str:
+    """Todo lo que, al cambiar, invalida la caché completa."""
+    return _sha256({
+        "index_version": index_version,
+        "embedding_model": EMBEDDING_MODEL,
+        "llm_model": LLM_MODEL,
+        "temperature": TEMPERATURE,
+        "max_tokens": MAX_TOKENS,
+        "system_prompt": SYSTEM_PROMPT,
+        "user_prompt_template": USER_PROMPT_TEMPLATE,
+    })
+
+
+def response_cache_key(query: str, n_results: int, distance_threshold: float, generation: str) -> str:
+    return _sha256({
+        "query": normalize_query(query),
+        "n_results": n_results,
+        "distance_threshold": distance_threshold,
+        "generation": generation,
+    })
+
+
+class ResponseCache:
+    """Caché de respuestas en dos niveles (memoria + SQLite)."""
+
+    def __init__(
+        self,
+        path: Path = DEFAULT_CACHE_PATH,
+        maxsize: int = RESPONSE_CACHE_SIZE,
+        ttl: float = RESPONSE_CACHE_TTL_SECONDS,
+        max_entries: int = RESPONSE_CACHE_MAX_ENTRIES
+    ):
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self._memory = TTLCache(maxsize=maxsize, ttl=ttl)
+        self._lock = threading.Lock()
+        self._generation: Optional[str] = None
+
+        self.memory_hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+        self.bypassed = 0
+        self.invalidations = 0
+
+        path.parent.mkdir(parents=True, exist_ok=True)
+        self._conn = sqlite3.connect(str(path), check_same_thread=False, timeout=30)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.execute(
+            """
+            CREATE TABLE IF NOT EXISTS responses (
+                key TEXT PRIMARY KEY,
+                generation TEXT NOT NULL,
+                value TEXT NOT NULL,
+                created_at REAL NOT NULL
+            )
+            """
+        )
+        self._conn.execute("CREATE INDEX IF NOT EXISTS idx_responses_created ON responses(created_at)")
+        self._conn.commit()
+
+    def _check_generation(self, generation: str) -> None:
+        """Al detectar una generación nueva descarta las entradas anteriores."""
+        if generation == self._generation:
+            return
+        self._memory.clear()
+        self._conn.execute("DELETE FROM responses WHERE generation != ?", (generation,))
+        self._conn.commit()
+        if self._generation is not None:
+            self.invalidations += 1
+        self._generation = generation
+
+    def get(self, key: str, generation: str) -> Optional[Dict[str, Any]]:
+        with self._lock:
+            self._check_generation(generation)
+
+            value = self._memory.get(key)
+            if value is not None:
+                self.memory_hits += 1
+                return value
+
+            row = self._conn.execute(
+                "SELECT value FROM responses WHERE key = ? AND created_at >= ?",
+                (key, time.time() - self.ttl)
+            ).fetchone()
+            if row is not None:
+                value = json.loads(row[0])
+                self._memory[key] = value
+                self.disk_hits += 1
+                return value
+
+            self.misses += 1
+            return None
+
+    def put(self, key: str, generation: str, value: Dict[str, Any]) -> None:
+        with self._lock:
+            self._check_generation(generation)
+            self._memory[key] = value
+            self._conn.execute(
+                "INSERT OR REPLACE INTO responses (key, generation, value, created_at) VALUES (?, ?, ?, ?)",
+                (key, generation, json.dumps(value, ensure_ascii=False), time.time())
+            )
+            # Acota el nivel persistente: se descartan las entradas más antiguas
+            self._conn.execute(
+                "DELETE FROM responses WHERE key IN ("
+                "SELECT key FROM responses ORDER BY created_at DESC LIMIT -1 OFFSET ?)",
+                (self.max_entries,)
+            )
+            self._conn.commit()
+
+    def record_bypass(self) -> None:
+        with self._lock:
+            self.bypassed += 1
+
+    def stats(self) -> Dict[str, float]:
+        with self._lock:
+            hits = self.memory_hits + self.disk_hits
+            lookups = hits + self.misses
+            return {
+                "memory_hits": self.memory_hits,
+                "disk_hits": self.disk_hits,
+                "misses": self.misses,
+                "bypassed": self.bypassed,
+                "hit_rate": hits / lookups if lookups else 0.0,
+                "invalidations": self.invalidations,
+                "memory_entries": len(self._memory),
+            }
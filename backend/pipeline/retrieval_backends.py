@@ -0,0 +1,374 @@
+"""
+Backends de recuperación (usados por 05_query_core.retrieve)
+
+Interfaz común: search(query_emb, n_results) → lista de dicts
+{"id", "document", "distance", "metadata"} ordenada por distancia (coseno),
+sin filtrar por umbral. `version` identifica el índice servido.
+
+- ChromaBackend: colección Chroma (HNSW) resuelta por alias, con cambio
+  de versión en caliente (blue/green)
+- NumpyBackend: búsqueda exacta en memoria sobre una matriz
+  pre-normalizada y memory-mapped (un matmul + argpartition)
+
+El backend se elige con RETRIEVAL_BACKEND en config.py.
+"""
+
+import os
+import threading
+import time
+import uuid
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Tuple
+
+import numpy as np
+
+import collection_alias
+import embedding_store
+from config import (
+    COLLECTION_ALIAS,
+    RETRIEVAL_BACKEND,
+    NUMPY_BACKEND_DTYPE,
+    COLLECTION_ALIAS_POLL_SECONDS,
+    COLLECTION_DRAIN_SECONDS
+)
+
+BASE_DIR = Path(__file__).resolve().parents[2]
+DATA_DIR = BASE_DIR / "data"
+CHROMA_DIR = DATA_DIR / "04_store_chroma_db_output"
+EMBED_PREFIX = DATA_DIR / "03_embedding_output"
+
+
+class RetrievalBackend:
+    """Interfaz de los backends de recuperación."""
+
+    name = "base"
+
+    def search(self, query_emb, n_results: int) -> List[Dict[str, Any]]:
+        raise NotImplementedError
+
+    @property
+    def version(self) -> str:
+        raise NotImplementedError
+
+
+# =============================
+# CHROMA
+# =============================
+
+class CollectionRouter:
+    """
+    Mantiene la colección activa según el alias y la cambia de forma
+    atómica cuando el puntero se mueve.
+
+    - El puntero se revisa (un stat) como máximo cada `poll_seconds`
+    - La versión nueva se abre y precalienta en segundo plano; mientras
+      tanto se sigue sirviendo la actual (sin cold start). Si falla, se
+      reintenta en la siguiente revisión
+    - Drenado: cada consulta (use()) cuenta como en curso sobre su versión;
+      el cambio termina cuando las consultas de la versión anterior
+      acabaron (o pasaron `drain_seconds`) y recién entonces se atiende
+      otro movimiento del alias
+    - Entre procesos, 04_store_chroma.py no borra una versión retirada
+      hasta pasados COLLECTION_ALIAS_POLL_SECONDS + COLLECTION_DRAIN_SECONDS
+    - Una escritura incremental sobre la colección activa solo cambia la
+      revisión del puntero: `version` cambia y las cachés de respuestas
+      (y la coalescencia de la API) dejan de reutilizar lo anterior
+    """
+
+    def __init__(
+        self,
+        client,
+        alias: str = COLLECTION_ALIAS,
+        poll_seconds: float = COLLECTION_ALIAS_POLL_SECONDS,
+        drain_seconds: float = COLLECTION_DRAIN_SECONDS
+    ):
+        self.client = client
+        self.alias = alias
+        self.poll_seconds = poll_seconds
+        self.drain_seconds = drain_seconds
+        self._lock = threading.Lock()
+        self._drained = threading.Condition(self._lock)
+        self._in_flight: Dict[str, int] = {}
+        self._switching = False
+        self._checked_at = 0.0
+        self._alias_mtime = self._read_mtime()
+        self.name, self.revision = collection_alias.resolve_pointer(alias)
+        self.collection = self.client.get_collection(self.name)
+
+    def _read_mtime(self):
+        try:
+            return os.stat(collection_alias.alias_file(self.alias)).st_mtime_ns
+        except FileNotFoundError:
+            return None
+
+    def _maybe_refresh(self):
+        with self._lock:
+            now = time.monotonic()
+            if now - self._checked_at < self.poll_seconds or self._switching:
+                return
+            self._checked_at = now
+
+        mtime = self._read_mtime()
+        with self._lock:
+            if mtime == self._alias_mtime:
+                return
+
+        name, revision = collection_alias.resolve_pointer(self.alias)
+        with self._lock:
+            if self._switching or mtime == self._alias_mtime:
+                return
+            if name == self.name:
+                # Misma colección actualizada en el lugar (sync incremental)
+                self.revision = revision
+                self._alias_mtime = mtime
+                return
+            self._switching = True
+        threading.Thread(target=self._switch_to, args=(name, revision, mtime), daemon=True).start()
+
+    def _switch_to(self, name: str, revision: Optional[str] = None, mtime: Optional[int] = None):
+        """Abre y precalienta la versión nueva, la publica atómicamente y drena la anterior."""
+        try:
+            new_collection = self.client.get_collection(name)
+            sample = new_collection.peek(limit=1)
+            if len(sample["ids"]) > 0:
+                # Fuerza la carga del índice HNSW antes de recibir tráfico
+                new_collection.query(query_embeddings=[sample["embeddings"][0]], n_results=1)
+        except Exception as e:
+            # Sin tocar _alias_mtime: la próxima revisión lo vuelve a intentar
+            print(f"⚠️  No se pudo cambiar a '{name}': {e}")
+            with self._lock:
+                self._switching = False
+            return
+
+        with self._lock:
+            old_name = self.name
+            self.name, self.revision, self.collection = name, revision, new_collection
+            self._alias_mtime = mtime
+        print(f"🔀 Colección activa: '{old_name}' → '{name}'")
+
+        with self._lock:
+            drained = self._drained.wait_for(lambda: not self._in_flight.get(old_name), self.drain_seconds)
+            self._switching = False
+        if not drained:
+            print(f"⚠️  '{old_name}' sigue con consultas en curso tras {self.drain_seconds:.0f}s")
+
+    @contextmanager
+    def use(self):
+        """
+        (nombre, colección) activos durante una consulta: la versión no se da
+        por drenada hasta salir del bloque, aunque el alias cambie.
+        """
+        self._maybe_refresh()
+        with self._lock:
+            name, collection = self.name, self.collection
+            self._in_flight[name] = self._in_flight.get(name, 0) + 1
+        try:
+            yield name, collection
+        finally:
+            with self._lock:
+                self._in_flight[name] -= 1
+                if not self._in_flight[name]:
+                    del self._in_flight[name]
+                    self._drained.notify_all()
+
+    def active(self) -> Tuple[str, Any]:
+        """(nombre, colección) activos, sin contarse como consulta en curso."""
+        self._maybe_refresh()
+        with self._lock:
+            return self.name, self.collection
+
+    @property
+    def version(self) -> str:
+        """Colección activa + revisión de su contenido (versión del índice)."""
+        with self._lock:
+            return f"{self.name}@{self.revision}" if self.revision else self.name
+
+
+class ChromaBackend(RetrievalBackend):
+    """Búsqueda aproximada (HNSW) en la colección Chroma activa."""
+
+    name = "chroma"
+
+    def __init__(self, path: Path = CHROMA_DIR):
+        from chromadb import PersistentClient
+        self.client = PersistentClient(path=str(path))
+        self.router = CollectionRouter(self.client)
+
+    def search(self, query_emb, n_results: int) -> List[Dict[str, Any]]:
+        with self.router.use() as (_, collection):
+            raw = collection.query(
+                query_embeddings=[query_emb],
+                n_results=n_results,
+                include=["documents", "distances", "metadatas"]
+            )
+
+        return [
+            {"id": doc_id, "document": doc, "distance": float(dist), "metadata": meta}
+            for doc_id, doc, dist, meta in zip(
+                raw["ids"][0], raw["documents"][0], raw["distances"][0], raw["metadatas"][0]
+            )
+        ]
+
+    @property
+    def version(self) -> str:
+        return self.router.version
+
+
+# =============================
+# NUMPY (búsqueda exacta)
+# =============================
+
+def normalized_path(prefix: Path, dtype: str) -> Path:
+    return Path(f"{prefix}.normalized.{dtype}.npy")
+
+
+def build_normalized_matrix(prefix: Path = EMBED_PREFIX, dtype: str = NUMPY_BACKEND_DTYPE) -> Path:
+    """
+    Genera (si falta o está desactualizada) la matriz con filas de norma 1
+    junto a la salida de 03_embedding.py. Se procesa por bloques.
+    Cada escritor usa su propio temporal (varios workers de la API pueden
+    regenerarla a la vez) y el reemplazo final es atómico.
+    """
+    source = embedding_store.matrix_path(prefix)
+    target = normalized_path(prefix, dtype)
+    if target.exists() and target.stat().st_mtime_ns >= source.stat().st_mtime_ns:
+        return target
+
+    matrix = embedding_store.load_matrix(prefix)
+    tmp = Path(f"{target}.{os.getpid()}.{uuid.uuid4().hex}.tmp")
+    try:
+        out = np.lib.format.open_memmap(tmp, mode="w+", dtype=np.dtype(dtype), shape=matrix.shape)
+        for start in range(0, matrix.shape[0], 4096):
+            block = np.asarray(matrix[start:start + 4096], dtype=np.float32)
+            norms = np.linalg.norm(block, axis=1, keepdims=True)
+            out[start:start + 4096] = block / np.maximum(norms, 1e-12)
+        out.flush()
+        del out
+        tmp.replace(target)
+    finally:
+        tmp.unlink(missing_ok=True)
+    return target
+
+
+class NumpyBackend(RetrievalBackend):
+    """
+    Búsqueda exacta por similitud coseno sobre una matriz pre-normalizada
+    (float32, u opcionalmente float16 para la mitad de memoria).
+    Distancia = 1 - coseno, igual que Chroma con hnsw:space=cosine.
+    La metadata se completa con DEFAULT_METADATA, igual que en Chroma.
+
+    Si 03 está reescribiendo la salida (matriz y sidecar aún no coinciden,
+    ver embedding_store.check_pair) se sigue sirviendo la versión cargada
+    y se reintenta en la siguiente revisión. Una sola búsqueda a la vez
+    revisa y recarga; las demás siguen con la versión cargada.
+    """
+
+    name = "numpy"
+
+    def __init__(
+        self,
+        prefix: Path = EMBED_PREFIX,
+        dtype: str = NUMPY_BACKEND_DTYPE,
+        poll_seconds: float = COLLECTION_ALIAS_POLL_SECONDS
+    ):
+        self.prefix = Path(prefix)
+        self.dtype = dtype
+        self.poll_seconds = poll_seconds
+        self._lock = threading.Lock()
+        self._reload_lock = threading.Lock()
+        self._checked_at = time.monotonic()
+        self._load()
+
+    def _source_mtime(self) -> int:
+        return embedding_store.matrix_path(self.prefix).stat().st_mtime_ns
+
+    def _load(self):
+        mtime = self._source_mtime()
+        expected = embedding_store.check_pair(self.prefix)
+        matrix = np.load(build_normalized_matrix(self.prefix, self.dtype), mmap_mode="r")
+        rows = list(embedding_store.iter_sidecar(self.prefix))
+
+        # Los archivos pueden haber cambiado mientras se leían
+        if self._source_mtime() != mtime or embedding_store.check_pair(self.prefix) != expected:
+            raise ValueError(f"❗ '{self.prefix}' cambió durante la carga")
+        if len(rows) != matrix.shape[0] or (expected is not None and len(rows) != expected):
+            raise ValueError(f"❗ Sidecar ({len(rows)} filas) y matriz ({matrix.shape[0]} filas) no coinciden")
+
+        with self._lock:
+            self._mtime = mtime
+            self._matrix = matrix
+            self._ids = [r["id"] for r in rows]
+            self._documents = [r["text"] for r in rows]
+            self._metadatas = [{**embedding_store.DEFAULT_METADATA, **(r.get("metadata") or {})} for r in rows]
+
+    def _maybe_reload(self):
+        if time.monotonic() - self._checked_at < self.poll_seconds:
+            return
+        # Si otro hilo ya está revisando, se sirve la versión cargada
+        if not self._reload_lock.acquire(blocking=False):
+            return
+        try:
+            now = time.monotonic()
+            if now - self._checked_at < self.poll_seconds:
+                return
+            self._checked_at = now
+            if self._source_mtime() != self._mtime:
+                try:
+                    self._load()
+                except (ValueError, OSError) as e:
+                    print(f"⚠️  Se sigue sirviendo la matriz cargada: {e}")
+        finally:
+            self._reload_lock.release()
+
+    def _similarities(self, matrix: np.ndarray, q: np.ndarray) -> np.ndarray:
+        if matrix.dtype == np.float32:
+            return matrix @ q
+        # float16: se acumula en float32 por bloques (sin copiar la matriz entera)
+        sims = np.empty(matrix.shape[0], dtype=np.float32)
+        for start in range(0, matrix.shape[0], 4096):
+            sims[start:start + 4096] = np.asarray(matrix[start:start + 4096], dtype=np.float32) @ q
+        return sims
+
+    def search(self, query_emb, n_results: int) -> List[Dict[str, Any]]:
+        self._maybe_reload()
+        with self._lock:
+            matrix, ids, documents, metadatas = self._matrix, self._ids, self._documents, self._metadatas
+
+        q = np.asarray(query_emb, dtype=np.float32)
+        q /= max(float(np.linalg.norm(q)), 1e-12)
+
+        sims = self._similarities(matrix, q)
+        k = min(n_results, sims.shape[0])
+        if k <= 0:
+            return []
+
+        top = np.argpartition(-sims, k - 1)[:k]
+        top = top[np.argsort(-sims[top])]
+
+        return [
+            {"id": ids[i], "document": documents[i], "distance": float(1.0 - sims[i]), "metadata": metadatas[i]}
+            for i in top
+        ]
+
+    @property
+    def version(self) -> str:
+        return f"numpy:{self._mtime}"
+
+
+# =============================
+# SELECTOR
+# =============================
+
+_BACKENDS = {
+    ChromaBackend.name: ChromaBackend,
+    NumpyBackend.name: NumpyBackend,
+}
+
+
+def create_backend(name: str = RETRIEVAL_BACKEND) -> RetrievalBackend:
+    """Instancia el backend configurado ("chroma" o "numpy")."""
+    try:
+        return _BACKENDS[name]()
+    except KeyError:
+        raise ValueError(f"Backend de recuperación desconocido: '{name}'. Opciones: {sorted(_BACKENDS)}")
@@ -0,0 +1,388 @@
+"""
+Orquestador incremental del pipeline de ingesta (01 → 04)
+
+Las etapas forman un DAG:
+
+    extract (01) → chunk (02) → embed (03) → store (04)
+
+Cada etapa tiene una huella (sha256) de:
+- sus parámetros (end_page, estrategia y tamaños de chunking, EMBEDDING_MODEL, ...)
+- el contenido de sus archivos de entrada (salidas de la etapa anterior)
+- el código de los módulos que la implementan
+
+Si la huella coincide con la de la última ejecución y sus salidas siguen
+intactas, la etapa se salta. Una etapa que se vuelve a ejecutar pero
+produce exactamente la misma salida no invalida a las siguientes (corte
+temprano). Ej.: cambiar solo --overlap re-ejecuta chunk → embed → store,
+pero no vuelve a extraer el PDF.
+
+El estado se guarda en data/pipeline_state.json. Los hashes de archivos se
+recuerdan por (tamaño, mtime): una ejecución sin cambios no relee el PDF
+ni los embeddings y termina en milisegundos.
+
+Uso:
+    python run_pipeline.py                      # ejecuta lo que esté desactualizado
+    python run_pipeline.py --overlap 40         # re-chunking (no re-extrae)
+    python run_pipeline.py --strategy tokens    # chunks por tokens (token_chunking.py)
+    python run_pipeline.py --until chunk        # solo extract y chunk
+    python run_pipeline.py --force embed        # fuerza una etapa
+    python run_pipeline.py --dry-run            # muestra qué se ejecutaría
+"""
+
+import argparse
+import hashlib
+import importlib
+import json
+import os
+import time
+from pathlib import Path
+from typing import Any, Callable, Dict, List, Optional, Sequence
+
+import config
+
+PIPELINE_DIR = Path(__file__).resolve().parent
+BASE_DIR = PIPELINE_DIR.parents[1]
+DATA_DIR = BASE_DIR / "data"
+STATE_FILE = DATA_DIR / "pipeline_state.json"
+
+# Rutas de cada etapa (las mismas que usan los scripts 01–04)
+PDF_FILE = DATA_DIR / "FUNDAMENTOS_DE_LA_IA_VOLUMEN_I.pdf"
+PAGES_FILE = DATA_DIR / "01_extraction_pages.jsonl"
+CHUNKS_FILE = DATA_DIR / "02_chunking_output.json"
+EMBED_MATRIX = DATA_DIR / "03_embedding_output.npy"
+EMBED_SIDECAR = DATA_DIR / "03_embedding_output.meta.jsonl"
+MANIFEST_FILE = DATA_DIR / "04_store_chroma_manifest.json"
+
+
+# =========================
+# ETAPAS
+# =========================
+
+class Stage:
+    """Nodo del DAG: entradas, salidas, parámetros y código que la definen."""
+
+    def __init__(
+        self,
+        name: str,
+        deps: Sequence[str],
+        inputs: Sequence[Path],
+        outputs: Sequence[Path],
+        code: Sequence[str],
+        params: Callable[[Dict[str, Any]], Dict[str, Any]],
+        run: Callable[[Dict[str, Any]], None]
+    ):
+        self.name = name
+        self.deps = list(deps)
+        self.inputs = list(inputs)
+        self.outputs = list(outputs)
+        self.code = [PIPELINE_DIR / module for module in code]
+        self.params = params
+        self.run = run
+
+
+# Los módulos de cada etapa se importan solo si la etapa se ejecuta
+# (fitz, openai y chromadb tardan en cargar)
+
+def _run_extract(params: Dict[str, Any]) -> None:
+    extraction = importlib.import_module("01_extraction")
+    pages = extraction.extract_pages(PDF_FILE, params["start_page"], params["end_page"])
+    count = extraction.write_pages(enumerate(pages, start=params["start_page"] + 1), PAGES_FILE)
+    print(f"   📄 {count} páginas → {PAGES_FILE.name}")
+
+
+def _chunk_options(params: Dict[str, Any]) -> Dict[str, Any]:
+    """Argumentos de chunk_pages(); las opciones de tokens solo con strategy="tokens"."""
+    options = {
+        "strategy": params["chunk_strategy"],
+        "chunk_size_words": params["chunk_size_words"],
+        "overlap": params["overlap"],
+    }
+    if params["chunk_strategy"] == "tokens":
+        options.update({
+            "tokenizer": params["chunk_tokenizer"],
+            "target_tokens": params["target_tokens"],
+            "max_tokens": params["max_tokens"],
+            "overlap_tokens": params["overlap_tokens"],
+            "snap_sentences": params["snap_sentences"],
+        })
+    return options
+
+
+def _run_chunk(params: Dict[str, Any]) -> None:
+    extraction = importlib.import_module("01_extraction")
+    chunking = importlib.import_module("02_chunking")
+    pages = chunking.iter_clean_pages(extraction.iter_pages_file(PAGES_FILE))
+    chunks = chunking.chunk_pages(pages, **_chunk_options(params))
+    count = chunking.write_chunks(chunks, CHUNKS_FILE)
+    print(f"   ✂️ {count} chunks → {CHUNKS_FILE.name}")
+
+
+def _run_embed(params: Dict[str, Any]) -> None:
+    embedding = importlib.import_module("03_embedding")
+    embedding.main()
+
+
+def _run_store(params: Dict[str, Any]) -> None:
+    store = importlib.import_module("04_store_chroma")
+    store.run()
+
+
+STAGES: List[Stage] = [
+    Stage(
+        "extract", deps=[], inputs=[PDF_FILE], outputs=[PAGES_FILE],
+        code=["01_extraction.py"],
+        params=lambda p: {"start_page": p["start_page"], "end_page": p["end_page"]},
+        run=_run_extract
+    ),
+    Stage(
+        "chunk", deps=["extract"], inputs=[PAGES_FILE], outputs=[CHUNKS_FILE],
+        code=["02_chunking.py", "token_chunking.py"],
+        params=_chunk_options,
+        run=_run_chunk
+    ),
+    Stage(
+        "embed", deps=["chunk"], inputs=[CHUNKS_FILE], outputs=[EMBED_MATRIX, EMBED_SIDECAR],
+        code=["03_embedding.py", "embedding_store.py"],
+        params=lambda p: {"model": p["embedding_model"], "dtype": p["storage_dtype"]},
+        run=_run_embed
+    ),
+    Stage(
+        "store", deps=["embed"], inputs=[EMBED_MATRIX, EMBED_SIDECAR], outputs=[MANIFEST_FILE],
+        code=["04_store_chroma.py", "collection_alias.py"],
+        params=lambda p: {"collection_alias": p["collection_alias"]},
+        run=_run_store
+    ),
+]
+STAGE_NAMES = [stage.name for stage in STAGES]
+
+
+def default_params() -> Dict[str, Any]:
+    return {
+        "start_page": config.EXTRACTION_START_PAGE,
+        "end_page": config.EXTRACTION_END_PAGE,
+        "chunk_size_words": config.CHUNK_SIZE_WORDS,
+        "overlap": config.CHUNK_OVERLAP_WORDS,
+        "chunk_strategy": config.CHUNK_STRATEGY,
+        "chunk_tokenizer": config.CHUNK_TOKENIZER,
+        "target_tokens": config.CHUNK_TARGET_TOKENS,
+        "max_tokens": config.CHUNK_MAX_TOKENS,
+        "overlap_tokens": config.CHUNK_OVERLAP_TOKENS,
+        "snap_sentences": config.CHUNK_SNAP_SENTENCES,
+        "embedding_model": config.EMBEDDING_MODEL,
+        "storage_dtype": config.EMBEDDING_STORAGE_DTYPE,
+        "collection_alias": config.COLLECTION_ALIAS,
+    }
+
+
+def topological_order(stages: Sequence[Stage]) -> List[Stage]:
+    """Ordena el DAG (dependencias primero) y detecta ciclos."""
+    by_name = {stage.name: stage for stage in stages}
+    ordered: List[Stage] = []
+    state: Dict[str, str] = {}
+
+    def visit(stage: Stage) -> None:
+        if state.get(stage.name) == "done":
+            return
+        if state.get(stage.name) == "visiting":
+            raise ValueError(f"Ciclo en el pipeline en la etapa '{stage.name}'")
+        state[stage.name] = "visiting"
+        for dep in stage.deps:
+            visit(by_name[dep])
+        state[stage.name] = "done"
+        ordered.append(stage)
+
+    for stage in stages:
+        visit(stage)
+    return ordered
+
+
+def upstream(stages: Sequence[Stage], name: str) -> set:
+    """La etapa `name` y todas sus dependencias (para --until)."""
+    by_name = {stage.name: stage for stage in stages}
+    selected, pending = set(), [name]
+    while pending:
+        current = pending.pop()
+        if current not in selected:
+            selected.add(current)
+            pending.extend(by_name[current].deps)
+    return selected
+
+
+# =========================
+# HUELLAS
+# =========================
+
+class FileHasher:
+    """sha256 de archivos, recordado por (tamaño, mtime_ns) entre ejecuciones."""
+
+    def __init__(self, cache: Dict[str, Any]):
+        self.cache = cache
+
+    def digest(self, path: Path) -> Optional[str]:
+        try:
+            st = os.stat(path)
+        except FileNotFoundError:
+            return None
+        key = str(path)
+        cached = self.cache.get(key)
+        if cached and cached["size"] == st.st_size and cached["mtime_ns"] == st.st_mtime_ns:
+            return cached["sha256"]
+
+        h = hashlib.sha256()
+        with open(path, "rb") as f:
+            for block in iter(lambda: f.read(1 << 20), b""):
+                h.update(block)
+        self.cache[key] = {"size": st.st_size, "mtime_ns": st.st_mtime_ns, "sha256": h.hexdigest()}
+        return h.hexdigest()
+
+
+def stage_fingerprint(stage: Stage, params: Dict[str, Any], hasher: FileHasher) -> str:
+    payload = {
+        "params": stage.params(params),
+        "inputs": {path.name: hasher.digest(path) for path in stage.inputs},
+        "code": {path.name: hasher.digest(path) for path in stage.code},
+    }
+    return hashlib.sha256(json.dumps(payload, sort_keys=True).encode("utf-8")).hexdigest()
+
+
+def outputs_intact(stage: Stage, record: Dict[str, Any], hasher: FileHasher) -> bool:
+    recorded = record.get("outputs", {})
+    return all(
+        recorded.get(path.name) is not None and hasher.digest(path) == recorded.get(path.name)
+        for path in stage.outputs
+    )
+
+
+# =========================
+# ESTADO
+# =========================
+
+def load_state(path: Path = STATE_FILE) -> Dict[str, Any]:
+    if not path.exists():
+        return {"stages": {}, "files": {}}
+    with open(path, "r", encoding="utf-8") as f:
+        state = json.load(f)
+    state.setdefault("stages", {})
+    state.setdefault("files", {})
+    return state
+
+
+def save_state(state: Dict[str, Any], path: Path = STATE_FILE) -> None:
+    """Escritura atómica (archivo temporal + replace)."""
+    tmp = path.with_suffix(".tmp")
+    with open(tmp, "w", encoding="utf-8") as f:
+        json.dump(state, f, indent=2, ensure_ascii=False)
+    os.replace(tmp, path)
+
+
+# =========================
+# EJECUCIÓN
+# =========================
+
+def run_pipeline(
+    params: Dict[str, Any],
+    force: Sequence[str] = (),
+    until: Optional[str] = None,
+    dry_run: bool = False
+) -> List[Dict[str, Any]]:
+    """
+    Ejecuta las etapas desactualizadas en orden topológico.
+
+    Returns:
+        Una fila por etapa: {"stage", "status", "seconds"}; status es
+        "ok", "skipped", "would run" (dry run) o "not selected".
+    """
+    state = load_state()
+    hasher = FileHasher(state["files"])
+    selected = upstream(STAGES, until) if until else set(STAGE_NAMES)
+    forced = set(STAGE_NAMES) if "all" in force else set(force)
+    report: List[Dict[str, Any]] = []
+    would_run: set = set()
+
+    for stage in topological_order(STAGES):
+        if stage.name not in selected:
+            report.append({"stage": stage.name, "status": "not selected", "seconds": 0.0})
+            continue
+
+        t0 = time.perf_counter()
+        fp = stage_fingerprint(stage, params, hasher)
+        record = state["stages"].get(stage.name, {})
+        up_to_date = (
+            stage.name not in forced
+            and record.get("fingerprint") == fp
+            and outputs_intact(stage, record, hasher)
+        )
+        if dry_run and would_run.intersection(stage.deps):
+            # Sin ejecutar la dependencia no se sabe si su salida cambia
+            up_to_date = False
+        if up_to_date:
+            report.append({"stage": stage.name, "status": "skipped", "seconds": time.perf_counter() - t0})
+            continue
+        if dry_run:
+            would_run.add(stage.name)
+            report.append({"stage": stage.name, "status": "would run", "seconds": 0.0})
+            continue
+
+        print(f"▶️ {stage.name}")
+        stage.run(params)
+        # Las salidas nuevas se hashean una vez y quedan en caché: si no
+        # cambiaron, la huella de la etapa siguiente coincide (corte temprano)
+        state["stages"][stage.name] = {
+            "fingerprint": fp,
+            "params": stage.params(params),
+            "outputs": {path.name: hasher.digest(path) for path in stage.outputs},
+            "seconds": round(time.perf_counter() - t0, 3),
+        }
+        save_state(state)  # tras cada etapa: si una falla, las anteriores no se repiten
+        report.append({"stage": stage.name, "status": "ok", "seconds": time.perf_counter() - t0})
+
+    if not dry_run:
+        save_state(state)
+    return report
+
+
+def print_report(report: List[Dict[str, Any]], total: float) -> None:
+    icons = {"ok": "✅", "skipped": "⏭️", "would run": "🔸", "not selected": "·"}
+    print(f"\n{'etapa':<10}{'estado':<16}{'segundos':>10}")
+    for row in report:
+        print(f"{row['stage']:<10}{icons[row['status']] + ' ' + row['status']:<16}{row['seconds']:>10.3f}")
+    print(f"{'total':<26}{total:>10.3f}")
+
+
+def main():
+    defaults = default_params()
+    parser = argparse.ArgumentParser(description="Pipeline de ingesta incremental (01 → 04)")
+    parser.add_argument("--start-page", type=int, default=defaults["start_page"])
+    parser.add_argument("--end-page", type=int, default=defaults["end_page"])
+    parser.add_argument("--chunk-size", type=int, default=defaults["chunk_size_words"])
+    parser.add_argument("--overlap", type=int, default=defaults["overlap"])
+    parser.add_argument("--strategy", choices=["words", "tokens"], default=defaults["chunk_strategy"])
+    parser.add_argument("--target-tokens", type=int, default=defaults["target_tokens"])
+    parser.add_argument("--max-tokens", type=int, default=defaults["max_tokens"])
+    parser.add_argument("--overlap-tokens", type=int, default=defaults["overlap_tokens"])
+    parser.add_argument("--force", nargs="+", default=[], choices=STAGE_NAMES + ["all"],
+                        help="Etapas a ejecutar aunque estén al día")
+    parser.add_argument("--until", choices=STAGE_NAMES, default=None,
+                        help="Ejecuta solo esta etapa y sus dependencias")
+    parser.add_argument("--dry-run", action="store_true", help="Muestra qué se ejecutaría, sin ejecutar")
+    args = parser.parse_args()
+
+    params = {
+        **defaults,
+        "start_page": args.start_page,
+        "end_page": args.end_page,
+        "chunk_size_words": args.chunk_size,
+        "overlap": args.overlap,
+        "chunk_strategy": args.strategy,
+        "target_tokens": args.target_tokens,
+        "max_tokens": args.max_tokens,
+        "overlap_tokens": args.overlap_tokens,
+    }
+
+    t0 = time.perf_counter()
+    report = run_pipeline(params, force=args.force, until=args.until, dry_run=args.dry_run)
+    print_report(report, time.perf_counter() - t0)
+
+
+if __name__ == "__main__":
+    main()
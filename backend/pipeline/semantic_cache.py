@@ -0,0 +1,155 @@
+"""
+Caché semántica de respuestas (paráfrasis)
+
+"¿qué es el aprendizaje supervisado?" y "define aprendizaje supervisado"
+no comparten clave exacta, pero sí embedding cercano y los mismos chunks.
+Se guardan tripletas (embedding de la query, IDs de chunks recuperados,
+respuesta) en un índice vectorial pequeño en memoria:
+
+- Hit: similitud coseno >= SEMANTIC_CACHE_THRESHOLD y la recuperación
+  actual devuelve exactamente el mismo conjunto de chunks → se reutiliza
+  la respuesta sin llamar al LLM
+- Versión: ligada a la colección activa (y prompts); si cambia, se vacía
+- Desalojo: LRU por último uso al llegar a SEMANTIC_CACHE_MAX_ENTRIES
+- Auditoría: una fracción de los hits se re-genera y se compara con la
+  respuesta cacheada; las divergencias cuentan como falsos hits
+"""
+
+import random
+import re
+import threading
+import time
+from typing import Dict, Iterable, Optional
+
+import numpy as np
+
+from config import (
+    SEMANTIC_CACHE_THRESHOLD,
+    SEMANTIC_CACHE_MAX_ENTRIES,
+    SEMANTIC_CACHE_AUDIT_RATE,
+    SEMANTIC_CACHE_AUDIT_MIN_OVERLAP
+)
+
+_WORD = re.compile(r"\w+")
+
+
+def answer_overlap(a: str, b: str) -> float:
+    """Similitud de Jaccard entre las palabras de dos respuestas."""
+    wa, wb = set(_WORD.findall(a.lower())), set(_WORD.findall(b.lower()))
+    if not wa and not wb:
+        return 1.0
+    return len(wa & wb) / len(wa | wb)
+
+
+class SemanticCache:
+    """Índice vectorial exacto (matriz NumPy) de respuestas anteriores."""
+
+    def __init__(
+        self,
+        threshold: float = SEMANTIC_CACHE_THRESHOLD,
+        max_entries: int = SEMANTIC_CACHE_MAX_ENTRIES,
+        audit_rate: float = SEMANTIC_CACHE_AUDIT_RATE
+    ):
+        self.threshold = threshold
+        self.max_entries = max_entries
+        self.audit_rate = audit_rate
+        self._lock = threading.Lock()
+        self._version: Optional[str] = None
+        self._reset()
+
+        self.hits = 0
+        self.misses = 0
+        self.chunk_mismatches = 0
+        self.evictions = 0
+        self.audits = 0
+        self.false_hits = 0
+
+    def _reset(self):
+        self._matrix: Optional[np.ndarray] = None
+        self._chunk_ids = [None] * self.max_entries
+        self._answers = [None] * self.max_entries
+        self._last_used = np.zeros(self.max_entries, dtype=np.float64)
+        self._size = 0
+
+    def _check_version(self, version: str):
+        if version != self._version:
+            self._reset()
+            self._version = version
+
+    @staticmethod
+    def _normalize(query_emb) -> np.ndarray:
+        q = np.asarray(query_emb, dtype=np.float32)
+        return q / max(float(np.linalg.norm(q)), 1e-12)
+
+    def lookup(self, query_emb, chunk_ids: Iterable[str], version: str) -> Optional[str]:
+        """Respuesta cacheada para una paráfrasis con los mismos chunks, o None."""
+        wanted = frozenset(chunk_ids)
+        q = self._normalize(query_emb)
+
+        with self._lock:
+            self._check_version(version)
+            if self._size == 0 or self._matrix.shape[1] != q.shape[0]:
+                self.misses += 1
+                return None
+
+            sims = self._matrix[:self._size] @ q
+            for i in np.argsort(-sims):
+                if sims[i] < self.threshold:
+                    break
+                if self._chunk_ids[i] == wanted:
+                    self._last_used[i] = time.monotonic()
+                    self.hits += 1
+                    return self._answers[i]
+                self.chunk_mismatches += 1
+
+            self.misses += 1
+            return None
+
+    def put(self, query_emb, chunk_ids: Iterable[str], answer: str, version: str) -> None:
+        q = self._normalize(query_emb)
+
+        with self._lock:
+            self._check_version(version)
+            if self._matrix is None or self._matrix.shape[1] != q.shape[0]:
+                self._reset()
+                self._matrix = np.zeros((self.max_entries, q.shape[0]), dtype=np.float32)
+
+            if self._size < self.max_entries:
+                slot = self._size
+                self._size += 1
+            else:
+                slot = int(np.argmin(self._last_used))
+                self.evictions += 1
+
+            self._matrix[slot] = q
+            self._chunk_ids[slot] = frozenset(chunk_ids)
+            self._answers[slot] = answer
+            self._last_used[slot] = time.monotonic()
+
+    # ---------- auditoría de falsos hits ----------
+
+    def should_audit(self) -> bool:
+        return self.audit_rate > 0 and random.random() < self.audit_rate
+
+    def record_audit(self, cached_answer: str, fresh_answer: str) -> bool:
+        """Registra una auditoría; devuelve True si fue un falso hit."""
+        false_hit = answer_overlap(cached_answer, fresh_answer) < SEMANTIC_CACHE_AUDIT_MIN_OVERLAP
+        with self._lock:
+            self.audits += 1
+            if false_hit:
+                self.false_hits += 1
+        return false_hit
+
+    def stats(self) -> Dict[str, float]:
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": self.hits / lookups if lookups else 0.0,
+                "chunk_mismatches": self.chunk_mismatches,
+                "evictions": self.evictions,
+                "entries": self._size,
+                "audits": self.audits,
+                "false_hits": self.false_hits,
+            }
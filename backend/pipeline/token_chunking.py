@@ -0,0 +1,198 @@
+"""
+Chunking por tokens (tokenizers de Hugging Face)
+
+Alternativa a la ventana de palabras de 02_chunking.py: el tamaño de cada
+chunk se mide en tokens del tokenizer del modelo de embeddings, así el
+costo real (prompt y embeddings) de cada chunk es predecible.
+
+- Las páginas se tokenizan por lotes con encode_batch() (Rust, en paralelo)
+  y se recorren en streaming: en memoria solo están el lote actual y la
+  ventana de tokens
+- CHUNK_TARGET_TOKENS: tamaño buscado; CHUNK_MAX_TOKENS: tope duro
+- CHUNK_OVERLAP_TOKENS: tokens compartidos con el chunk anterior
+- Con CHUNK_SNAP_SENTENCES el corte se corre al final de oración más
+  cercano (hacia adelante hasta el máximo, o hacia atrás hasta la mitad
+  del objetivo) y el solapamiento empieza en un inicio de oración
+- Cada chunk lleva token_count en metadata (además de la procedencia de
+  página y caracteres de 02), para presupuestar prompts sin re-tokenizar
+
+El texto de cada chunk es un recorte del texto limpio original (no se
+decodifican tokens), con los mismos offsets que iter_chunks().
+"""
+
+from collections import deque
+from functools import lru_cache
+from pathlib import Path
+from typing import Any, Deque, Dict, Iterable, Iterator, List, NamedTuple, Tuple
+
+from config import (
+    CHUNK_MAX_TOKENS,
+    CHUNK_OVERLAP_TOKENS,
+    CHUNK_SNAP_SENTENCES,
+    CHUNK_TARGET_TOKENS,
+    CHUNK_TOKENIZER
+)
+
+# Páginas por llamada a encode_batch()
+ENCODE_BATCH_PAGES = 32
+
+SENTENCE_END = frozenset(".!?…")
+# Cierres que pueden seguir al punto: «...» "..." (...)
+SENTENCE_CLOSERS = frozenset("\"'”’»)")
+
+
+class Token(NamedTuple):
+    page: int
+    start: int          # offset de caracteres dentro de la página limpia
+    end: int
+    sentence_end: bool  # el token cierra una oración
+
+
+@lru_cache(maxsize=4)
+def load_tokenizer(name: str = CHUNK_TOKENIZER):
+    """
+    Tokenizer por nombre del Hugging Face Hub (se descarga y cachea la
+    primera vez) o por ruta local a un tokenizer.json.
+    """
+    from tokenizers import Tokenizer
+
+    if Path(name).exists():
+        return Tokenizer.from_file(str(name))
+    return Tokenizer.from_pretrained(name)
+
+
+def _ends_sentence(text: str, end: int) -> bool:
+    i = end - 1
+    while i >= 0 and text[i] in SENTENCE_CLOSERS:
+        i -= 1
+    return i >= 0 and text[i] in SENTENCE_END and (end >= len(text) or text[end].isspace())
+
+
+def _encoded_pages(pages: Iterable[Tuple[int, str]], tokenizer, batch_pages: int):
+    """(página, texto, offsets de tokens), tokenizando de a `batch_pages` páginas."""
+    batch: List[Tuple[int, str]] = []
+
+    def flush():
+        encodings = tokenizer.encode_batch([texto for _, texto in batch], add_special_tokens=False)
+        for (page_num, texto), encoding in zip(batch, encodings):
+            yield page_num, texto, encoding.offsets
+        batch.clear()
+
+    for page in pages:
+        batch.append(page)
+        if len(batch) >= batch_pages:
+            yield from flush()
+    if batch:
+        yield from flush()
+
+
+def _cut_point(window: Deque[Token], target: int, max_tokens: int, snap: bool) -> int:
+    """Cantidad de tokens del próximo chunk."""
+    limit = min(len(window), max_tokens)
+    if limit <= target:
+        return limit
+    if not snap:
+        return target
+    # Primer final de oración desde el objetivo hasta el máximo...
+    for n in range(target, limit + 1):
+        if window[n - 1].sentence_end:
+            return n
+    # ...o el último antes del objetivo, sin bajar de la mitad
+    for n in range(target - 1, target // 2, -1):
+        if window[n - 1].sentence_end:
+            return n
+    return target
+
+
+def _next_start(window: Deque[Token], cut: int, overlap: int, snap: bool) -> int:
+    """Tokens a descartar: el próximo chunk empieza `overlap` tokens antes del corte."""
+    start = max(1, cut - overlap)
+    if snap:
+        # Solapamiento desde un inicio de oración (puede quedar más corto)
+        for n in range(start, cut):
+            if window[n - 1].sentence_end:
+                return n
+    return start
+
+
+def _make_chunk(window: Deque[Token], n: int, page_texts: Dict[int, Tuple[int, str]]) -> Dict[str, Any]:
+    first, last = window[0], window[n - 1]
+    parts = []
+    for page_num, (_, texto) in page_texts.items():
+        if first.page <= page_num <= last.page:
+            start = first.start if page_num == first.page else 0
+            end = last.end if page_num == last.page else len(texto)
+            parts.append(texto[start:end])
+
+    raw = " ".join(parts)
+    text = raw.strip()
+    char_start = page_texts[first.page][0] + first.start + (len(raw) - len(raw.lstrip()))
+    return {
+        "text": text,
+        "metadata": {
+            "page_start": first.page,
+            "page_end": last.page,
+            "char_start": char_start,
+            "char_end": char_start + len(text),
+            "token_count": n,
+        },
+    }
+
+
+def iter_token_chunks(
+    pages: Iterable[Tuple[int, str]],
+    tokenizer=None,
+    target_tokens: int = CHUNK_TARGET_TOKENS,
+    max_tokens: int = CHUNK_MAX_TOKENS,
+    overlap_tokens: int = CHUNK_OVERLAP_TOKENS,
+    snap_sentences: bool = CHUNK_SNAP_SENTENCES,
+    batch_pages: int = ENCODE_BATCH_PAGES
+) -> Iterator[Dict[str, Any]]:
+    """
+    Ventana de tokens sobre páginas limpias (salida de iter_clean_pages()).
+    Mismo formato de salida que iter_chunks() + metadata["token_count"].
+    `tokenizer`: objeto Tokenizer, nombre/ruta (load_tokenizer) o None (CHUNK_TOKENIZER).
+    """
+    if not 0 < target_tokens <= max_tokens:
+        raise ValueError("Se requiere 0 < target_tokens <= max_tokens")
+    if tokenizer is None or isinstance(tokenizer, str):
+        tokenizer = load_tokenizer(tokenizer or CHUNK_TOKENIZER)
+    min_tokens = int(target_tokens * 0.4)
+
+    window: Deque[Token] = deque()
+    page_texts: Dict[int, Tuple[int, str]] = {}  # página → (offset en el documento, texto)
+    base = 0
+    pending = 0  # tokens de la ventana aún no incluidos en ningún chunk
+
+    def emit():
+        nonlocal pending
+        cut = _cut_point(window, target_tokens, max_tokens, snap_sentences)
+        chunk = _make_chunk(window, cut, page_texts)
+        pending = len(window) - cut
+        for _ in range(_next_start(window, cut, overlap_tokens, snap_sentences)):
+            window.popleft()
+        # Se sueltan las páginas que ya no tienen tokens en la ventana
+        for page_num in list(page_texts):
+            if not window or page_num >= window[0].page:
+                break
+            del page_texts[page_num]
+        return chunk
+
+    for page_num, texto, offsets in _encoded_pages(pages, tokenizer, batch_pages):
+        page_texts[page_num] = (base, texto)
+        base += len(texto) + 1
+        for start, end in offsets:
+            window.append(Token(page_num, start, end, _ends_sentence(texto, end)))
+            pending += 1
+            if len(window) >= max_tokens:
+                yield emit()
+
+    # Cola: se sigue cortando mientras supere el objetivo; el resto sale
+    # como último chunk si tiene suficientes tokens
+    while pending:
+        if len(window) > target_tokens:
+            yield emit()
+            continue
+        if len(window) >= min_tokens:
+            yield _make_chunk(window, len(window), page_texts)
+        break
@@ -0,0 +1,138 @@
+"""
+Trazas OpenTelemetry del pipeline RAG y de la API
+
+Una consulta a /api/rag produce un span raíz (middleware HTTP de la API)
+con spans hijos por etapa: embedding de la query, recuperación, armado
+del prompt, completion del LLM y cada operación de MongoDB.
+
+El exportador se elige con TRACING_EXPORTER en config.py (o la variable
+de entorno del mismo nombre):
+- "none":    sin exportar (los spans son no-op)
+- "console": spans a stdout
+- "file":    una línea JSON por span en TRACING_FILE (uso offline)
+- "otlp":    OTLP/gRPC hacia un collector (OTEL_EXPORTER_OTLP_ENDPOINT)
+
+El contexto viaja en contextvars: utils.run_in_executor lo copia a los
+hilos del pool, así los spans creados dentro de un executor cuelgan de la
+solicitud correcta.
+"""
+
+import functools
+import inspect
+import os
+from contextlib import contextmanager
+from pathlib import Path
+
+from opentelemetry import trace
+from opentelemetry.context import Context
+from opentelemetry.sdk.resources import Resource
+from opentelemetry.sdk.trace import TracerProvider
+from opentelemetry.sdk.trace.export import BatchSpanProcessor, ConsoleSpanExporter
+from opentelemetry.trace import Link, SpanKind, Status, StatusCode
+
+from config import TRACING_EXPORTER, TRACING_FILE, TRACING_SERVICE_NAME
+
+BASE_DIR = Path(__file__).resolve().parents[2]
+
+_provider = None
+
+
+def _create_exporter(name: str):
+    if name == "console":
+        return ConsoleSpanExporter()
+    if name == "file":
+        path = BASE_DIR / TRACING_FILE
+        path.parent.mkdir(parents=True, exist_ok=True)
+        out = open(path, "a", encoding="utf-8")
+        # Un span por línea (el formato por defecto es JSON indentado)
+        return ConsoleSpanExporter(out=out, formatter=lambda span: span.to_json(indent=None) + "\n")
+    if name == "otlp":
+        from opentelemetry.exporter.otlp.proto.grpc.trace_exporter import OTLPSpanExporter
+        return OTLPSpanExporter()
+    raise ValueError(f"TRACING_EXPORTER desconocido: {name!r}")
+
+
+def configure() -> None:
+    """Instala el TracerProvider según la configuración (idempotente)."""
+    global _provider
+    if _provider is not None:
+        return
+
+    exporter_name = os.getenv("TRACING_EXPORTER", TRACING_EXPORTER).lower()
+    if exporter_name == "none":
+        return
+
+    provider = TracerProvider(resource=Resource.create({"service.name": TRACING_SERVICE_NAME}))
+    provider.add_span_processor(BatchSpanProcessor(_create_exporter(exporter_name)))
+    trace.set_tracer_provider(provider)
+    _provider = provider
+    print(f"🔭 Trazas OpenTelemetry activas (exportador: {exporter_name})")
+
+
+def shutdown() -> None:
+    """Exporta los spans pendientes (al apagar la API)."""
+    if _provider is not None:
+        _provider.shutdown()
+
+
+tracer = trace.get_tracer("rag_chatbot")
+
+
+@contextmanager
+def span(name: str, kind: SpanKind = SpanKind.INTERNAL, root: bool = False, links=None, **attributes):
+    """
+    Span hijo del contexto actual; las excepciones quedan registradas en él.
+    Con root=True inicia una traza nueva (trabajo en segundo plano), que
+    puede enlazar (`links`) a las solicitudes que lo originaron.
+    """
+    with tracer.start_as_current_span(
+        name,
+        context=Context() if root else None,
+        kind=kind,
+        links=links,
+        record_exception=True,
+        set_status_on_exception=True
+    ) as current:
+        for key, value in attributes.items():
+            if value is not None:
+                current.set_attribute(key, value)
+        yield current
+
+
+def traced(name: str, **attributes):
+    """Decorador: envuelve la función (sync o async) en un span."""
+    def decorator(func):
+        if inspect.iscoroutinefunction(func):
+            @functools.wraps(func)
+            async def async_wrapper(*args, **kwargs):
+                with span(name, **attributes):
+                    return await func(*args, **kwargs)
+            return async_wrapper
+
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            with span(name, **attributes):
+                return func(*args, **kwargs)
+        return wrapper
+    return decorator
+
+
+def record_usage(current, usage) -> None:
+    """Agrega el consumo de tokens de OpenAI como atributos del span."""
+    if usage is None:
+        return
+    current.set_attribute("llm.usage.prompt_tokens", getattr(usage, "prompt_tokens", 0) or 0)
+    current.set_attribute("llm.usage.completion_tokens", getattr(usage, "completion_tokens", 0) or 0)
+
+
+def set_error(current, message: str) -> None:
+    current.set_status(Status(StatusCode.ERROR, message))
+
+
+def current_link():
+    """Link al span activo (para enlazar trabajo diferido con su solicitud)."""
+    span_context = trace.get_current_span().get_span_context()
+    return Link(span_context) if span_context.is_valid else None
+
+
+configure()
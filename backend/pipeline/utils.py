@@ -1,13 +1,33 @@
 # utils.py
 from dotenv import load_dotenv
 import os
-from openai import OpenAI
+import asyncio
+import contextvars
+import functools
+from openai import OpenAI, AsyncOpenAI
 
 load_dotenv()
 
-def get_openai_client():
-    """Devuelve un cliente de OpenAI configurado con la API key."""
+def _get_api_key():
     api_key = os.getenv("OPENAI_API_KEY")
     if not api_key:
         raise ValueError("No se encontró la API key en las variables de entorno.")
-    return OpenAI(api_key=api_key)
\ No newline at end of file
+    return api_key
+
+def get_openai_client():
+    """Devuelve un cliente de OpenAI configurado con la API key."""
+    return OpenAI(api_key=_get_api_key())
+
+def get_async_openai_client():
+    """Devuelve un cliente asíncrono de OpenAI (no bloquea el event loop)."""
+    return AsyncOpenAI(api_key=_get_api_key())
+
+async def run_in_executor(executor, func, *args, **kwargs):
+    """
+    Ejecuta una función bloqueante en un executor acotado sin bloquear el
+    event loop. Copia el contexto actual (contextvars) al hilo de trabajo.
+    """
+    loop = asyncio.get_running_loop()
+    ctx = contextvars.copy_context()
+    call = functools.partial(ctx.run, func, *args, **kwargs)
+    return await loop.run_in_executor(executor, call)
@@ -0,0 +1,117 @@
+"""
+Control de admisión: cancelaciones y timeouts que compiten con la cesión
+de un lugar no deben dejar contadores colgados (active/queued).
+"""
+
+import asyncio
+
+import pytest
+
+from api.services.admission_service import AdmissionController, AdmissionRejected
+
+
+def _idle(controller: AdmissionController) -> bool:
+    stats = controller.stats()
+    return stats["active"] == 0 and stats["queued"] == 0 and stats["users_waiting"] == 0
+
+
+async def _enqueue(controller: AdmissionController, user: str = "u"):
+    """Ocupa el único lugar y deja una espera en cola; devuelve (lugar, tarea en espera)."""
+    slot = await controller.acquire(user)
+    waiter = asyncio.create_task(controller.acquire(user))
+    await asyncio.sleep(0)
+    assert controller.stats()["queued"] == 1
+    return slot, waiter
+
+
+def test_fast_path_and_release():
+    async def scenario():
+        controller = AdmissionController(max_concurrency=2, max_queue=4, max_queue_per_user=4, queue_timeout=1)
+        async with controller.slot("a"), controller.slot("b"):
+            assert controller.stats()["active"] == 2
+        assert _idle(controller)
+
+    asyncio.run(scenario())
+
+
+def test_release_hands_slot_to_waiter():
+    async def scenario():
+        controller = AdmissionController(max_concurrency=1, max_queue=4, max_queue_per_user=4, queue_timeout=1)
+        slot, waiter = await _enqueue(controller)
+        slot.release()
+        granted = await waiter
+        assert controller.stats()["active"] == 1 and controller.stats()["queued"] == 0
+        granted.release()
+        assert _idle(controller)
+
+    asyncio.run(scenario())
+
+
+def test_cancel_in_same_tick_as_release_returns_slot():
+    async def scenario():
+        controller = AdmissionController(max_concurrency=1, max_queue=4, max_queue_per_user=4, queue_timeout=1)
+        slot, waiter = await _enqueue(controller)
+        # La cancelación y la cesión llegan antes de que la espera despierte
+        waiter.cancel()
+        slot.release()
+        with pytest.raises(asyncio.CancelledError):
+            await waiter
+        assert _idle(controller)
+        # El camino rápido sigue disponible
+        fresh = await asyncio.wait_for(controller.acquire("other"), 0.1)
+        fresh.release()
+        assert _idle(controller)
+
+    asyncio.run(scenario())
+
+
+def test_release_skips_already_cancelled_waiter():
+    async def scenario():
+        controller = AdmissionController(max_concurrency=1, max_queue=4, max_queue_per_user=4, queue_timeout=1)
+        slot, waiter = await _enqueue(controller)
+        # Espera ya cancelada (como deja wait_for al vencer en Python ≥ 3.12)
+        # cuando _release() la saca de la cola
+        controller._waiters["u"][0].cancel()
+        slot.release()
+        with pytest.raises(asyncio.CancelledError):
+            await waiter
+        assert _idle(controller)
+        fresh = await asyncio.wait_for(controller.acquire("other"), 0.1)
+        fresh.release()
+
+    asyncio.run(scenario())
+
+
+def test_timeout_rejects_and_cleans_queue():
+    async def scenario():
+        controller = AdmissionController(max_concurrency=1, max_queue=4, max_queue_per_user=4, queue_timeout=0.01)
+        slot = await controller.acquire("u")
+        with pytest.raises(AdmissionRejected) as rejected:
+            await controller.acquire("u")
+        assert rejected.value.status_code == 503 and rejected.value.reason == "timeout"
+        assert controller.stats()["queued"] == 0
+        slot.release()
+        assert _idle(controller)
+
+    asyncio.run(scenario())
+
+
+def test_queue_limits():
+    async def scenario():
+        controller = AdmissionController(max_concurrency=1, max_queue=2, max_queue_per_user=1, queue_timeout=1)
+        slot, waiter = await _enqueue(controller, "a")
+        with pytest.raises(AdmissionRejected) as per_user:
+            await controller.acquire("a")
+        assert per_user.value.status_code == 429
+        other = asyncio.create_task(controller.acquire("b"))
+        await asyncio.sleep(0)
+        with pytest.raises(AdmissionRejected) as full:
+            await controller.acquire("c")
+        assert full.value.status_code == 503
+
+        slot.release()
+        (await waiter).release()
+        (await other).release()
+        assert _idle(controller)
+
+    asyncio.run(scenario())
@@ -0,0 +1,93 @@
+"""
+AsyncRepository.save_messages: cada conversación del lote recibe el
+created_at de su propio último mensaje, sin retroceder updated_at, y
+reintentar un lote (PersistenceQueue) no duplica mensajes.
+"""
+
+import asyncio
+from datetime import datetime, timedelta
+
+from bson import ObjectId
+from pymongo import UpdateOne
+from pymongo.errors import BulkWriteError
+
+from api.db.async_repository import AsyncRepository
+from api.services import db_service
+from api.services.persistence_service import PersistenceQueue
+
+
+class FakeCollection:
+    def __init__(self, bulk_failures=0):
+        self.inserted = []
+        self.bulk = []
+        self.bulk_failures = bulk_failures
+
+    async def insert_many(self, docs, ordered=True):
+        # Como MongoDB con ordered=False: los _id repetidos fallan, el resto se inserta
+        seen = {doc["_id"] for doc in self.inserted}
+        fresh = [doc for doc in docs if doc["_id"] not in seen]
+        self.inserted.extend(fresh)
+        if len(fresh) < len(docs):
+            raise BulkWriteError({
+                "nInserted": len(fresh),
+                "writeErrors": [{"code": 11000} for _ in range(len(docs) - len(fresh))],
+                "writeConcernErrors": []
+            })
+
+        class Result:
+            inserted_ids = [doc["_id"] for doc in docs]
+        return Result()
+
+    async def bulk_write(self, requests, ordered=True):
+        if self.bulk_failures:
+            self.bulk_failures -= 1
+            raise RuntimeError("conversations no disponible")
+        self.bulk.append(requests)
+
+
+class FakeDatabase(dict):
+    def __missing__(self, name):
+        self[name] = FakeCollection()
+        return self[name]
+
+
+def test_save_messages_updates_each_conversation_with_its_own_latest_message():
+    db = FakeDatabase()
+    repo = AsyncRepository(db)
+    a, b = str(ObjectId()), str(ObjectId())
+    t0 = datetime(2025, 1, 1, 12, 0, 0)
+
+    inserted = asyncio.run(repo.save_messages([
+        {"conversation_id": a, "role": "user", "content": "1", "created_at": t0},
+        {"conversation_id": b, "role": "user", "content": "2", "created_at": t0 + timedelta(seconds=5)},
+        {"conversation_id": a, "role": "assistant", "content": "3", "created_at": t0 + timedelta(seconds=1)},
+        {"conversation_id": "no-es-un-id", "role": "user", "content": "4", "created_at": t0},
+    ]))
+
+    assert inserted == 4
+    # Un solo bulk_write; el ID inválido se omite
+    assert db["conversations"].bulk == [[
+        UpdateOne({"_id": ObjectId(a)}, {"$max": {"updated_at": t0 + timedelta(seconds=1)}}),
+        UpdateOne({"_id": ObjectId(b)}, {"$max": {"updated_at": t0 + timedelta(seconds=5)}}),
+    ]]
+
+
+def test_retry_after_failed_conversation_update_does_not_duplicate_messages(monkeypatch):
+    db = FakeDatabase()
+    db["conversations"] = FakeCollection(bulk_failures=1)
+    repo = AsyncRepository(db)
+    monkeypatch.setattr(db_service, "asave_messages", repo.save_messages)
+    queue = PersistenceQueue(max_retries=1)
+    conversation_id = str(ObjectId())
+
+    async def scenario():
+        await queue.enqueue_exchange(conversation_id, "pregunta", "respuesta")
+        await queue.stop()
+
+    asyncio.run(scenario())
+
+    # insert_many entró en el primer intento; el reintento solo completa el bulk_write
+    assert [doc["content"] for doc in db["messages"].inserted] == ["pregunta", "respuesta"]
+    assert queue.retries == 1
+    assert queue.written_messages == 2 and queue.failed_batches == 0
+    assert len(db["conversations"].bulk) == 1
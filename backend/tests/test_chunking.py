@@ -0,0 +1,54 @@
+"""
+Chunking por palabras (02_chunking.iter_chunks): procedencia de página y
+offsets de caracteres sobre el texto limpio del documento.
+"""
+
+import importlib
+
+import pytest
+
+chunking = importlib.import_module("02_chunking")
+
+PAGES = [
+    (1, "Primera página con algunas palabras del libro."),
+    (2, "La segunda sigue el mismo tema y agrega detalle."),
+    (3, "Corta."),
+    (4, "Cuarta página: cierre del capítulo con una conclusión final del autor."),
+]
+DOCUMENT = " ".join(texto for _, texto in PAGES)
+
+
+@pytest.mark.parametrize("size,overlap", [(5, 2), (7, 0), (4, 3), (50, 10)])
+def test_offsets_point_at_the_chunk_text(size, overlap):
+    chunks = list(chunking.iter_chunks(PAGES, size, overlap))
+    assert chunks
+    for chunk in chunks:
+        meta = chunk["metadata"]
+        assert DOCUMENT[meta["char_start"]:meta["char_end"]] == chunk["text"]
+        assert meta["page_start"] <= meta["page_end"]
+
+
+def test_page_provenance_and_overlap():
+    chunks = list(chunking.iter_chunks(PAGES, 6, 2))
+    words = DOCUMENT.split()
+
+    # Cada chunk empieza `step` palabras después del anterior (4 = 6 - 2)
+    for i, chunk in enumerate(chunks):
+        assert chunk["text"].split() == words[i * 4:i * 4 + 6]
+
+    # El segundo chunk cruza de la página 1 a la 2
+    assert (chunks[1]["metadata"]["page_start"], chunks[1]["metadata"]["page_end"]) == (1, 2)
+    assert chunks[-1]["metadata"]["page_end"] == 4
+
+
+def test_streaming_matches_whole_text_chunking():
+    streamed = [c["text"] for c in chunking.iter_chunks(PAGES, 5, 2)]
+    assert streamed == chunking.chunk_by_sliding_window(DOCUMENT, 5, 2)
+
+
+def test_tail_needs_forty_percent_of_the_window():
+    # 9 palabras, ventana 6 / paso 4: la cola (5 palabras, 3 nuevas) se emite
+    text = "uno dos tres cuatro cinco seis siete ocho nueve"
+    assert len(list(chunking.iter_chunks([(1, text)], 6, 2))) == 2
+    # Menos del 40 % de la ventana: no hay chunk
+    assert list(chunking.iter_chunks([(1, "uno dos")], 10, 2)) == []
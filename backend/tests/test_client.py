@@ -0,0 +1,45 @@
+"""
+Cliente async de MongoDB: llamadas concurrentes a get_async_database()
+durante el arranque comparten un único AsyncMongoClient.
+"""
+
+import asyncio
+
+from api.db import client as db_client
+
+
+class FakeAdmin:
+    async def command(self, name):
+        # Ping lento: las demás llamadas llegan mientras se conecta
+        await asyncio.sleep(0.05)
+        return {"ok": 1}
+
+
+class FakeAsyncMongoClient:
+    created = 0
+
+    def __init__(self, url, **options):
+        FakeAsyncMongoClient.created += 1
+        self.admin = FakeAdmin()
+
+    def __getitem__(self, name):
+        return f"db:{name}"
+
+    async def close(self):
+        pass
+
+
+def test_concurrent_first_calls_create_a_single_client(monkeypatch):
+    FakeAsyncMongoClient.created = 0
+    monkeypatch.setattr(db_client, "AsyncMongoClient", FakeAsyncMongoClient)
+    monkeypatch.setattr(db_client, "_async_client", None)
+    monkeypatch.setattr(db_client, "_async_database", None)
+
+    async def scenario():
+        monkeypatch.setattr(db_client, "_async_lock", asyncio.Lock())
+        return await asyncio.gather(*[db_client.get_async_database() for _ in range(5)])
+
+    databases = asyncio.run(scenario())
+
+    assert FakeAsyncMongoClient.created == 1
+    assert len(set(databases)) == 1
@@ -0,0 +1,162 @@
+"""
+Punteros de alias (collection_alias.py) y CollectionRouter: un archivo por
+alias, validación del alias al leer, cambio de versión en caliente con
+drenado y borrado de versiones retiradas tras el período de gracia.
+"""
+
+import importlib
+import json
+import time
+from datetime import datetime, timedelta, timezone
+
+import pytest
+
+import collection_alias
+from retrieval_backends import CollectionRouter
+
+store_chroma = importlib.import_module("04_store_chroma")
+
+
+@pytest.fixture(autouse=True)
+def data_dir(tmp_path, monkeypatch):
+    monkeypatch.setattr(collection_alias, "DATA_DIR", tmp_path)
+    monkeypatch.setattr(collection_alias, "LEGACY_ALIAS_FILE", tmp_path / "04_store_chroma_alias.json")
+    return tmp_path
+
+
+class FakeClient:
+    def __init__(self, collections=(), failures=0):
+        self.collections = list(collections)
+        self.failures = failures
+        self.deleted = []
+
+    def get_collection(self, name):
+        if self.failures:
+            self.failures -= 1
+            raise RuntimeError("colección no disponible")
+        return FakeCollection(name)
+
+    def list_collections(self):
+        return list(self.collections)
+
+    def delete_collection(self, name):
+        self.deleted.append(name)
+        self.collections.remove(name)
+
+
+class FakeCollection:
+    def __init__(self, name):
+        self.name = name
+
+    def peek(self, limit):
+        return {"ids": []}
+
+
+def test_each_alias_has_its_own_pointer():
+    collection_alias.write_alias("libro__v1", 1, alias="libro")
+    collection_alias.write_alias("corpus__v3", 3, alias="corpus")
+
+    assert collection_alias.resolve_collection_name("libro") == "libro__v1"
+    assert collection_alias.resolve_collection_name("corpus") == "corpus__v3"
+
+
+def test_pointer_of_another_alias_is_rejected(data_dir):
+    collection_alias.alias_file("libro").write_text(
+        json.dumps({"alias": "corpus", "collection": "corpus__v1", "version": 1}), encoding="utf-8"
+    )
+    with pytest.raises(ValueError):
+        collection_alias.read_alias("libro")
+
+
+def test_legacy_pointer_only_applies_to_its_alias(data_dir):
+    collection_alias.LEGACY_ALIAS_FILE.write_text(
+        json.dumps({"alias": "libro", "collection": "libro__v2", "version": 2}), encoding="utf-8"
+    )
+    assert collection_alias.resolve_collection_name("libro") == "libro__v2"
+    # Sin puntero propio, otro alias sirve su colección sin versionar
+    assert collection_alias.resolve_collection_name("corpus") == "corpus"
+
+
+def test_router_switches_when_its_alias_moves():
+    collection_alias.write_alias("libro__v1", 1, alias="libro")
+    router = CollectionRouter(FakeClient(), alias="libro", poll_seconds=0)
+    assert router.active()[0] == "libro__v1"
+
+    # Mover otro alias no afecta a este router
+    collection_alias.write_alias("corpus__v1", 1, alias="corpus")
+    assert router.active()[0] == "libro__v1"
+
+    collection_alias.write_alias("libro__v2", 2, alias="libro")
+    deadline = time.monotonic() + 2
+    while router.active()[0] != "libro__v2" and time.monotonic() < deadline:
+        time.sleep(0.01)
+    assert router.version == "libro__v2"
+
+
+def _wait_for(condition, seconds=2):
+    deadline = time.monotonic() + seconds
+    while not condition() and time.monotonic() < deadline:
+        time.sleep(0.01)
+    return condition()
+
+
+def test_failed_switch_is_retried_without_a_new_pointer():
+    collection_alias.write_alias("libro__v1", 1, alias="libro")
+    client = FakeClient()
+    router = CollectionRouter(client, alias="libro", poll_seconds=60)
+
+    client.failures = 1
+    collection_alias.write_alias("libro__v2", 2, alias="libro")
+    router.active()
+    assert _wait_for(lambda: not router._switching)
+    assert router.active()[0] == "libro__v1"
+
+    # El puntero no volvió a cambiar, pero la siguiente revisión reintenta
+    router._checked_at = 0.0
+    assert _wait_for(lambda: router.active()[0] == "libro__v2")
+
+
+def test_switch_waits_for_queries_on_the_previous_version():
+    collection_alias.write_alias("libro__v1", 1, alias="libro")
+    router = CollectionRouter(FakeClient(), alias="libro", poll_seconds=0, drain_seconds=5)
+
+    with router.use() as (name, _):
+        assert name == "libro__v1"
+        collection_alias.write_alias("libro__v2", 2, alias="libro")
+        router.active()
+        # Las consultas nuevas ya van a v2, pero el cambio no terminó
+        assert _wait_for(lambda: router.name == "libro__v2")
+        time.sleep(0.05)
+        assert router._switching
+
+    assert _wait_for(lambda: not router._switching)
+
+
+def test_pointer_records_when_each_version_was_retired():
+    collection_alias.write_alias("libro__v1", 1, alias="libro")
+    collection_alias.write_alias("libro__v2", 2, alias="libro")
+    collection_alias.mark_updated("libro__v2", "aaaa", alias="libro")
+
+    retired = collection_alias.read_alias("libro")["retired"]
+    assert list(retired) == ["libro__v1"]
+    assert collection_alias.retired_seconds("libro")["libro__v1"] < 60
+
+
+def test_prune_keeps_recently_retired_versions(data_dir):
+    names = [collection_alias.versioned_name(v) for v in (1, 2, 3, 4)]
+    client = FakeClient(collections=names)
+    for version, name in enumerate(names, start=1):
+        collection_alias.write_alias(name, version)
+
+    # v1 retirada hace una hora; v2 y v3 recién retiradas
+    path = collection_alias.alias_file()
+    pointer = json.loads(path.read_text(encoding="utf-8"))
+    pointer["retired"][names[0]] = (datetime.now(timezone.utc) - timedelta(hours=1)).isoformat()
+    path.write_text(json.dumps(pointer), encoding="utf-8")
+
+    store_chroma.prune_versions(client, keep=2, grace_seconds=30)
+    assert client.deleted == [names[0]]
+
+    # Pasado el período de gracia, v2 también se borra (v3 y v4 son las 2 últimas)
+    store_chroma.prune_versions(client, keep=2, grace_seconds=0)
+    assert client.deleted == [names[0], names[1]]
@@ -0,0 +1,82 @@
+"""
+Cachés de embeddings: el nivel SQLite no corre en el event loop y el
+contador de bytes evita el SUM(size) en cada escritura.
+"""
+
+import asyncio
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+import embedding_cache
+from embedding_cache import EmbeddingCache
+from query_embedding_cache import QueryEmbeddingCache
+
+
+def _real_size(cache: EmbeddingCache) -> int:
+    return cache._conn.execute("SELECT COALESCE(SUM(size), 0) FROM embeddings").fetchone()[0]
+
+
+def test_query_cache_disk_tier_runs_in_executor(tmp_path):
+    disk = EmbeddingCache(path=tmp_path / "emb.sqlite3")
+    threads = []
+    for name in ("get_many", "put_many"):
+        original = getattr(disk, name)
+
+        def traced(*args, _original=original, **kwargs):
+            threads.append(threading.current_thread().name)
+            return _original(*args, **kwargs)
+
+        setattr(disk, name, traced)
+
+    executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="cache-io")
+    cache = QueryEmbeddingCache("modelo", disk=disk, executor=executor)
+
+    async def compute(query):
+        return [0.5, 0.25]
+
+    async def scenario():
+        first = await cache.aget_or_compute("¿Qué es IA?", compute)
+        # Otro proceso (memoria fría) encuentra el vector en disco
+        cold = QueryEmbeddingCache("modelo", disk=disk, executor=executor)
+        second = await cold.aget_or_compute("¿qué es  IA?", compute)
+        return first, second, cold.stats()
+
+    first, second, cold_stats = asyncio.run(scenario())
+    executor.shutdown()
+
+    assert first == second == [0.5, 0.25]
+    assert cold_stats["disk_hits"] == 1
+    assert threads and all(name.startswith("cache-io") for name in threads)
+
+
+def test_size_counter_tracks_replacements_and_evictions(tmp_path, monkeypatch):
+    cache = EmbeddingCache(path=tmp_path / "emb.sqlite3", max_bytes=10 * 4 * 4)  # 10 vectores de 4 floats
+
+    cache.put("a", [1.0] * 4, "m")
+    cache.put("a", [2.0] * 4, "m")  # reemplazo: no suma dos veces
+    assert cache._size_bytes == _real_size(cache) == 16
+
+    # Sin superar el límite no se escanea la tabla
+    scans = []
+    monkeypatch.setattr(cache, "_sync_size", lambda: scans.append(1))
+    cache.put_many([f"t{i}" for i in range(5)], [[0.0] * 4] * 5, "m")
+    assert scans == []
+    monkeypatch.undo()
+
+    cache.put_many([f"u{i}" for i in range(10)], [[0.0] * 4] * 10, "m")
+    assert cache.evictions > 0
+    assert cache._size_bytes == _real_size(cache) <= cache.max_bytes
+
+
+def test_size_counter_resyncs_with_other_writers(tmp_path, monkeypatch):
+    path = tmp_path / "emb.sqlite3"
+    cache = EmbeddingCache(path=path)
+    other = EmbeddingCache(path=path)  # p. ej. 03_embedding.py en otro proceso
+
+    other.put_many(["x", "y"], [[1.0] * 4] * 2, "m")
+    cache.put("z", [1.0] * 4, "m")
+    assert cache._size_bytes == 16  # aún no ve lo escrito por el otro
+
+    monkeypatch.setattr(embedding_cache, "SIZE_RESYNC_SECONDS", 0.0)
+    cache.put("w", [1.0] * 4, "m")
+    assert cache._size_bytes == _real_size(cache) == 64
@@ -0,0 +1,108 @@
+"""
+Formato binario de embeddings: matriz y sidecar se verifican como par
+(manifiesto) y NumpyBackend no carga un par a medio escribir ni recarga
+dos veces en paralelo.
+"""
+
+import shutil
+import threading
+import time
+
+import numpy as np
+import pytest
+
+import embedding_store
+from retrieval_backends import NumpyBackend
+
+
+def _records(n, dim=4, seed=0, prefix="doc"):
+    rng = np.random.default_rng(seed)
+    return [
+        {"id": f"{prefix}{i}", "text": f"texto {prefix}{i}", "embedding": rng.standard_normal(dim).tolist(),
+         "metadata": {"page_start": i} if i % 2 else {}}
+        for i in range(n)
+    ]
+
+
+def test_check_pair_accepts_a_complete_write(tmp_path):
+    prefix = tmp_path / "emb"
+    embedding_store.save_embeddings(_records(5), prefix)
+    assert embedding_store.check_pair(prefix) == 5
+
+
+def test_check_pair_rejects_a_mixed_pair(tmp_path):
+    prefix = tmp_path / "emb"
+    embedding_store.save_embeddings(_records(5), prefix)
+    old_sidecar = tmp_path / "old.meta.jsonl"
+    shutil.copy2(embedding_store.sidecar_path(prefix), old_sidecar)
+
+    embedding_store.save_embeddings(_records(7, seed=1), prefix)
+    # Lector entre los dos os.replace(): matriz nueva con sidecar anterior
+    shutil.copy2(old_sidecar, embedding_store.sidecar_path(prefix))
+
+    with pytest.raises(ValueError):
+        embedding_store.check_pair(prefix)
+    with pytest.raises(ValueError):
+        list(embedding_store.iter_batches(prefix))
+
+
+def test_numpy_backend_keeps_serving_while_pair_is_inconsistent(tmp_path):
+    prefix = tmp_path / "emb"
+    records = _records(6)
+    embedding_store.save_embeddings(records, prefix)
+    backend = NumpyBackend(prefix=prefix, poll_seconds=0)
+
+    # Escritura nueva a medias: matriz reemplazada, sidecar todavía anterior
+    old_sidecar = tmp_path / "old.meta.jsonl"
+    shutil.copy2(embedding_store.sidecar_path(prefix), old_sidecar)
+    embedding_store.save_embeddings(_records(3, seed=2, prefix="nuevo"), prefix)
+    shutil.copy2(old_sidecar, embedding_store.sidecar_path(prefix))
+
+    results = backend.search(records[0]["embedding"], 3)
+    assert results[0]["id"] == "doc0"
+    assert backend._matrix.shape[0] == len(backend._ids) == 6
+
+
+def test_numpy_backend_applies_default_metadata(tmp_path):
+    prefix = tmp_path / "emb"
+    records = _records(4)
+    embedding_store.save_embeddings(records, prefix)
+    backend = NumpyBackend(prefix=prefix, poll_seconds=0)
+
+    by_id = {r["id"]: r for r in backend.search(records[0]["embedding"], 4)}
+    assert by_id["doc0"]["metadata"] == embedding_store.DEFAULT_METADATA
+    assert by_id["doc1"]["metadata"] == {**embedding_store.DEFAULT_METADATA, "page_start": 1}
+
+
+def test_concurrent_searches_reload_once(tmp_path, monkeypatch):
+    prefix = tmp_path / "emb"
+    embedding_store.save_embeddings(_records(4), prefix)
+    backend = NumpyBackend(prefix=prefix, poll_seconds=0)
+    records = _records(5, seed=3, prefix="nuevo")
+    embedding_store.save_embeddings(records, prefix)
+
+    loads = []
+    original_load = backend._load
+
+    def slow_load():
+        loads.append(threading.get_ident())
+        time.sleep(0.1)
+        original_load()
+    monkeypatch.setattr(backend, "_load", slow_load)
+
+    barrier = threading.Barrier(8)
+
+    def search():
+        barrier.wait()
+        backend.search(records[0]["embedding"], 1)
+
+    threads = [threading.Thread(target=search) for _ in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert len(loads) == 1
+    assert backend.search(records[0]["embedding"], 1)[0]["id"] == "nuevo0"
+    # Sin temporales huérfanos junto a la matriz normalizada
+    assert not list(tmp_path.glob("*.tmp"))
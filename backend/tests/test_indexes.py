@@ -0,0 +1,135 @@
+"""
+Índices de MongoDB (api/db/indexes.py): las consultas de listado quedan
+cubiertas por los índices declarados (IXSCAN, sin SORT en memoria).
+El explain() lo simula un planificador mínimo sobre los índices creados.
+"""
+
+import asyncio
+
+from bson import ObjectId
+
+from api.db import indexes
+from api.db.indexes import INDEXES, _plan_stages, ensure_indexes, explain_checks
+
+
+def _index_plan(name, sort_in_memory=False):
+    plan = {"stage": "FETCH", "inputStage": {"stage": "IXSCAN", "indexName": name}}
+    if sort_in_memory:
+        plan = {"stage": "SORT", "inputStage": plan}
+    return {"stage": "LIMIT", "inputStage": plan}
+
+
+def _covers(keys, filter_fields, sort):
+    """El índice resuelve filtro por igualdad + orden sin ordenar en memoria."""
+    prefix, rest = keys[:len(filter_fields)], keys[len(filter_fields):]
+    if {field for field, _ in prefix} != set(filter_fields):
+        return False, False
+    if not sort:
+        return True, True
+    wanted = rest[:len(sort)]
+    same = wanted == sort
+    reversed_ = wanted == [(field, -direction) for field, direction in sort]
+    return True, same or reversed_
+
+
+class FakeCursor:
+    def __init__(self, collection, query):
+        self.collection = collection
+        self.query = query
+        self.sort_spec = []
+        self.limit_n = 0
+
+    def sort(self, spec):
+        self.sort_spec = list(spec)
+        return self
+
+    def limit(self, n):
+        self.limit_n = n
+        return self
+
+    async def explain(self):
+        returned = min(len(self.collection.docs), self.limit_n or len(self.collection.docs))
+        for name, keys in self.collection.indexes.items():
+            usable, sorted_ = _covers(keys, list(self.query), self.sort_spec)
+            if usable:
+                plan = _index_plan(name, sort_in_memory=not sorted_)
+                examined = returned
+                break
+        else:
+            plan = {"stage": "SORT", "inputStage": {"stage": "COLLSCAN"}}
+            examined = len(self.collection.docs)
+        return {
+            "queryPlanner": {"winningPlan": plan},
+            "executionStats": {"totalDocsExamined": examined, "nReturned": returned, "executionTimeMillis": 0},
+        }
+
+
+class FakeCollection:
+    def __init__(self):
+        self.indexes = {}
+        self.docs = [{"_id": ObjectId(), "email": "a@b.c", "user_id": "u1"} for _ in range(50)]
+
+    async def create_indexes(self, models):
+        names = []
+        for model in models:
+            document = model.document
+            self.indexes[document["name"]] = list(document["key"].items())
+            names.append(document["name"])
+        return names
+
+    async def find_one(self, query, projection=None):
+        return self.docs[0]
+
+    def find(self, query):
+        return FakeCursor(self, query)
+
+
+class FakeDatabase(dict):
+    def __missing__(self, name):
+        self[name] = FakeCollection()
+        return self[name]
+
+
+def test_plan_stages_walks_nested_plans():
+    classic = _index_plan("user_updated_id")
+    assert _plan_stages(classic) == ["LIMIT", "FETCH", "IXSCAN"]
+    # Formato SBE (queryPlan) y planes con varias entradas (OR)
+    sbe = {"queryPlan": {"stage": "SORT", "inputStage": {"stage": "COLLSCAN"}}}
+    assert _plan_stages(sbe) == ["SORT", "COLLSCAN"]
+    union = {"stage": "OR", "inputStages": [{"stage": "IXSCAN"}, {"stage": "IXSCAN"}]}
+    assert _plan_stages(union) == ["OR", "IXSCAN", "IXSCAN"]
+
+
+def test_ensure_indexes_creates_the_declared_indexes():
+    db = FakeDatabase()
+    created = asyncio.run(ensure_indexes(db))
+
+    assert created == {name: [m.document["name"] for m in models] for name, models in INDEXES.items()}
+    # Idempotente
+    assert asyncio.run(ensure_indexes(db)) == created
+
+
+def test_listing_queries_use_an_index_without_in_memory_sort():
+    db = FakeDatabase()
+    asyncio.run(ensure_indexes(db))
+
+    checks = {check["query"]: check for check in asyncio.run(explain_checks(db))}
+
+    assert set(checks) == {"users.by_email", "conversations.by_user", "messages.by_conversation"}
+    for check in checks.values():
+        assert "IXSCAN" in check["stages"]
+        assert "COLLSCAN" not in check["stages"] and "SORT" not in check["stages"]
+        assert check["problems"] == []
+
+
+def test_explain_checks_flag_missing_indexes(monkeypatch):
+    db = FakeDatabase()
+    monkeypatch.setattr(indexes, "INDEXES", {"users": INDEXES["users"]})
+    asyncio.run(ensure_indexes(db))
+
+    checks = {check["query"]: check for check in asyncio.run(explain_checks(db))}
+
+    assert checks["users.by_email"]["problems"] == []
+    problems = checks["messages.by_conversation"]["problems"]
+    assert any(p.startswith("COLLSCAN") for p in problems)
+    assert any(p.startswith("SORT") for p in problems)
@@ -0,0 +1,92 @@
+"""
+Paginación por keyset (api/db/pagination.py): ida y vuelta del cursor y
+recorrido completo de un listado en ambas direcciones, sobre una
+colección simulada en memoria.
+"""
+
+from datetime import datetime, timedelta
+
+import pytest
+from bson import ObjectId
+from pymongo import ASCENDING, DESCENDING
+
+from api.db.pagination import build_page, decode_cursor, encode_cursor, keyset_query
+
+BASE = datetime(2025, 1, 1, 12, 0, 0)
+
+
+def _docs(n: int):
+    # Pares con la misma fecha: el _id desempata
+    return [{"_id": ObjectId(), "created_at": BASE + timedelta(milliseconds=i // 2)} for i in range(n)]
+
+
+def _matches(doc, query):
+    for clause in query.get("$or", [{}]):
+        ok = True
+        for key, cond in clause.items():
+            value = doc[key]
+            if isinstance(cond, dict):
+                (op, bound), = cond.items()
+                ok &= value > bound if op == "$gt" else value < bound
+            else:
+                ok &= value == cond
+        if ok:
+            return True
+    return False
+
+
+def _find(docs, query, sort, limit, field="created_at"):
+    """find(query).sort(sort).limit(limit) sobre una lista."""
+    selected = [dict(d) for d in docs if _matches(d, query)]
+    direction = sort[0][1]
+    selected.sort(key=lambda d: (d[field], d["_id"]), reverse=direction == DESCENDING)
+    return selected[:limit]
+
+
+def _page(docs, limit, order, before=None, after=None, tail=False):
+    query, sort, reversed_ = keyset_query({}, "created_at", order, before, after, tail=tail)
+    return build_page(_find(docs, query, sort, limit + 1), limit, "created_at", reversed_)
+
+
+def test_cursor_round_trip():
+    doc = {"_id": ObjectId(), "created_at": BASE.replace(microsecond=123000)}
+    assert decode_cursor(encode_cursor(doc, "created_at")) == (doc["created_at"], doc["_id"])
+
+
+def test_invalid_cursor_and_both_directions_are_rejected():
+    with pytest.raises(ValueError):
+        decode_cursor("no-es-un-cursor")
+    with pytest.raises(ValueError):
+        keyset_query({}, "created_at", ASCENDING, before="a", after="b")
+
+
+def test_forward_pagination_visits_every_document_once():
+    docs = _docs(11)
+    seen, cursor = [], None
+    while True:
+        page, cursor = _page(docs, 4, ASCENDING, after=cursor)
+        seen.extend(d["_id"] for d in page)
+        if not cursor:
+            break
+    assert seen == [str(d["_id"]) for d in docs]
+
+
+def test_tail_returns_newest_page_then_older_with_before():
+    docs = _docs(11)
+    page, cursor = _page(docs, 4, ASCENDING, tail=True)
+    # Los 4 más recientes, en orden cronológico
+    assert [d["_id"] for d in page] == [str(d["_id"]) for d in docs[-4:]]
+
+    seen = page
+    while cursor:
+        page, cursor = _page(docs, 4, ASCENDING, before=cursor, tail=True)
+        seen = page + seen
+    assert [d["_id"] for d in seen] == [str(d["_id"]) for d in docs]
+
+
+def test_tail_with_after_keeps_forward_order():
+    docs = _docs(6)
+    first, _ = _page(docs, 2, ASCENDING)
+    cursor = encode_cursor({"_id": ObjectId(first[-1]["_id"]), "created_at": first[-1]["created_at"]}, "created_at")
+    page, _ = _page(docs, 2, ASCENDING, after=cursor, tail=True)
+    assert [d["_id"] for d in page] == [str(d["_id"]) for d in docs[2:4]]
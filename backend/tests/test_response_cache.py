@@ -0,0 +1,65 @@
+"""
+Generación de la caché de respuestas: cambia con el contenido del índice
+(revisión del puntero), no solo con el nombre de la colección.
+"""
+
+import pytest
+
+import collection_alias
+from response_cache import ResponseCache, cache_generation, response_cache_key
+from retrieval_backends import CollectionRouter
+
+
+@pytest.fixture
+def data_dir(tmp_path, monkeypatch):
+    monkeypatch.setattr(collection_alias, "DATA_DIR", tmp_path)
+    monkeypatch.setattr(collection_alias, "LEGACY_ALIAS_FILE", tmp_path / "04_store_chroma_alias.json")
+    return tmp_path
+
+
+class FakeClient:
+    def get_collection(self, name):
+        return object()
+
+
+def test_generation_and_key_follow_index_version():
+    gen_a = cache_generation("libro__v1@aaaa")
+    gen_b = cache_generation("libro__v1@bbbb")
+
+    assert gen_a != gen_b
+    assert response_cache_key("¿Qué es IA?", 5, 0.5, gen_a) != response_cache_key("¿Qué es IA?", 5, 0.5, gen_b)
+    # La normalización de la query no depende de la generación
+    assert response_cache_key("¿Qué es IA?", 5, 0.5, gen_a) == response_cache_key("  ¿qué es ia? ", 5, 0.5, gen_a)
+
+
+def test_new_generation_drops_memory_and_disk_entries(tmp_path):
+    cache = ResponseCache(path=tmp_path / "responses.sqlite3")
+    old, new = cache_generation("libro__v1@aaaa"), cache_generation("libro__v1@bbbb")
+    key = response_cache_key("q", 5, 0.5, old)
+
+    cache.put(key, old, {"respuesta": "vieja"})
+    assert cache.get(key, old) == {"respuesta": "vieja"}
+
+    assert cache.get(key, new) is None
+    assert cache.stats()["invalidations"] == 1
+    # Tampoco queda en el nivel persistente (otro worker con la caché fría)
+    assert ResponseCache(path=tmp_path / "responses.sqlite3").get(key, old) is None
+
+
+def test_incremental_sync_changes_router_version(data_dir):
+    collection_alias.write_alias("libro__v1", 1, alias="libro", revision="aaaa")
+    router = CollectionRouter(FakeClient(), alias="libro", poll_seconds=0)
+    assert router.version == "libro__v1@aaaa"
+
+    assert collection_alias.mark_updated("libro__v1", "bbbb", alias="libro")
+    router.active()
+    assert router.version == "libro__v1@bbbb"
+
+    # Misma revisión o colección que el alias no sirve: el puntero no cambia
+    assert not collection_alias.mark_updated("libro__v1", "bbbb", alias="libro")
+    assert not collection_alias.mark_updated("libro__v0", "cccc", alias="libro")
+
+
+def test_unversioned_collection_gets_a_pointer_on_first_write(data_dir):
+    assert collection_alias.mark_updated("corpus", "aaaa", alias="corpus")
+    assert collection_alias.resolve_pointer("corpus") == ("corpus", "aaaa")
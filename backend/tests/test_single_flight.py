@@ -0,0 +1,84 @@
+"""
+SingleFlight: consultas idénticas concurrentes comparten una ejecución;
+un cliente que se desconecta no cancela la ejecución de los demás.
+"""
+
+import asyncio
+
+from api.services.single_flight import SingleFlight
+
+
+def test_identical_concurrent_calls_share_one_execution():
+    flight = SingleFlight()
+    calls = []
+
+    async def factory():
+        calls.append(1)
+        await asyncio.sleep(0.01)
+        return {"respuesta": "ok"}
+
+    async def scenario():
+        results = await asyncio.gather(*[flight.run("k", factory) for _ in range(5)])
+        other = await flight.run("otra", factory)
+        return results, other
+
+    results, other = asyncio.run(scenario())
+
+    assert results == [{"respuesta": "ok"}] * 5 and other == {"respuesta": "ok"}
+    assert len(calls) == 2
+    assert flight.stats() == {"executions": 2, "coalesced": 4, "coalesce_rate": 4 / 6, "in_flight": 0}
+
+
+def test_finished_key_runs_again():
+    flight = SingleFlight()
+    calls = []
+
+    async def factory():
+        calls.append(1)
+        return {}
+
+    async def scenario():
+        await flight.run("k", factory)
+        await flight.run("k", factory)
+
+    asyncio.run(scenario())
+    assert len(calls) == 2
+
+
+def test_cancelled_waiter_does_not_cancel_shared_execution():
+    flight = SingleFlight()
+    release = None
+
+    async def factory():
+        await release.wait()
+        return {"respuesta": "ok"}
+
+    async def scenario():
+        nonlocal release
+        release = asyncio.Event()
+        first = asyncio.create_task(flight.run("k", factory))
+        second = asyncio.create_task(flight.run("k", factory))
+        await asyncio.sleep(0)
+        first.cancel()
+        await asyncio.sleep(0)
+        release.set()
+        return first, await second
+
+    first, result = asyncio.run(scenario())
+    assert first.cancelled()
+    assert result == {"respuesta": "ok"}
+
+
+def test_error_reaches_every_waiter_and_clears_the_key():
+    flight = SingleFlight()
+
+    async def factory():
+        await asyncio.sleep(0.01)
+        raise RuntimeError("OpenAI no responde")
+
+    async def scenario():
+        return await asyncio.gather(*[flight.run("k", factory) for _ in range(3)], return_exceptions=True)
+
+    errors = asyncio.run(scenario())
+    assert all(isinstance(e, RuntimeError) for e in errors)
+    assert flight.stats()["in_flight"] == 0
@@ -0,0 +1,78 @@
+"""
+Chunking por tokens (token_chunking.iter_token_chunks): offsets sobre el
+texto limpio del documento, límites de tokens y cortes en fin de oración.
+Tokenizer WordLevel armado en el test (sin descargas del Hub).
+"""
+
+import pytest
+from tokenizers import Tokenizer
+from tokenizers.models import WordLevel
+from tokenizers.pre_tokenizers import Whitespace
+
+from token_chunking import iter_token_chunks
+
+
+@pytest.fixture(scope="module")
+def tokenizer():
+    # Vocabulario vacío: todo es [UNK], pero los offsets son los reales
+    tok = Tokenizer(WordLevel({"[UNK]": 0}, unk_token="[UNK]"))
+    tok.pre_tokenizer = Whitespace()
+    return tok
+
+
+def _pages(n_pages=6, sentences=5):
+    return [
+        (page, " ".join(f"La oración {i} de la página {page} tiene siete palabras." for i in range(sentences)))
+        for page in range(1, n_pages + 1)
+    ]
+
+
+def _document(pages):
+    return " ".join(texto for _, texto in pages)
+
+
+def _tokens(tokenizer, text):
+    return len(tokenizer.encode(text, add_special_tokens=False).ids)
+
+
+@pytest.mark.parametrize("snap", [True, False])
+@pytest.mark.parametrize("batch_pages", [1, 4])
+def test_offsets_point_at_the_chunk_text(tokenizer, snap, batch_pages):
+    pages = _pages()
+    document = _document(pages)
+    chunks = list(iter_token_chunks(
+        pages, tokenizer, target_tokens=24, max_tokens=32, overlap_tokens=6,
+        snap_sentences=snap, batch_pages=batch_pages
+    ))
+
+    assert len(chunks) > 3
+    for chunk in chunks:
+        meta = chunk["metadata"]
+        assert document[meta["char_start"]:meta["char_end"]] == chunk["text"]
+        assert meta["token_count"] == _tokens(tokenizer, chunk["text"]) <= 32
+        assert meta["page_start"] <= meta["page_end"]
+    assert chunks[-1]["metadata"]["page_end"] == len(pages)
+
+
+def test_chunks_cover_the_document_with_overlap(tokenizer):
+    pages = _pages()
+    document = _document(pages)
+    chunks = list(iter_token_chunks(pages, tokenizer, target_tokens=24, max_tokens=32, overlap_tokens=6))
+
+    assert chunks[0]["metadata"]["char_start"] == 0
+    assert chunks[-1]["metadata"]["char_end"] == len(document)
+    for prev, nxt in zip(chunks, chunks[1:]):
+        # Cada chunk empieza dentro del anterior (solapamiento) y avanza
+        assert prev["metadata"]["char_start"] < nxt["metadata"]["char_start"] <= prev["metadata"]["char_end"]
+
+
+def test_snap_cuts_at_sentence_ends(tokenizer):
+    chunks = list(iter_token_chunks(_pages(), tokenizer, target_tokens=20, max_tokens=32, overlap_tokens=4))
+    # Oraciones de 9 tokens: siempre hay un final de oración entre el objetivo y el máximo
+    for chunk in chunks[:-1]:
+        assert chunk["text"].endswith(".")
+
+
+def test_invalid_limits_are_rejected(tokenizer):
+    with pytest.raises(ValueError):
+        list(iter_token_chunks(_pages(), tokenizer, target_tokens=40, max_tokens=32))
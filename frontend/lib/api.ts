@@ -82,6 +82,41 @@ async function handleResponse<T>(response: Response): Promise<T> {
   return response.json();
 }
 
+/**
+ * Recorre un listado paginado por cursor (header X-Next-Cursor) hasta el final.
+ * - "after": cada página sigue a la anterior (se agrega al final)
+ * - "before": cada página es anterior a la ya leída (se agrega al principio)
+ */
+async function fetchAllPages<T>(
+  url: string,
+  direction: "after" | "before"
+): Promise<T[]> {
+  const items: T[] = [];
+  let cursor: string | null = null;
+
+  do {
+    const pageUrl: string = cursor
+      ? `${url}?${direction}=${encodeURIComponent(cursor)}`
+      : url;
+    const response = await fetch(pageUrl, {
+      method: "GET",
+      headers: {
+        "Content-Type": "application/json",
+      },
+    });
+
+    const page = await handleResponse<T[]>(response);
+    if (direction === "before") {
+      items.unshift(...page);
+    } else {
+      items.push(...page);
+    }
+    cursor = response.headers.get("X-Next-Cursor");
+  } while (cursor);
+
+  return items;
+}
+
 /**
  * Envía una consulta RAG al backend
  */
@@ -235,23 +270,16 @@ export async function getConversation(
 }
 
 /**
- * Obtiene todas las conversaciones de un usuario
+ * Obtiene todas las conversaciones de un usuario (de la más reciente a la más antigua)
  */
 export async function getUserConversations(
   userId: string
 ): Promise<ConversationResponse[]> {
   try {
-    const response = await fetch(
+    return await fetchAllPages<ConversationResponse>(
       `${API_BASE_URL}/api/user/${userId}/conversations`,
-      {
-        method: "GET",
-        headers: {
-          "Content-Type": "application/json",
-        },
-      }
+      "after"
     );
-
-    return handleResponse<ConversationResponse[]>(response);
   } catch (error) {
     if (error instanceof Error) {
       throw error;
@@ -287,23 +315,17 @@ export async function deleteConversation(
 }
 
 /**
- * Obtiene todos los mensajes de una conversación
+ * Obtiene todos los mensajes de una conversación en orden cronológico
+ * (la API entrega primero los más recientes; se piden los anteriores con `before`)
  */
 export async function getConversationMessages(
   conversationId: string
 ): Promise<MessageResponse[]> {
   try {
-    const response = await fetch(
+    return await fetchAllPages<MessageResponse>(
       `${API_BASE_URL}/api/conversation/${conversationId}/messages`,
-      {
-        method: "GET",
-        headers: {
-          "Content-Type": "application/json",
-        },
-      }
+      "before"
     );
-
-    return handleResponse<MessageResponse[]>(response);
   } catch (error) {
     if (error instanceof Error) {
       throw error;